@@ -0,0 +1,317 @@
+"""
+Benchmark the search of `CustomPlayer` and catch speed regressions.
+
+Every search engine in ENGINES (a search method of CustomPlayer and the
+fixed depth it is benchmarked at) searches each position of the perft
+position set (see perft.py). The nodes expanded, the time taken, the nodes
+per second and the effective branching factor of every search are reported
+and can be saved as JSON:
+
+    python bench.py --output bench.json
+
+A saved run can serve as the baseline of later runs, which then fail (exit
+status 1) when the throughput of any search drops by more than --threshold
+percent:
+
+    python bench.py --baseline bench.json --threshold 10
+
+The node counts are compared as well, since a change in the nodes searched
+means the search itself changed and the speeds are no longer comparable.
+
+The evaluation functions in HEURISTICS can be compared at the leaves of the
+alpha-beta search as well. Each one searches every position by iterative
+deepening under the same budget: a wall-clock time that interrupts the
+search (--budget), or a number of nodes (--nodes, which is deterministic but
+ignores the cost of the leaves). The run fails if a heuristic of --check
+reaches more than --max-depth-loss plies less than the first one (the
+improved heuristic) on some position:
+
+    python bench.py --heuristics --budget 500
+
+Both heuristics that compute the flood-fill features are checked. "+flood"
+computes them at every leaf of the very search tree of the improved
+heuristic, so the depth it loses is the cost of the features alone. The
+flood heuristic searches a different tree: its scores rarely tie, so the
+search (which does not order moves) makes fewer cutoffs and needs more nodes
+per ply. Under --nodes it stays within a ply, but the extra nodes and the
+cost of its leaves together can lose two plies on the midgame position under
+the default budget, which then fails the run.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+from collections import OrderedDict
+from collections import namedtuple
+
+from game_agent import CustomPlayer
+from game_agent import flood_features
+from game_agent import flood_score
+from isolation import Clock
+from perft import make_position
+from sample_players import improved_score
+
+# Search method -> depth it is benchmarked at
+ENGINES = OrderedDict([("minimax", 6), ("alphabeta", 9)])
+
+POSITIONS = ("opening", "midgame", "partition")
+
+THRESHOLD = 10.  # percent of throughput lost before a benchmark fails
+
+
+def improved_with_flood(game, player):
+    """ improved_score, computing (and discarding) the flood features too. """
+    flood_features(game, player)
+    return improved_score(game, player)
+
+
+# Evaluation functions compared by --heuristics (the first is the reference)
+HEURISTICS = OrderedDict([("improved", improved_score),
+                          ("+flood", improved_with_flood),
+                          ("flood", flood_score)])
+
+# Heuristics held to --max-depth-loss by default (see the module docstring)
+CHECKED = ("+flood", "flood")
+
+BUDGET = 500.  # milliseconds per position for the heuristic comparison
+
+BenchResult = namedtuple("BenchResult", ["engine", "position", "depth",
+                                         "nodes", "cutoffs", "seconds",
+                                         "nps", "ebf", "move"])
+
+HeuristicResult = namedtuple("HeuristicResult", ["heuristic", "position",
+                                                 "depth", "nodes", "seconds",
+                                                 "nps", "move"])
+
+
+def effective_branching_factor(nodes, depth):
+    """Solve nodes = b + b^2 + ... + b^depth for b, the branching factor of a
+    uniform tree of the same depth and size.
+    """
+    if nodes <= depth:
+        return 1.
+    low, high = 1., float(nodes)
+    for _ in range(100):
+        b = (low + high) / 2
+        if sum(b ** i for i in range(1, depth + 1)) > nodes:
+            high = b
+        else:
+            low = b
+    return (low + high) / 2
+
+
+def bench_search(engine, position, depth, repeat=3):
+    """Time a fixed-depth search of a stored position (all of them have
+    player 1 to move, so the agent searches as player 1).
+
+    The search is repeated `repeat` times and the fastest run is kept, which
+    filters out most of the noise of other processes.
+
+    Returns
+    ----------
+    BenchResult
+    """
+    best = None
+    for _ in range(repeat):
+        agent = CustomPlayer(search_depth=depth, score_fn=improved_score,
+                             method=engine, iterative=False)
+        agent.time_left = lambda: float("inf")
+        board = make_position(position, agent, "opponent")
+        search = getattr(agent, engine)
+        start = timeit.default_timer()
+        _, move = search(board, depth)
+        seconds = timeit.default_timer() - start
+        if best is None or seconds < best[0]:
+            best = (seconds, agent._nodes, agent._cutoffs, move)
+
+    seconds, nodes, cutoffs, move = best
+    return BenchResult(engine, position, depth, nodes, cutoffs, seconds,
+                       nodes / seconds if seconds > 0 else 0.,
+                       effective_branching_factor(nodes, depth), move)
+
+
+def run(engines=None, positions=POSITIONS, repeat=3):
+    """ Benchmark every engine (name -> depth) on every position. """
+    engines = ENGINES if engines is None else engines
+    return [bench_search(engine, position, depth, repeat)
+            for engine, depth in engines.items() for position in positions]
+
+
+def bench_heuristic(name, position, budget=BUDGET, nodes=None):
+    """Search a stored position with an iterative deepening alpha-beta search
+    using the heuristic HEURISTICS[name], for `budget` milliseconds or (when
+    given) `nodes` nodes.
+
+    Returns
+    ----------
+    HeuristicResult
+        The deepest completed iteration, with the nodes and the time of all
+        the completed iterations.
+    """
+    agent = CustomPlayer(score_fn=HEURISTICS[name], method='alphabeta')
+    board = make_position(position, agent, "opponent")
+    if nodes is None:
+        result = agent.analyze(board, float(budget))
+    else:
+        for result in agent.iter_search(board, Clock(float("inf"), nodes)):
+            pass
+    stats = agent.last_stats
+    seconds = sum(stats.iteration_times) / 1000.
+    return HeuristicResult(name, position, result.depth, stats.nodes, seconds,
+                           stats.nodes / seconds if seconds > 0 else 0.,
+                           result.best_move)
+
+
+def run_heuristics(names=None, positions=POSITIONS, budget=BUDGET, nodes=None):
+    """ Benchmark every heuristic in `names` (default: all) on every position. """
+    return [bench_heuristic(name, position, budget, nodes)
+            for name in names or HEURISTICS for position in positions]
+
+
+def compare_depths(results, max_loss=1, checked=None):
+    """Compare the depth reached by each heuristic with the first one.
+
+    Parameters
+    ----------
+    checked : iterable<str> (optional)
+        The heuristics compared (default: all of them).
+
+    Returns
+    ----------
+    list<str>
+        A description of every search that reached more than `max_loss`
+        plies less than the reference heuristic on the same position.
+    """
+    reference = {}
+    problems = []
+    for r in results:
+        base = reference.setdefault(r.position, r)
+        if checked is not None and r.heuristic not in checked:
+            continue
+        if base.depth - r.depth > max_loss:
+            problems.append("{} on {}: depth {}, {} reaches {}".format(
+                r.heuristic, r.position, r.depth, base.heuristic, base.depth))
+    return problems
+
+
+def to_json(results):
+    """ Encode benchmark results as a JSON document (a dict). """
+    return {"python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": [r._asdict() for r in results]}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Compare benchmark results with a baseline document (see `to_json`).
+
+    Returns
+    ----------
+    list<str>
+        A description of every regression: a search more than `threshold`
+        percent slower than in the baseline, or one that expanded a different
+        number of nodes. Searches missing from the baseline are skipped.
+    """
+    reference = {(r["engine"], r["position"], r["depth"]): r
+                 for r in baseline["results"]}
+    problems = []
+    for r in results:
+        base = reference.get((r.engine, r.position, r.depth))
+        if base is None:
+            continue
+        name = "{} {} depth {}".format(r.engine, r.position, r.depth)
+        if r.nodes != base["nodes"]:
+            problems.append("{}: searched {} nodes, baseline {}".format(
+                name, r.nodes, base["nodes"]))
+        elif r.nps < base["nps"] * (1. - threshold / 100.):
+            problems.append("{}: {:.0f} nodes/s is {:.1f}% below the baseline "
+                            "{:.0f} nodes/s".format(name, r.nps,
+                                                    100. * (1. - r.nps / base["nps"]),
+                                                    base["nps"]))
+    return problems
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search "
+                                     "engines of CustomPlayer.")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES),
+                        help="engines to run (default: all of %s)" % ", ".join(ENGINES))
+    parser.add_argument("--depth", type=int, default=None,
+                        help="search depth for every engine (default: per engine)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each search (the fastest is kept)")
+    parser.add_argument("--output", default=None,
+                        help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="percent of throughput lost before the benchmark fails")
+    parser.add_argument("--heuristics", action="store_true",
+                        help="compare the depth reached by the heuristics of %s instead"
+                             % ", ".join(HEURISTICS))
+    parser.add_argument("--budget", type=float, default=BUDGET,
+                        help="milliseconds per position for --heuristics")
+    parser.add_argument("--nodes", type=int, default=None,
+                        help="search --heuristics for this many nodes per position "
+                             "instead of --budget milliseconds")
+    parser.add_argument("--check", nargs="+", default=list(CHECKED),
+                        help="heuristics held to --max-depth-loss (default: %s)"
+                             % ", ".join(CHECKED))
+    parser.add_argument("--max-depth-loss", type=int, default=1,
+                        help="plies a heuristic may lose to %s before --heuristics fails"
+                             % list(HEURISTICS)[0])
+    args = parser.parse_args(args)
+
+    if args.heuristics:
+        unknown = [name for name in args.check if name not in HEURISTICS]
+        if unknown:
+            parser.error("unknown heuristics: " + ", ".join(unknown))
+        results = run_heuristics(budget=args.budget, nodes=args.nodes)
+        print("{:<10}{:<10}{:>6}{:>10}{:>10}{:>11}".format(
+            "Heuristic", "Position", "Depth", "Nodes", "Seconds", "Nodes/s"))
+        for r in results:
+            print("{:<10}{:<10}{:>6}{:>10}{:>10.3f}{:>11.0f}".format(
+                r.heuristic, r.position, r.depth, r.nodes, r.seconds, r.nps))
+        problems = compare_depths(results, args.max_depth_loss, args.check)
+        for problem in problems:
+            print("TOO SLOW " + problem)
+        for problem in compare_depths(results, args.max_depth_loss):
+            if problem not in problems:
+                print("behind (not checked) " + problem)
+        return 1 if problems else 0
+
+    unknown = [name for name in args.engines if name not in ENGINES]
+    if unknown:
+        parser.error("unknown engines: " + ", ".join(unknown))
+    engines = OrderedDict((name, args.depth or ENGINES[name]) for name in args.engines)
+
+    results = run(engines, repeat=args.repeat)
+    print("{:<10}{:<10}{:>6}{:>10}{:>9}{:>10}{:>11}{:>7}".format(
+        "Engine", "Position", "Depth", "Nodes", "Cutoffs", "Seconds",
+        "Nodes/s", "EBF"))
+    for r in results:
+        print("{:<10}{:<10}{:>6}{:>10}{:>9}{:>10.3f}{:>11.0f}{:>7.2f}".format(
+            r.engine, r.position, r.depth, r.nodes, r.cutoffs, r.seconds,
+            r.nps, r.ebf))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(to_json(results), f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.threshold)
+        for problem in problems:
+            print("REGRESSION " + problem)
+        if problems:
+            return 1
+        print("No regressions against {} (threshold {:g}%)".format(
+            args.baseline, args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
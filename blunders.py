@@ -0,0 +1,260 @@
+"""
+Find the moves that lost recorded games (see results_store.py).
+
+Every position of a stored game is replayed and searched again with a fixed
+depth alpha-beta search, much deeper than the agents could afford under the
+tournament time limit. The analysis compares the value of the best move with
+the value of the move that was played, both from the mover's point of view
+at the same depth:
+
+    loss = value(best move) - value(played move)
+
+A move is flagged as a blunder when the loss is at least --threshold (in
+units of the evaluation function), or when it gives away a forced win or
+walks into a forced loss (an infinite loss). Games are analysed in parallel
+by a process pool, one game per task, and the report lists the most
+instructive games first: the losses of the agent under study, ordered by the
+size of their worst blunder and then by how early it came.
+
+    python blunders.py results.sqlite --agent Student --depth 8
+"""
+
+import argparse
+import os
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from game_agent import CustomPlayer
+from game_agent import WeightedScore
+from isolation import Board
+from results_store import ResultsStore
+from sample_players import improved_score
+
+DEPTH = 7  # search depth of the analysis (the tournament agents reach 3-5)
+THRESHOLD = 3.  # loss in evaluation units flagged as a blunder
+
+# The analysis of one move: the ply (moves on the board before it), the name
+# of the player, the move played and the best move found, the values of both
+# for the mover, their difference (loss) and the number of legal moves
+MoveAnalysis = namedtuple("MoveAnalysis", ["ply", "player", "move",
+                                           "best_move", "best_score",
+                                           "played_score", "loss",
+                                           "num_legal"])
+
+# The analysis of one game: its match key and index within the match, the
+# `GameRecord`, the analysis of every move and the moves flagged as blunders
+GameAnalysis = namedtuple("GameAnalysis", ["key", "index", "record",
+                                           "moves", "blunders"])
+
+
+def _searcher(depth, score_fn):
+    agent = CustomPlayer(search_depth=depth, score_fn=score_fn,
+                         method='alphabeta', iterative=False)
+    agent.time_left = lambda: float("inf")
+    return agent
+
+
+def analyze_move(state, move, depth=DEPTH, score_fn=improved_score):
+    """Search a position and the move played in it to the same depth.
+
+    The value of the played move is the minimum, over the replies of the
+    opponent, of a depth - 2 search of the position after the reply (with an
+    alpha-beta window bounded by the best reply so far), which matches the
+    value a depth `depth` search gives that move at the root.
+
+    Parameters
+    ----------
+    state : tuple
+        The position before the move, encoded by `Board.to_state()`.
+
+    move : (int, int)
+        The move played (a legal move of the position).
+
+    depth : int
+        The search depth of the position (at least 2).
+
+    Returns
+    ----------
+    (float, (int, int), float)
+        The value of the best move, the best move and the value of the
+        played move, for the player making the move.
+    """
+    agent = _searcher(depth, score_fn)
+    opponent = object()
+    if state[3] == 1:
+        board = Board.from_state(state, agent, opponent)
+    else:
+        board = Board.from_state(state, opponent, agent)
+
+    best_score, best_move = agent.alphabeta(board, depth)
+
+    after = board.forecast_move(move)
+    replies = after.get_legal_moves()
+    if not replies:
+        return best_score, best_move, agent.score(after, agent)
+    played_score = float("inf")
+    for reply in replies:
+        position = after.forecast_move(reply)
+        if depth == 2:
+            score = agent.score(position, agent)
+        else:
+            score, _ = agent.alphabeta(position, depth - 2, beta=played_score)
+        played_score = min(played_score, score)
+    return best_score, best_move, played_score
+
+
+def analyze_game(record, key=None, index=0, agent=None, depth=DEPTH,
+                 score_fn=improved_score, threshold=THRESHOLD):
+    """Analyse every move of a recorded game.
+
+    Parameters
+    ----------
+    record : `results_store.GameRecord`
+        The game to analyse.
+
+    agent : str (optional)
+        Only analyse the moves of the agent with this name (all moves by
+        default). Opening moves, forced moves (a single legal move) and the
+        final move that lost the game are never analysed.
+
+    Returns
+    ----------
+    GameAnalysis
+    """
+    board = Board("player1", "player2")
+    for move in record.opening:
+        board.apply_move(move)
+
+    moves = []
+    for move in record.moves[:-1]:
+        ply = board.move_count
+        player = record.player_1 if board.active_player == "player1" else record.player_2
+        num_legal = len(board.get_legal_moves())
+        if num_legal > 1 and agent in (None, player):
+            best_score, best_move, played_score = analyze_move(
+                board.to_state(), move, depth, score_fn)
+            loss = 0. if best_score == played_score else best_score - played_score
+            moves.append(MoveAnalysis(ply, player, move, best_move, best_score,
+                                      played_score, loss, num_legal))
+        board.apply_move(move)
+
+    blunders = [m for m in moves if m.loss >= threshold]
+    return GameAnalysis(key, index, record, moves, blunders)
+
+
+def _analyze_job(job, agent, depth, score_fn, threshold):
+    key, index, record = job
+    return analyze_game(record, key, index, agent, depth, score_fn, threshold)
+
+
+def analyze_games(games, agent=None, depth=DEPTH, score_fn=improved_score,
+                  threshold=THRESHOLD, executor=None):
+    """Analyse many games, one game per task of `executor` (e.g., a process
+    pool), or one after another in this process when it is None.
+
+    Parameters
+    ----------
+    games : iterable<(str, int, GameRecord)>
+        The match key, index within the match and record of every game.
+
+    Returns
+    ----------
+    list<GameAnalysis>
+        The analyses, in the order of `games`.
+    """
+    analyze = partial(_analyze_job, agent=agent, depth=depth,
+                      score_fn=score_fn, threshold=threshold)
+    if executor is None:
+        return list(map(analyze, games))
+    return list(executor.map(analyze, games))
+
+
+def instructive_order(analyses, agent=None):
+    """Sort game analyses so that the most instructive losses come first.
+
+    Games lost by `agent` (by anyone when None) come before the others; then
+    games with a larger worst blunder, then those where it came earlier.
+    Games without blunders come last.
+    """
+    def key(analysis):
+        record = analysis.record
+        lost = agent is None or (agent in (record.player_1, record.player_2) and
+                                 record.winner != agent)
+        if not analysis.blunders:
+            return (2, 0., 0)
+        worst = max(analysis.blunders, key=lambda m: (m.loss, -m.ply))
+        return (0 if lost else 1, -worst.loss, worst.ply)
+
+    return sorted(analyses, key=key)
+
+
+def _fmt_score(value):
+    if value == float("inf"):
+        return "win"
+    if value == float("-inf"):
+        return "loss"
+    return "{:+.1f}".format(value)
+
+
+def print_analysis(analyses, limit=10):
+    """ Print the blunders of the first `limit` game analyses. """
+    for analysis in analyses[:limit]:
+        record = analysis.record
+        print("\n{} game {}: {} vs {}, winner {} ({})".format(
+            analysis.key, analysis.index, record.player_1, record.player_2,
+            record.winner, record.termination))
+        if not analysis.blunders:
+            print("  no blunders found in {} moves".format(len(analysis.moves)))
+        for m in analysis.blunders:
+            loss = "inf" if m.loss == float("inf") else "{:.1f}".format(m.loss)
+            print("  ply {:>2} {:<12} played {} ({}), best {} ({}), loss {}".format(
+                m.ply, m.player, m.move, _fmt_score(m.played_score),
+                m.best_move, _fmt_score(m.best_score), loss))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Search recorded games again "
+                                     "deeper and report the blunders.")
+    parser.add_argument("results", help="SQLite results file written by tournament.py --results")
+    parser.add_argument("--agent", default=None,
+                        help="only analyse the moves of this agent (default: all moves)")
+    parser.add_argument("--depth", type=int, default=DEPTH,
+                        help="search depth of the analysis")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="loss (in evaluation units) flagged as a blunder")
+    parser.add_argument("--weights", default=None,
+                        help="analyse with this weights file (default: the improved heuristic)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes analysing games (0 = one per CPU core)")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="number of games reported")
+    args = parser.parse_args(args)
+    if args.depth < 2:
+        parser.error("--depth must be at least 2")
+
+    store = ResultsStore(args.results)
+    games = [(key, idx, record) for key, records in sorted(store.matches().items())
+             for idx, record in enumerate(records)
+             if args.agent in (None, record.player_1, record.player_2)]
+    store.close()
+
+    score_fn = WeightedScore.load(args.weights) if args.weights else improved_score
+    workers = args.workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        analyses = analyze_games(games, args.agent, args.depth, score_fn,
+                                 args.threshold, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    num_blunders = sum(len(a.blunders) for a in analyses)
+    print("Analysed {} moves of {} games at depth {}: {} blunders".format(
+        sum(len(a.moves) for a in analyses), len(analyses), args.depth, num_blunders))
+    print_analysis(instructive_order(analyses, args.agent), args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+This file contains `Coordinator`, which spreads tournament matches over
+worker processes on other machines, and `run_worker`, the loop those
+workers run.
+
+The coordinator listens on a TCP address (host, port) or a Unix socket path.
+Workers connect to it, receive one job at a time (a function and its
+argument, e.g., `tournament.run_match` and a `MatchJob` holding the agents,
+the opening and the seed), run it and send the result back. Workers keep no
+state between jobs, so any number of them can join or leave at any time.
+
+While a job runs its worker sends a heartbeat every `heartbeat` seconds. A
+job whose worker disconnects, or stays silent for `heartbeat_timeout`
+seconds, is put back in the queue and handed to another worker.
+
+The coordinator offers the `map()` and `shutdown()` methods of the executors
+in concurrent.futures, so it can stand in for a process pool:
+
+    coordinator = Coordinator(("0.0.0.0", 5050))
+    coordinator.start()
+    results = run_schedule(jobs, executor=coordinator)
+
+and on every worker machine (from a checkout of the same code):
+
+    python distributed.py coordinator-host:5050
+
+Messages are pickled, so only connect coordinators and workers that trust
+each other (e.g., on a private network).
+"""
+
+import argparse
+import collections
+import pickle
+import socket
+import struct
+import threading
+import time
+
+
+HEARTBEAT_SECONDS = 1.  # interval between heartbeats of a busy worker
+HEARTBEAT_TIMEOUT = 10.  # silence after which a worker is presumed lost
+MAX_ATTEMPTS = 3  # workers lost by a job before it is given up
+
+_HEADER = struct.Struct("!I")
+
+
+def _send(sock, message):
+    """ Send a length-prefixed pickled message. """
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock):
+    """ Receive a message sent by `_send` (raises EOFError on disconnect). """
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _socket_family(address):
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+class JobLost(Exception):
+    """ Raised for a job that lost its worker `max_attempts` times. """
+    pass
+
+
+class Coordinator(object):
+    """Hand out jobs to remote workers and collect their results.
+
+    Parameters
+    ----------
+    address : (str, int) or str
+        The TCP (host, port) address, or the Unix socket path, to listen on.
+        Use port 0 to pick a free port (see the `address` attribute).
+
+    heartbeat_timeout : float (optional)
+        Seconds without a message from a busy worker before its job is
+        re-queued.
+
+    max_attempts : int (optional)
+        Number of times a job may be handed out before `map()` gives up on it
+        and raises `JobLost`.
+
+    Attributes
+    ----------
+    address : (str, int) or str
+        The address the coordinator listens on (after `start()`).
+
+    requeued : int
+        The number of jobs put back in the queue after losing their worker.
+    """
+
+    def __init__(self, address, heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS):
+        self.address = address
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.requeued = 0
+        self._listener = None
+        self._queue = collections.deque()  # (job id, fn, arg) waiting for a worker
+        self._attempts = {}
+        self._results = {}  # job id -> (ok, value)
+        self._next_id = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self._connections = set()
+
+    def start(self):
+        """ Start listening for workers. """
+        self._listener = socket.socket(_socket_family(self.address),
+                                       socket.SOCK_STREAM)
+        if not isinstance(self.address, str):
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(self.address)
+        self._listener.listen()
+        self.address = self._listener.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return  # listener closed by shutdown()
+            with self._lock:
+                if self._closed:
+                    conn.close()
+                    return
+                self._connections.add(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _next_job(self):
+        """ Block until a job is queued (or the coordinator shuts down). """
+        with self._lock:
+            while not self._queue and not self._closed:
+                self._lock.wait()
+            if self._closed:
+                return None
+            job = self._queue.popleft()
+            self._attempts[job[0]] += 1
+            return job
+
+    def _finish(self, job_id, ok, value):
+        with self._lock:
+            self._results[job_id] = (ok, value)
+            self._lock.notify_all()
+
+    def _requeue(self, job):
+        with self._lock:
+            self.requeued += 1
+            if self._attempts[job[0]] >= self.max_attempts:
+                self._results[job[0]] = (False, JobLost(
+                    "job {} lost its worker {} times".format(job[0], self.max_attempts)))
+            else:
+                self._queue.appendleft(job)
+            self._lock.notify_all()
+
+    def _serve(self, conn):
+        """Coordinator side of one worker connection: send a job, wait for
+        its result (accepting heartbeats meanwhile), and repeat.
+        """
+        conn.settimeout(self.heartbeat_timeout)
+        job = None
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    _send(conn, None)
+                    return
+                job_id, fn, args = job
+                _send(conn, (job_id, pickle.dumps((fn, args),
+                                                  pickle.HIGHEST_PROTOCOL)))
+                while True:
+                    message = _recv(conn)
+                    if message is None:  # heartbeat
+                        continue
+                    job_id, ok, value = message
+                    self._finish(job_id, ok, value)
+                    job = None
+                    break
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # socket.timeout is an OSError: the worker went silent
+            if job is not None:
+                self._requeue(job)
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def map(self, fn, *iterables):
+        """Queue fn(*args) for every item of `iterables` and return an
+        iterator over the results in order, like `Executor.map`.
+
+        An exception raised by a job is re-raised when its result is
+        reached; `JobLost` is raised for a job that kept losing its workers.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot schedule new jobs after shutdown")
+            job_ids = []
+            for args in zip(*iterables):
+                job_id = self._next_id
+                self._next_id += 1
+                self._attempts[job_id] = 0
+                self._queue.append((job_id, fn, args))
+                job_ids.append(job_id)
+            self._lock.notify_all()
+
+        def results():
+            for job_id in job_ids:
+                with self._lock:
+                    while job_id not in self._results:
+                        self._lock.wait()
+                    ok, value = self._results.pop(job_id)
+                    del self._attempts[job_id]
+                if not ok:
+                    raise value
+                yield value
+
+        return results()
+
+    def shutdown(self, wait=True):
+        """ Stop accepting jobs and tell idle workers to exit. """
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+            connections = list(self._connections)
+        if self._listener is not None:
+            self._listener.close()
+        if not wait:
+            for conn in connections:
+                conn.close()
+
+
+def run_worker(address, heartbeat=HEARTBEAT_SECONDS, retry=None):
+    """Connect to a coordinator and run the jobs it sends until it shuts down.
+
+    Parameters
+    ----------
+    address : (str, int) or str
+        The TCP (host, port) address or Unix socket path of the coordinator.
+
+    heartbeat : float (optional)
+        Seconds between heartbeats while a job runs.
+
+    retry : float (optional)
+        Keep trying to connect for this many seconds (e.g., while the
+        coordinator starts up) instead of failing at once.
+    """
+    deadline = time.time() + (retry or 0)
+    while True:
+        sock = socket.socket(_socket_family(address), socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+            break
+        except OSError:
+            sock.close()
+            if time.time() >= deadline:
+                raise
+            time.sleep(0.1)
+
+    with sock:
+        while True:
+            try:
+                job = _recv(sock)
+            except EOFError:
+                return
+            if job is None:
+                return
+
+            job_id, payload = job
+            try:
+                fn, args = pickle.loads(payload)
+            except Exception as e:
+                # e.g., the job refers to code missing from this checkout
+                _send(sock, (job_id, False, RuntimeError(
+                    "cannot load the job: {!r}".format(e))))
+                continue
+
+            outcome = []
+            done = threading.Event()
+
+            def run():
+                try:
+                    outcome.append((True, fn(*args)))
+                except Exception as e:
+                    outcome.append((False, e))
+                done.set()
+
+            threading.Thread(target=run, daemon=True).start()
+            while not done.wait(heartbeat):
+                _send(sock, None)
+            try:
+                _send(sock, (job_id,) + outcome[0])
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                _send(sock, (job_id, False, RuntimeError(
+                    "cannot send the result of the job: {!r}".format(e))))
+
+
+def parse_address(text):
+    """ Parse "host:port" as a TCP address; anything else is a socket path. """
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return host or "localhost", int(port)
+    return text
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run a worker that plays "
+                                     "games for a tournament coordinator.")
+    parser.add_argument("address", help="coordinator address: host:port or a Unix socket path")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT_SECONDS,
+                        help="seconds between heartbeats while a game runs")
+    parser.add_argument("--retry", type=float, default=30.,
+                        help="seconds to keep trying to reach the coordinator")
+    args = parser.parse_args(args)
+    run_worker(parse_address(args.address), args.heartbeat, args.retry)
+
+
+if __name__ == "__main__":
+    main()
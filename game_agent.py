@@ -1,10 +1,97 @@
 """This program works in conjunction with isolation.py and tournament.py to generate player 
 moves and evaluation functions"""
 
+import itertools
+import json
+import os
+import pickle
+import timeit
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+
+from isolation import Board
+from isolation import Clock
+from tablebase import Tablebase
+
+
 class Timeout(Exception):
     """Subclass base exception for code clarity."""
     pass
 
+
+SearchResult = namedtuple("SearchResult", ["depth", "score", "best_move", "pv",
+                                           "nodes", "elapsed"])
+
+## Nodes searched between two reads of the clock under an `analyze` time budget
+DEADLINE_CHECK_NODES = 64
+
+
+def curr_time_millis():
+    """Simple timer to return the current clock time in milliseconds."""
+    return 1000 * timeit.default_timer()
+
+
+class SearchStats(object):
+    """Record of the work done by a single call to `CustomPlayer.get_move`.
+
+    Attributes
+    ----------
+    depth : int
+        The deepest search iteration that completed before the search returned.
+
+    nodes_per_depth : list<int>
+        The number of nodes expanded by each completed iteration (index 0 is
+        the depth 1 search).
+
+    iteration_times : list<float>
+        The time (in milliseconds) taken by each completed iteration.
+
+    cutoffs : int
+        The number of alpha-beta cutoffs over the whole call.
+
+    cache_hits : int
+        The number of evaluations answered from a cache instead of the
+        heuristic function.
+
+    pv : list<(int, int)>
+        The principal variation (expected line of play) found by the last
+        completed iteration, starting with the move returned.
+
+    elapsed : float
+        Total time (in milliseconds) spent inside get_move().
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.nodes_per_depth = []
+        self.iteration_times = []
+        self.cutoffs = 0
+        self.cache_hits = 0
+        self.pv = []
+        self.elapsed = 0.
+
+    @property
+    def nodes(self):
+        """ Total number of nodes expanded by the completed iterations. """
+        return sum(self.nodes_per_depth)
+
+    @property
+    def nodes_per_second(self):
+        """ Search speed over the completed iterations. """
+        iteration_time = sum(self.iteration_times)
+        if iteration_time <= 0:
+            return 0.
+        return 1000. * self.nodes / iteration_time
+
+    def __repr__(self):
+        return ("SearchStats(depth={}, nodes={}, nps={:.0f}, cutoffs={}, "
+                "cache_hits={}, pv={})").format(self.depth, self.nodes,
+                                                self.nodes_per_second,
+                                                self.cutoffs, self.cache_hits,
+                                                self.pv)
+
 ## The following function is created to calculate "Manhattan distance" between
 ## the player locations. This value is used in two of the evaluation functions
 def manhattan_distance(move1, move2):
@@ -55,6 +142,191 @@ def custom_score(game, player):
     return(float(score))
 
 
+## The terms of the hand-written evaluation functions above, combined linearly by
+## WeightedScore below so that their weights can be tuned (see tuner.py)
+FEATURES = ("own_moves", "opp_moves", "distance", "blanks", "overlap")
+
+## These weights reproduce the "improved" heuristic from the lecture
+DEFAULT_WEIGHTS = {"own_moves": 1., "opp_moves": -1., "distance": 0.,
+                   "blanks": 0., "overlap": 0.}
+
+
+def score_features(game, player):
+    """Compute the terms of the evaluation functions for `player`.
+
+    Returns
+    -------
+    tuple(float)
+        The number of moves of the player and of its opponent, the manhattan
+        distance between them, the number of blank cells and the number of
+        cells both players can move to (in the order of FEATURES).
+    """
+    own_moves = game.get_legal_moves(player)
+    opp_moves = game.get_legal_moves(game.get_opponent(player))
+    dist = manhattan_distance(game.get_player_location(player),
+                              game.get_player_location(game.get_opponent(player)))
+    overlap = set(own_moves).intersection(opp_moves)
+    return (float(len(own_moves)), float(len(opp_moves)), float(dist),
+            float(len(game.get_blank_spaces())), float(len(overlap)))
+
+
+## Bitboards: bit (row * width + col) of an int stands for a cell. A knight
+## move is a shift of every bit at once: first by one or two columns (masking
+## out the bits that wrapped around to another row), then by two or one rows.
+## Both players are flooded in a single int, the opponent's board `offset`
+## bits above the player's; the gap of two rows between them catches any bit
+## shifted out of either board, and the mask of blank cells clears it
+_BITBOARDS = {}
+
+## Translation of the cell symbols (0 = blank, 1/2 = blocked by a player) into
+## the digits of the blank-cell bitboard
+_BLANK_DIGITS = bytes.maketrans(b"\x00\x01\x02", b"100")
+
+
+def _knight_masks(width, height):
+    """Return the offset of the second board, the mask of the first board and
+    the masks of the cells left after shifting the columns right by one, left
+    by one, right by two and left by two, for both boards.
+    """
+    key = (width, height)
+    if key not in _BITBOARDS:
+        offset = width * (height + 2)
+        low = (1 << (width * height)) - 1
+
+        def columns(first, last):
+            mask = 0
+            for r in range(height):
+                for c in range(first, last):
+                    mask |= 1 << (r * width + c)
+            return mask | (mask << offset)
+
+        _BITBOARDS[key] = (offset, low, columns(1, width), columns(0, width - 1),
+                           columns(2, width), columns(0, width - 2))
+    return _BITBOARDS[key]
+
+
+def knight_spread(cells, width, height):
+    """ Return the bitboard of the cells a knight reaches from any of `cells`. """
+    _, low, right_1, left_1, right_2, left_2 = _knight_masks(width, height)
+    one = ((cells << 1) & right_1) | ((cells >> 1) & left_1)
+    two = ((cells << 2) & right_2) | ((cells >> 2) & left_2)
+    return ((one << 2 * width) | (one >> 2 * width) |
+            (two << width) | (two >> width)) & low
+
+
+def blank_bitboard(game):
+    """ Return the bitboard of the blank cells of a board. """
+    digits = bytes(itertools.chain.from_iterable(game.__board_state__))
+    return int(digits.translate(_BLANK_DIGITS)[::-1], 2)
+
+
+def _bit_count(cells):
+    return bin(cells).count("1")
+
+
+def flood_features(game, player):
+    """Compute the reachability of the blank cells for `player` by flooding
+    both knights' moves over the bitboard of blank cells, one ply at a time.
+
+    Returns
+    -------
+    tuple(int)
+        The number of moves of the player and of its opponent; the number of
+        blank cells each of them can reach in any number of moves (ignoring
+        the other knight); the number of cells each reaches in strictly fewer
+        moves than the other; and the size of the shared region (cells both
+        can reach).
+    """
+    width = game.width
+    offset, low, right_1, left_1, right_2, left_2 = _knight_masks(width, game.height)
+    blank = blank_bitboard(game)
+    blank |= blank << offset
+    own_loc = game.get_player_location(player)
+    opp_loc = game.get_player_location(game.get_opponent(player))
+    frontier = ((1 << (own_loc[0] * width + own_loc[1])) |
+                (1 << (opp_loc[0] * width + opp_loc[1] + offset)))
+    rows_1, rows_2 = width, 2 * width
+
+    ## knight_spread inlined (this runs at every leaf) on both boards at once;
+    ## `first` keeps the cells reached before the knight on the other board
+    reached = first = 0
+    moves = None
+    while frontier:
+        one = ((frontier << 1) & right_1) | ((frontier >> 1) & left_1)
+        two = ((frontier << 2) & right_2) | ((frontier >> 2) & left_2)
+        frontier = ((one << rows_2) | (one >> rows_2) | (two << rows_1) |
+                    (two >> rows_1)) & blank & ~reached
+        if moves is None:
+            moves = frontier
+        reached |= frontier
+        first |= frontier & ~((reached >> offset) | ((reached & low) << offset))
+
+    own_reached, opp_reached = reached & low, reached >> offset
+    return (_bit_count(moves & low), _bit_count(moves >> offset),
+            _bit_count(own_reached), _bit_count(opp_reached),
+            _bit_count(first & low), _bit_count(first >> offset),
+            _bit_count(own_reached & opp_reached))
+
+
+def flood_score(game, player):
+    """Score a state by the cells the player reaches before its opponent
+    (see `flood_features`), plus the difference in mobility. Unlike the
+    one-ply mobility heuristics it sees a knight walled into a small region.
+    """
+    own_moves, opp_moves, _, _, own_first, opp_first, _ = flood_features(game, player)
+    if game.active_player == player:
+        if not own_moves:
+            return float("-inf")
+    elif not opp_moves:
+        return float("inf")
+    return float(own_first - opp_first + own_moves - opp_moves)
+
+
+class WeightedScore(object):
+    """Evaluation function scoring a state as a weighted sum of FEATURES.
+
+    Instances are picklable (unlike closures), so agents using them can be
+    sent to worker processes.
+
+    Parameters
+    ----------
+    weights : dict<str, float> (optional)
+        Weight of each feature; features left out have weight zero.
+    """
+
+    def __init__(self, weights=None):
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError("Unknown features: {}".format(", ".join(sorted(unknown))))
+        self.weights = {name: float(weights.get(name, 0.)) for name in FEATURES}
+        self._vector = [self.weights[name] for name in FEATURES]
+
+    @classmethod
+    def load(cls, path):
+        """ Create the evaluation function from a weights file (see `save`). """
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        """ Write the weights to a JSON file that CustomPlayer can load. """
+        with open(path, "w") as f:
+            json.dump(self.weights, f, indent=2)
+            f.write("\n")
+
+    def __call__(self, game, player):
+        if game.is_loser(player):
+            return float("-inf")
+
+        if game.is_winner(player):
+            return float("inf")
+
+        return sum(w * x for w, x in zip(self._vector, score_features(game, player)))
+
+    def __repr__(self):
+        return "WeightedScore({!r})".format(self.weights)
+
+
 class CustomPlayer:
     """
     This class specifies a few methods (minimax and minimax with alpha-beta pruning) that 
@@ -82,16 +354,76 @@ class CustomPlayer:
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    collect_stats : boolean (optional)
+        Flag indicating whether get_move() should record a `SearchStats`
+        instance in `last_stats`. Node and cutoff counters are plain integer
+        increments, so disabling this only skips the per-iteration
+        bookkeeping.
+
+    stats_callback : callable (optional)
+        A function called with the `SearchStats` record at the end of every
+        call to get_move() (only when collect_stats is True).
+
+    node_limit : int (optional)
+        Maximum number of nodes to expand per call to get_move(). A search
+        that reaches the budget is aborted like one that runs out of time,
+        returning the move of the last completed iteration. A node budget
+        handed over by the game (`time_left.node_limit`, see `Board.play`)
+        takes precedence.
+
+    weights : str or dict (optional)
+        Evaluate states with a `WeightedScore` using these weights (or the
+        weights in this file, e.g., one written by tuner.py) instead of
+        score_fn.
+
+    cache_size : int (optional)
+        Keep the scores of up to this many evaluated positions and reuse them
+        whenever a search reaches the same position again (counted in
+        `SearchStats.cache_hits`). The cache lives as long as the agent, so
+        it also serves later searches of related positions (see
+        `analyze_many`). Disabled (0) by default.
+
+    tablebase : `tablebase.Tablebase` or str (optional)
+        A solved tablebase (or the path of a tablebase file). Positions it
+        covers are played perfectly at the root of get_move() and scored as
+        won or lost at the leaves of the search.
     """
 
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=10.):
+                 iterative=True, method='minimax', timeout=10.,
+                 collect_stats=True, stats_callback=None, node_limit=None,
+                 weights=None, cache_size=0, tablebase=None):
+        if isinstance(weights, str):
+            score_fn = WeightedScore.load(weights)
+        elif weights is not None:
+            score_fn = WeightedScore(weights)
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
         self.method = method
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.collect_stats = collect_stats
+        self.stats_callback = stats_callback
+        self.node_limit = node_limit
+        self.last_stats = None
+        self.cache_size = cache_size
+        self._eval_cache = {} if cache_size else None
+        self._pool = None
+        self._pool_config = None
+        if isinstance(tablebase, str):
+            tablebase = Tablebase.open(tablebase)
+        self.tablebase = tablebase
+
+        ## Search counters; these are reset by get_move() and read back after
+        ## every iteration to build the SearchStats record
+        self._nodes = 0
+        self._cutoffs = 0
+        self._cache_hits = 0
+        self._node_limit = float("inf")
+        self._deadline = None
+        self._pv = [()]
 
 
 
@@ -126,6 +458,9 @@ class CustomPlayer:
         if self.time_left() < self.TIMER_THRESHOLD:
             return(self.score(game, self), game.get_move(game, game.get_legal_moves(self), self.TIMER_THRESHOLD))
 
+        ## Leaves are scored through the tablebase and the evaluation cache when enabled
+        evaluate = self._evaluator()
+
 
         ## Minimax is implemented using two helper functions (min_value and max_value) 
         ## This algorithm is implemented based on the pseudocode specified in Russell & Norvig (2010)
@@ -140,8 +475,9 @@ class CustomPlayer:
             ## This is the terminal test. If the search reaches the maximum depth specified or if any 
             ## of the players wins / loses, then it returns the values at that node without 
             ## further recursing.
+            pv[n_depth] = ()
             if n_depth == max_depth or n_game.is_winner(self) == True or n_game.is_loser(self) == True:
-                return(float(self.score(n_game, self)))
+                return(float(evaluate(n_game, self)))
             
             ## Here the decision is made based on whether the original player is maximizing / not.
             ## If the original player is maximizing, then at this minimizing node, it is the opponent's moves
@@ -158,8 +494,14 @@ class CustomPlayer:
             ## the program has explored the maximum depth or not
             n_depth = n_depth + 1 
             for m in n_moves:
+                if self._nodes >= self._node_limit:
+                    self._out_of_nodes()
                 next_game = n_game.forecast_move(m) ## A deep copy of the next move
-                best_score = min(best_score, max_value(game, next_game, n_depth, max_depth, maximizing_player)) 
+                self._nodes += 1
+                score = max_value(game, next_game, n_depth, max_depth, maximizing_player)
+                if score < best_score:
+                    best_score = score
+                    pv[n_depth - 1] = (m,) + pv[n_depth] ## Line of play below this node
 
             return(best_score)
 
@@ -167,8 +509,9 @@ class CustomPlayer:
             ## This is the terminal test. If the search reaches the maximum depth specified or if any 
             ## of the players wins / loses, then it returns the values at that node without 
             ## further recursing.
+            pv[n_depth] = ()
             if n_depth == max_depth or n_game.is_winner(self) == True or n_game.is_loser(self) == True:
-                return(float(self.score(n_game, self)))
+                return(float(evaluate(n_game, self)))
 
             ## Here the decision is made based on whether the original player is maximizing / not.
             ## If the original player is maximizing, then at this maximizing node, it has to be the same person.
@@ -184,11 +527,22 @@ class CustomPlayer:
             ## the program has explored the maximum depth or not
             n_depth = n_depth + 1
             for m in n_moves:
+                if self._nodes >= self._node_limit:
+                    self._out_of_nodes()
                 next_game = n_game.forecast_move(m) ## A deep copy of the next move
-                best_score = max(best_score, min_value(game, next_game, n_depth, max_depth, maximizing_player))
+                self._nodes += 1
+                score = min_value(game, next_game, n_depth, max_depth, maximizing_player)
+                if score > best_score:
+                    best_score = score
+                    pv[n_depth - 1] = (m,) + pv[n_depth] ## Line of play below this node
 
             return(best_score)
 
+        ## The principal variation is kept in a triangular table: pv[ply] holds the best line
+        ## found below the node currently being searched at that ply
+        pv = [()] * (depth + 2)
+        self._pv = pv
+
         try:
 
             num_legal_moves = game.get_legal_moves(game.active_player)
@@ -203,7 +557,10 @@ class CustomPlayer:
 
             ## The program searches for all the possible moves
             for m in num_legal_moves:
+                if self._nodes >= self._node_limit:
+                    self._out_of_nodes()
                 next_game = game.forecast_move(m) ## Deep copy of the next move
+                self._nodes += 1
 
                 ## If the player is at the maximizing node, then the next level is opponent's turn
                 ## so the program has to look at the minimizing subroutine
@@ -212,11 +569,13 @@ class CustomPlayer:
                     if score > best_score:
                         best_move = m
                         best_score = score   
+                        pv[0] = (m,) + pv[1]
                 else:
                     score = max_value(game, next_game, 1, depth, maximizing_player)
                     if score < best_score:
                         best_score = score
                         best_move = m
+                        pv[0] = (m,) + pv[1]
                         
 
             return(best_score, best_move)
@@ -264,6 +623,9 @@ class CustomPlayer:
         if self.time_left() < self.TIMER_THRESHOLD:
             return(self.score(game, self), game.get_move(game, game.get_legal_moves(self), self.TIMER_THRESHOLD))
 
+        ## Leaves are scored through the tablebase and the evaluation cache when enabled
+        evaluate = self._evaluator()
+
 
 
         ## Similar to minimax the alpha-beta pruning is implemented using two helper functions 
@@ -283,8 +645,9 @@ class CustomPlayer:
             ## This is the terminal test. If the search reaches the maximum depth specified or if any 
             ## of the players wins / loses, then it returns the values at that node without 
             ## further recursing.
+            pv[n_depth] = ()
             if n_depth == max_depth or n_game.is_winner(self) == True or n_game.is_loser(self) == True:
-                return((self.score(n_game, self)))
+                return((evaluate(n_game, self)))
 
             ## Here the decision is made based on whether the original player is maximizing / not.
             ## If the original player is maximizing, then at this minimizing node, it is the opponent's moves
@@ -299,11 +662,17 @@ class CustomPlayer:
 
             for m in n_moves:
 
+                if self._nodes >= self._node_limit:
+                    self._out_of_nodes()
                 next_game = n_game.forecast_move(m) ## Deep copy of the next move
+                self._nodes += 1
 
                 ## The value obtained from the lower subroutine is compared with that of the 
                 ## value specified in this function--minimum of those is chosen
-                score = min(score, max_value_ab(game, next_game, n_depth, max_depth, alpha, beta, maximizing_player))
+                value = max_value_ab(game, next_game, n_depth, max_depth, alpha, beta, maximizing_player)
+                if value < score:
+                    score = value
+                    pv[n_depth - 1] = (m,) + pv[n_depth] ## Line of play below this node
 
                 ## Here is where alpha-beta pruning is different from minimax
 
@@ -311,6 +680,7 @@ class CustomPlayer:
                 ## if it is smaller, it is returned, else the loop keeps going until it finds the value 
                 ## smaller than alpha. This will be used to prune the tree in the main function
                 if score <= alpha:
+                    self._cutoffs += 1
                     return(score)
 
                 ## The value of beta is assigned the minimum of the new value found vs. the previous beta value
@@ -324,8 +694,9 @@ class CustomPlayer:
             ## This is the terminal test. If the search reaches the maximum depth specified or if any 
             ## of the players wins / loses, then it returns the values at that node without 
             ## further recursing.
+            pv[n_depth] = ()
             if n_depth == max_depth or n_game.is_winner(self) == True or n_game.is_loser(self) == True:
-                return((self.score(n_game, self)))
+                return((evaluate(n_game, self)))
 
             ## Here the decision is made based on whether the original player is maximizing / not.
             ## If the original player is maximizing, then at this maximizing node, it has to be the same person.
@@ -338,11 +709,17 @@ class CustomPlayer:
             n_depth = n_depth + 1 ## Depth is increased before it is explore further
 
             for m in n_moves:
+                if self._nodes >= self._node_limit:
+                    self._out_of_nodes()
                 next_game = n_game.forecast_move(m) ## Deep copy of the next move
+                self._nodes += 1
 
                 ## The value obtained from the lower subroutine is compared with that of the 
                 ## value specified in this function--maximum of those is chosen
-                score = max(score, min_value_ab(game, next_game, n_depth, max_depth, alpha, beta, maximizing_player))
+                value = min_value_ab(game, next_game, n_depth, max_depth, alpha, beta, maximizing_player)
+                if value > score:
+                    score = value
+                    pv[n_depth - 1] = (m,) + pv[n_depth] ## Line of play below this node
 
 
                 ## Here is where alpha-beta pruning is different from minimax
@@ -351,6 +728,7 @@ class CustomPlayer:
                 ## if it is greater, it is returned, else the loop keeps going until it finds the value 
                 ## larger than beta. This will be used to prune the tree in the main function
                 if score >= beta:
+                    self._cutoffs += 1
                     return(score)
 
                 ## The value of alpha is assigned the maximum of the new value found vs. the previous alpha value
@@ -359,6 +737,11 @@ class CustomPlayer:
             return(score)
 
 
+        ## The principal variation is kept in a triangular table: pv[ply] holds the best line
+        ## found below the node currently being searched at that ply
+        pv = [()] * (depth + 2)
+        self._pv = pv
+
         try:
 
             num_legal_moves = game.get_legal_moves(self)
@@ -374,7 +757,10 @@ class CustomPlayer:
                 best_score = beta ## Highest possible value
 
             for m in num_legal_moves:
+                if self._nodes >= self._node_limit:
+                    self._out_of_nodes()
                 next_game = game.forecast_move(m)
+                self._nodes += 1
 
                 ## If the player is at the maximizing node, then the next level is opponent's turn
                 ## so the program has to look at the minimizing subroutine
@@ -383,11 +769,13 @@ class CustomPlayer:
                     if score > best_score:
                         best_move = m
                         best_score = score
+                        pv[0] = (m,) + pv[1]
 
                     ## Pruning occurs here, when the best score returned is greater than beta.
                     ## The loop breaks and returns the best move. It doesn't loop further 
                     ## to look at the remaining nodes.
                     if best_score >= beta:
+                        self._cutoffs += 1
                         break
 
                     alpha = max(alpha, best_score)
@@ -397,11 +785,13 @@ class CustomPlayer:
                     if score < best_score:
                         best_move = m
                         best_score = score
+                        pv[0] = (m,) + pv[1]
 
                     ## Pruning occurs here, when the best score returned is smaller than alpha.
                     ## The loop breaks and returns the best move. It doesn't loop further 
                     ## to look at the remaining nodes.
                     if best_score <= alpha:
+                        self._cutoffs += 1
                         break
 
                     beta = min(alpha, best_score)
@@ -411,6 +801,103 @@ class CustomPlayer:
         except TimeoutError:
             return(best_score, best_move)
 
+    def iter_search(self, game, time_left):
+        """Run the iterative deepening search for the active player of `game`
+        and yield a `SearchResult` every time an iteration completes.
+
+        The first iteration is always a depth one search; deeper iterations
+        follow while self.iterative is set and the time_left() margin allows
+        it (or, under a node budget, until the budget is spent or the game
+        tree has been searched to the end). The caller may stop consuming
+        the generator at any time (e.g., to stop early or to show progress)
+        -- the last result yielded is the best move found so far. The
+        `SearchStats` record for the search is completed when the generator
+        finishes or is closed.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn.
+
+        Yields
+        ------
+        SearchResult
+            (depth, score, best_move, pv, nodes, elapsed) for each completed
+            iteration, where nodes is the total number of nodes expanded so
+            far and elapsed is the time (in milliseconds) since the search
+            started.
+        """
+        if self.method == "minimax":
+            search = self.minimax
+        elif self.method == "alphabeta":
+            search = self.alphabeta
+        else:
+            raise ValueError("Unknown search method: {!r}".format(self.method))
+
+        self.time_left = time_left
+        self._nodes = 0
+        self._cutoffs = 0
+        self._cache_hits = 0
+        node_limit = getattr(time_left, "node_limit", None) or self.node_limit
+        if node_limit is not None:
+            self._node_limit = node_limit
+        stats = SearchStats() if self.collect_stats else None
+        start = curr_time_millis()
+
+        ## No iteration can go deeper than the number of open cells
+        max_depth = len(game.get_blank_spaces())
+
+        ## In iterative deepening, it explores the nodes at each depth
+        ## increasing it by one level every time. Each completed iteration is
+        ## handed to the caller, so when time runs out the last one is the best move
+        try:
+            depth = 1
+            while True:
+                nodes = self._nodes
+                iteration_start = curr_time_millis()
+                score, move = search(game, depth)
+                now = curr_time_millis()
+                pv = list(self._pv[0])
+
+                if stats is not None:
+                    stats.iteration_times.append(now - iteration_start)
+                    stats.nodes_per_depth.append(self._nodes - nodes)
+                    stats.depth = depth
+                    stats.pv = pv
+
+                yield SearchResult(depth, score, move, pv, self._nodes, now - start)
+
+                ## A high margin is given for searching moves,especially for playing in tournaments
+                ## where time is really important to get back to the quick best move
+                if not self.iterative or self.time_left() < 600:
+                    break
+                if depth >= max_depth or self._nodes == nodes:
+                    break
+                depth = depth + 1
+
+        except (Timeout, TimeoutError):
+            pass
+
+        finally:
+            self._node_limit = float("inf")
+            if stats is not None:
+                self._finish_stats(stats, start)
+
+    def _out_of_nodes(self):
+        """Called when the search reaches its node limit: raise Timeout, or
+        under the deadline of `analyze` read the clock and allow another
+        DEADLINE_CHECK_NODES nodes if it has not passed yet.
+        """
+        if self._deadline is not None and curr_time_millis() < self._deadline:
+            self._node_limit = self._nodes + DEADLINE_CHECK_NODES
+            return
+        raise Timeout()
+
     def get_move(self, game, legal_moves, time_left):
         """This function searches for the best move from the available legal moves and returns a
         result before the time limit expires.
@@ -441,50 +928,243 @@ class CustomPlayer:
             (-1, -1) if there are no available legal moves.
         """
 
-        self.time_left = time_left
+        ## Positions solved by the tablebase need no search
+        if self.tablebase is not None:
+            probe = self.tablebase.best_move(game)
+            if probe is not None:
+                self.last_stats = None
+                return(probe[0])
 
-        try:
+        ## This routine takes the best move as quickly as possible first (depth one),
+        ## then keeps the result of every deeper iteration that completes in time
+        best_move = (-1, -1)
+        for result in self.iter_search(game, time_left):
+            best_move = result.best_move
 
-            ## This routine calls for the best move as quickly as possible first. 
-            ## Then, while time remains, it looks at iterative deepening for each of 
-            ## the specified method.
+        # Returns the best move from the last completed search iteration
+        if best_move in legal_moves:
+            return(best_move)
+        elif not legal_moves:
+            return((-1,-1))
+        ## The budget ran out before the depth one search completed (or every
+        ## move loses): any legal move is better than forfeiting the game
+        return(legal_moves[0])
 
-            ## In iterative deepening, it explores the nodes at each depth
-            ## increasing it by one level every time. It saves the previous
-            ## result, so when time runs of it returns the best move to the player
+    def _finish_stats(self, stats, start):
+        """Close the SearchStats record for the current get_move() call and
+        hand it to the callback (if any).
+        """
+        stats.cutoffs = self._cutoffs
+        stats.cache_hits = self._cache_hits
+        stats.elapsed = curr_time_millis() - start
+        self.last_stats = stats
+        if self.stats_callback is not None:
+            self.stats_callback(stats)
+
+    def _evaluator(self):
+        """ Return the function scoring the leaves of a search. """
+        evaluate = self.score if self._eval_cache is None else self._cached_score
+        if self.tablebase is None:
+            return evaluate
+        tablebase = self.tablebase
+
+        def probe_first(game, player):
+            plies = tablebase.probe(game)
+            if plies is None:
+                return evaluate(game, player)
+            ## An odd number of plies left is a win for the player to move
+            if (plies % 2 == 1) == (game.active_player == player):
+                return float("inf")
+            return float("-inf")
+
+        return probe_first
+
+    def _cached_score(self, game, player):
+        """ Score a position through the evaluation cache. """
+        key = (bytes(itertools.chain.from_iterable(game.__board_state__)),
+               game.__last_player_move__[game.__player_1__],
+               game.__last_player_move__[game.__player_2__],
+               player is game.__player_1__)
+        value = self._eval_cache.get(key)
+        if value is not None:
+            self._cache_hits += 1
+            return value
+        if len(self._eval_cache) >= self.cache_size:
+            self._eval_cache.clear()
+        value = self._eval_cache[key] = self.score(game, player)
+        return value
+
+    def __getstate__(self):
+        ## Copies sent to worker processes start with an empty cache and no pool
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_pool_config"] = None
+        if self._eval_cache is not None:
+            state["_eval_cache"] = {}
+        return state
+
+    def analyze(self, game, depth_or_time):
+        """Search a position for its active player without a game clock.
 
+        Parameters
+        ----------
+        game : `isolation.Board` or tuple
+            The position, as a board or encoded by `Board.to_state()`.
 
-            d = 1
-            if self.method == "minimax":
-                best_score, best_move = self.minimax(game, 1)
+        depth_or_time : int or float
+            An int searches to that fixed depth; a float is a time budget in
+            milliseconds for iterative deepening: the iteration running when
+            the budget is spent is interrupted (the clock is read every
+            DEADLINE_CHECK_NODES nodes), but the depth one search always
+            completes.
 
-                ## A high margin is given for searching moves,especially for playing in tournaments
-                ## where time is really important to get back to the quick best move
-                while self.time_left() >= 600: 
-                    if self.iterative:
-                        d = d + 1
-                        best_score, best_move = self.minimax(game, d)
-            elif self.method == "alphabeta":
-                best_score, best_move = self.alphabeta(game, 1)
+        Returns
+        ----------
+        SearchResult
+            (depth, score, best_move, pv, nodes, elapsed) of the deepest
+            completed search, where score is for the active player. The
+            `SearchStats` of the search are kept in `last_stats` as usual.
+        """
+        state = game.to_state() if isinstance(game, Board) else game
+        opponent = object()
+        if state[3] == 1:
+            board = Board.from_state(state, self, opponent)
+        else:
+            board = Board.from_state(state, opponent, self)
+        search = self.minimax if self.method == "minimax" else self.alphabeta
+
+        ## A clock (unlike a lambda) keeps the agent picklable
+        self.time_left = Clock(float("inf"))
+        self._nodes = 0
+        self._cutoffs = 0
+        self._cache_hits = 0
+        stats = SearchStats() if self.collect_stats else None
+        start = curr_time_millis()
+
+        if isinstance(depth_or_time, int):
+            depths = [depth_or_time]
+        else:
+            depths = range(1, max(len(board.get_blank_spaces()), 1) + 1)
+        result = None
+        try:
+            for depth in depths:
+                if depth == 2:
+                    ## Under a time budget, iterations past the first one
+                    ## are interrupted when the deadline passes
+                    self._deadline = start + depth_or_time
+                    if curr_time_millis() >= self._deadline:
+                        break
+                    self._node_limit = self._nodes + DEADLINE_CHECK_NODES
+                nodes = self._nodes
+                iteration_start = curr_time_millis()
+                try:
+                    score, move = search(board, depth)
+                except Timeout:
+                    break
+                now = curr_time_millis()
+                result = SearchResult(depth, score, move, list(self._pv[0]),
+                                      self._nodes, now - start)
+                if stats is not None:
+                    stats.iteration_times.append(now - iteration_start)
+                    stats.nodes_per_depth.append(self._nodes - nodes)
+                    stats.depth = depth
+                    stats.pv = result.pv
+                if self._nodes == nodes:
+                    break
+        finally:
+            self._deadline = None
+            self._node_limit = float("inf")
+
+        if stats is not None:
+            self._finish_stats(stats, start)
+        return result
+
+    def analyze_many(self, positions, depth_or_time, workers=None, chunksize=8):
+        """Analyse many positions in a pool of worker processes and yield the
+        results as they finish.
+
+        The pool is started on the first call and kept (with a copy of this
+        agent in every worker) until close() is called, so later calls do not
+        pay for starting processes. A call made after the settings of the
+        agent changed (heuristic or weights, search, cache or tablebase)
+        restarts the pool so that the workers copy the new settings; the
+        number of `workers` only applies when the pool starts. The positions
+        are sent in chunks of
+        `chunksize` consecutive positions; pass related positions (e.g., the
+        positions of one game) next to each other so that they are searched
+        by the same worker, whose evaluation cache (see `cache_size`) then
+        carries over from one position to the next.
 
-                ## A high margin is given for searching moves,especially for playing in tournaments
-                ## where time is really important to get back to the quick best move
-                while self.time_left() >= 600: 
-                    if self.iterative:
-                        d = d + 1
-                        best_score, best_move = self.alphabeta(game, d)
-                
+        Parameters
+        ----------
+        positions : iterable
+            Boards or encoded positions (see `Board.to_state()`).
+
+        depth_or_time : int or float
+            The search depth, or the time budget in milliseconds of each
+            position (see `analyze`).
+
+        workers : int (optional)
+            The number of worker processes (default: one per CPU core) when
+            the pool is started; 0 analyses the positions in this process.
+
+        Yields
+        ------
+        (int, SearchResult)
+            The index of a position in `positions` and its analysis, in the
+            order they finish.
+        """
+        states = [p.to_state() if isinstance(p, Board) else p for p in positions]
+        chunks = [list(enumerate(states))[i:i + chunksize]
+                  for i in range(0, len(states), chunksize)]
+
+        if workers == 0:
+            for chunk in chunks:
+                for index, state in chunk:
+                    yield index, self.analyze(state, depth_or_time)
+            return
+
+        config = self._analysis_config()
+        if self._pool is not None and config != self._pool_config:
+            self.close()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(workers or os.cpu_count(),
+                                             initializer=_init_analysis_worker,
+                                             initargs=(self,))
+            self._pool_config = config
+        futures = [self._pool.submit(_analyze_chunk, chunk, depth_or_time)
+                   for chunk in chunks]
+        try:
+            for future in as_completed(futures):
+                for item in future.result():
+                    yield item
+        finally:
+            for future in futures:
+                future.cancel()
 
-        except TimeoutError:
-            return(best_move)
+    def _analysis_config(self):
+        """ Return the settings copied by the workers of analyze_many(), pickled. """
+        return pickle.dumps((self.search_depth, self.iterative, self.score,
+                             self.method, self.TIMER_THRESHOLD, self.collect_stats,
+                             self.node_limit, self.cache_size, self.tablebase))
+
+    def close(self):
+        """ Shut down the worker pool of analyze_many(), if it was started. """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
 
-        # Returns the best move from the last completed search iteration
-        if best_move in legal_moves:
-            return(best_move)
-        elif not legal_moves:
-            return((-1,-1))
 
+## The copy of the agent used by each worker process of analyze_many(); it is
+## kept between tasks so that its evaluation cache serves later positions
+_analysis_agent = None
 
 
+def _init_analysis_worker(agent):
+    global _analysis_agent
+    _analysis_agent = agent
 
 
+def _analyze_chunk(chunk, depth_or_time):
+    return [(index, _analysis_agent.analyze(state, depth_or_time))
+            for index, state in chunk]
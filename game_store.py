@@ -0,0 +1,212 @@
+"""
+This file contains `GameStore`, an SQLite database of finished games kept in
+the binary game format (see isolation/gamefile.py) with an index of every
+position they passed through, so that all the games reaching a position can
+be found without replaying any of them.
+
+Every game is one row holding its encoded moves, the names of both agents
+and the winner (1 or 2). The positions table maps the Zobrist hash of each
+position (see `isolation.Zobrist`) to the games that reached it and the ply
+at which they did; it is keyed by (hash, game), so a lookup is a single
+range scan of the primary key.
+
+Import the games of tournament results files (see results_store.py) or of
+binary game files, then query positions by their moves from the empty board:
+
+    python game_store.py games.db import results.sqlite
+    python game_store.py games.db lookup 2,3 3,3 4,5
+"""
+
+import argparse
+import sqlite3
+
+from collections import namedtuple
+
+from isolation import Board
+from isolation import Zobrist
+from isolation import decode_game
+from isolation import encode_game
+from isolation import split_games
+from results_store import ResultsStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player_1 TEXT,
+    player_2 TEXT,
+    winner INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER NOT NULL,
+    game INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    PRIMARY KEY (hash, game)
+) WITHOUT ROWID;
+"""
+
+# A game loaded from the store: its id, the agent names (None if unknown)
+# and the decoded `isolation.GameData`
+StoredGame = namedtuple("StoredGame", ["id", "player_1", "player_2", "game"])
+
+# The games through a position: how many, and how many each player won
+PositionStats = namedtuple("PositionStats", ["games", "player_1_wins",
+                                             "player_2_wins"])
+
+
+class GameStore(object):
+    """Database of games in the binary game format, indexed by position.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite database file; created if it does not exist. Use
+        ":memory:" for a store that only lives as long as the object.
+
+    width, height : int (optional)
+        The board size of every game in the store.
+    """
+
+    def __init__(self, path, width=7, height=7):
+        self.path = path
+        self.zobrist = Zobrist(width, height)
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        """ Close the database connection. """
+        self._db.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def add_games(self, games):
+        """Add many games in a single transaction.
+
+        Parameters
+        ----------
+        games : iterable<(bytes, str, str)>
+            Every game encoded by `isolation.encode_game` with the names of
+            its players (or None).
+
+        Returns
+        ----------
+        list<int>
+            The ids of the new games.
+        """
+        ids = []
+        with self._db:
+            for data, player_1, player_2 in games:
+                game, _ = decode_game(data)
+                if (game.width, game.height) != (self.zobrist.width, self.zobrist.height):
+                    raise ValueError("Game played on a {}x{} board".format(game.width,
+                                                                           game.height))
+                cursor = self._db.execute("INSERT INTO games (player_1, player_2, "
+                                          "winner, data) VALUES (?, ?, ?, ?)",
+                                          (player_1, player_2, game.winner, data))
+                game_id = cursor.lastrowid
+                self._db.executemany("INSERT OR IGNORE INTO positions VALUES (?, ?, ?)",
+                                     [(value, game_id, ply + 1) for ply, value
+                                      in enumerate(self.zobrist.hash_game(game))])
+                ids.append(game_id)
+        return ids
+
+    def add_game(self, data, player_1=None, player_2=None):
+        """ Add one encoded game and return its id. """
+        return self.add_games([(data, player_1, player_2)])[0]
+
+    def import_results(self, results):
+        """Add every game of a `results_store.ResultsStore`.
+
+        Returns
+        ----------
+        int
+            The number of games added.
+        """
+        games = ((encode_game(list(g.opening) + list(g.moves), g.termination,
+                              len(g.opening), self.zobrist.width,
+                              self.zobrist.height), g.player_1, g.player_2)
+                 for g in results.games())
+        return len(self.add_games(games))
+
+    def games_through(self, position_hash):
+        """ Return (game id, ply) for every game that reached a position. """
+        return self._db.execute("SELECT game, ply FROM positions WHERE hash = ? "
+                                "ORDER BY game", (position_hash,)).fetchall()
+
+    def position_stats(self, position_hash):
+        """ Count the games through a position and the wins of each player. """
+        row = self._db.execute("SELECT COUNT(*), SUM(g.winner = 1), SUM(g.winner = 2) "
+                               "FROM positions p JOIN games g ON g.id = p.game "
+                               "WHERE p.hash = ?", (position_hash,)).fetchone()
+        return PositionStats(row[0], row[1] or 0, row[2] or 0)
+
+    def load(self, game_id):
+        """ Return the `StoredGame` with the given id. """
+        row = self._db.execute("SELECT id, player_1, player_2, data FROM games "
+                               "WHERE id = ?", (game_id,)).fetchone()
+        if row is None:
+            raise KeyError(game_id)
+        return StoredGame(row[0], row[1], row[2], decode_game(row[3])[0])
+
+    def hash_board(self, board):
+        """ Return the position hash of an `isolation.Board`. """
+        return self.zobrist.hash_board(board)
+
+
+def _parse_move(text):
+    row, col = text.split(",")
+    return int(row), int(col)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Store games indexed by "
+                                     "position and look positions up.")
+    parser.add_argument("database", help="SQLite game database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="add the games of results or game files")
+    importer.add_argument("files", nargs="+",
+                          help="SQLite results files (tournament.py --results) "
+                               "or binary game files")
+    lookup = commands.add_parser("lookup", help="list the games through a position")
+    lookup.add_argument("moves", nargs="*", metavar="row,col",
+                        help="moves from the empty board to the position")
+    lookup.add_argument("--limit", type=int, default=20,
+                        help="number of games listed")
+    args = parser.parse_args(args)
+
+    store = GameStore(args.database)
+    if args.command == "import":
+        for path in args.files:
+            with open(path, "rb") as f:
+                is_sqlite = f.read(16) == b"SQLite format 3\x00"
+            if is_sqlite:
+                results = ResultsStore(path)
+                count = store.import_results(results)
+                results.close()
+            else:
+                with open(path, "rb") as f:
+                    count = len(store.add_games((data, None, None)
+                                                for data in split_games(f.read())))
+            print("{}: {} games".format(path, count))
+        print("{} games in {}".format(len(store), args.database))
+    else:
+        board = Board(1, 2)
+        for move in args.moves:
+            board.apply_move(_parse_move(move))
+        position = store.hash_board(board)
+        stats = store.position_stats(position)
+        print("Position {:016x}: {} games, player 1 won {}, player 2 won {}".format(
+            position & (2 ** 64 - 1), stats.games, stats.player_1_wins,
+            stats.player_2_wins))
+        for game_id, ply in store.games_through(position)[:args.limit]:
+            stored = store.load(game_id)
+            print("  game {} ({} vs {}, winner {}): ply {} of {}".format(
+                game_id, stored.player_1, stored.player_2, stored.game.winner,
+                ply, len(stored.game.moves)))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,21 @@ import io
 
 # Make the Board class available at the root of the module for imports
 from .isolation import Board
+from .isolation import Clock
+from .isolation import MoveRecord
+from .async_game import play_async
+from .async_game import play_many
+from .gamefile import GameData
+from .gamefile import Zobrist
+from .gamefile import decode_game
+from .gamefile import encode_game
+from .gamefile import read_games
+from .gamefile import split_games
+from .gamefile import write_games
+from .workers import ProcessPlayer
 
 
-def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
+def game_as_text(winner, move_history, termination="", board=None):
     """
     Generate a printable representation for a game of isolation.
 
@@ -35,9 +47,10 @@ def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
         Valid reasons for termination include "" (none), "timeout", and
         "illegal move".
 
-    board : isolation.Board
+    board : isolation.Board (optional)
         An instance of `isolation.Board` encoding the game state (e.g., player
-        locations and blocked cells) for a game of isolation.
+        locations and blocked cells) before the first move of the history; the
+        moves are applied to it. A new empty board is used by default.
 
     Returns
     ----------
@@ -45,6 +58,9 @@ def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
         A string representation of a game of isolation.
     """
 
+    if board is None:
+        board = Board(1, 2)
+
     ans = io.StringIO()
 
     for i, move in enumerate(move_history):
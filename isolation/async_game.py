@@ -0,0 +1,155 @@
+"""
+This file contains an asyncio version of the `Board.play` game loop, so that
+one event loop can drive many games of Isolation at the same time.
+
+Agents may implement an asynchronous variant of the usual interface:
+
+    async def get_move_async(self, game, legal_moves, time_left)
+
+which is awaited directly on the event loop (e.g., agents that wait on a
+remote service). Agents that only provide the blocking get_move() are run in
+an executor so that CPU-bound searches do not stall the other games. In both
+cases the per-move deadline is enforced by `asyncio.wait_for`, and an agent
+that misses it forfeits the game by timeout.
+
+NOTE: an executor thread cannot be interrupted, so a blocking agent that
+misses its deadline keeps running in the background until get_move()
+returns; only its answer is discarded. Use a separate agent object for every
+concurrent game, since agents such as `CustomPlayer` keep per-search state.
+"""
+
+import asyncio
+
+from .isolation import Board
+from .isolation import Clock
+from .isolation import TIME_LIMIT_MILLIS
+
+
+async def request_move(player, game, legal_moves, time_left, executor=None):
+    """Ask `player` for a move without blocking the event loop.
+
+    Returns the result of player.get_move_async() when the agent implements
+    it; otherwise get_move() is run in `executor` (the loop's default
+    executor if None).
+    """
+    if hasattr(player, "get_move_async"):
+        return await player.get_move_async(game, legal_moves, time_left)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, player.get_move,
+                                      game, legal_moves, time_left)
+
+
+async def play_async(board, time_limit=TIME_LIMIT_MILLIS, executor=None,
+                     node_limit=None):
+    """
+    Execute a match between the players of `board` by alternately soliciting
+    them to select a move and applying it in the game; the coroutine
+    equivalent of `Board.play`.
+
+    Parameters
+    ----------
+    board : `isolation.Board`
+        The game to play. The board is advanced in place.
+
+    time_limit : numeric (optional)
+        The maximum number of milliseconds to allow before timeout
+        during each turn.
+
+    executor : `concurrent.futures.Executor` (optional)
+        The executor used for agents without a get_move_async() method.
+
+    node_limit : int (optional)
+        Play under a node-budget time control instead of the wall clock
+        (see `Board.play`).
+
+    Returns
+    ----------
+    (player, list<[(int, int),]>, str)
+        Return multiple including the winning player, the complete game
+        move history, and a string indicating the reason for losing
+        (e.g., timeout or invalid move).
+    """
+    move_history = []
+
+    timeout = time_limit / 1000.
+    if node_limit is not None:
+        time_limit = float("inf")
+        timeout = None
+
+    while True:
+
+        player = board.active_player
+        legal_player_moves = board.get_legal_moves()
+        game_copy = board.snapshot()
+
+        time_left = Clock(time_limit, node_limit)
+        try:
+            curr_move = await asyncio.wait_for(
+                request_move(player, game_copy, legal_player_moves,
+                             time_left, executor),
+                timeout=timeout)
+            move_end = time_left()
+        except asyncio.TimeoutError:
+            curr_move = Board.NOT_MOVED
+            move_end = -1
+
+        if curr_move is None:
+            curr_move = Board.NOT_MOVED
+
+        if player == board.__player_1__:
+            move_history.append([curr_move])
+        else:
+            move_history[-1].append(curr_move)
+
+        if move_end < 0:
+            return board.inactive_player, move_history, "timeout"
+
+        if curr_move not in legal_player_moves:
+            return board.inactive_player, move_history, "illegal move"
+
+        # drop the snapshot so that the move is applied in place
+        del game_copy
+        board.apply_move(curr_move)
+
+
+async def play_many(boards, time_limit=TIME_LIMIT_MILLIS, executor=None,
+                    max_concurrent=None, node_limit=None):
+    """Play every game in `boards` concurrently on the running event loop.
+
+    Parameters
+    ----------
+    boards : iterable<`isolation.Board`>
+        The games to play; each board is advanced in place.
+
+    time_limit : numeric (optional)
+        The maximum number of milliseconds to allow before timeout
+        during each turn.
+
+    executor : `concurrent.futures.Executor` (optional)
+        The executor used for agents without a get_move_async() method.
+
+    max_concurrent : int (optional)
+        Upper bound on the number of games in progress at once; None plays
+        all of them at the same time.
+
+    node_limit : int (optional)
+        Play under a node-budget time control instead of the wall clock
+        (see `Board.play`).
+
+    Returns
+    ----------
+    list<(player, list<[(int, int),]>, str)>
+        The result of `play_async` for each board, in the same order.
+    """
+    if max_concurrent is None:
+        return await asyncio.gather(*[play_async(board, time_limit, executor, node_limit)
+                                      for board in boards])
+
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def play_limited(board):
+        async with semaphore:
+            return await play_async(board, time_limit, executor, node_limit)
+
+    return await asyncio.gather(*[play_limited(board) for board in boards])
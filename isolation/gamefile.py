@@ -0,0 +1,210 @@
+"""
+This file contains a compact binary format for finished games of Isolation
+and the Zobrist hashing used to index the positions they pass through.
+
+A game is stored as a fixed header followed by the moves packed as cell
+indices (row * width + col), using as few bits as the board needs -- 6 bits
+per move on a 7x7 board, so a typical game takes about 35 bytes:
+
+    offset  size  field
+    0       4     magic b"ISOG"
+    4       1     format version
+    5       1     board width
+    6       1     board height
+    7       1     termination (index into TERMINATIONS)
+    8       1     number of opening moves (included in the moves)
+    9       2     number of moves (little endian)
+    11      ...   moves, packed most significant bit first
+
+Moves start from the empty board and include the opening. Every game of
+`Board.play` ends with the move that lost it (one that was illegal, or came
+too late), so the winner is the player who did not make the last move. That
+last move may be off the board: None (no move) and (-1, -1) (the usual answer
+when there are no legal moves) have codes of their own.
+
+Records are self-delimiting, so a file of games is simply their
+concatenation (see `write_games` and `read_games`).
+"""
+
+import random
+import struct
+
+from collections import namedtuple
+
+from .isolation import Board
+
+
+MAGIC = b"ISOG"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBBH")
+
+TERMINATIONS = ("", "timeout", "illegal move")
+
+NO_MOVE = (-1, -1)
+
+ZOBRIST_SEED = 20170214  # keys must never change: stored hashes depend on them
+
+# A decoded game: the moves (opening included) as (row, col) pairs, the
+# reason the game ended, the number of opening moves, the board size and the
+# winner (1 or 2)
+GameData = namedtuple("GameData", ["moves", "termination", "opening",
+                                   "width", "height", "winner"])
+
+
+def move_bits(width, height):
+    """ Return the number of bits used to store a move on a board. """
+    # two codes above the cells are kept for None and NO_MOVE
+    return (width * height + 1).bit_length()
+
+
+def encode_game(moves, termination="", opening=0, width=7, height=7):
+    """Encode a finished game in the binary game format.
+
+    Parameters
+    ----------
+    moves : list<(int, int)>
+        Every move of the game from the empty board, opening included (for
+        the `move_history` of `Board.play`, flatten the turns after the
+        opening moves).
+
+    termination : str
+        The reason the game ended, as returned by `Board.play`.
+
+    opening : int
+        The number of moves of `moves` that were the opening.
+
+    Returns
+    ----------
+    bytes
+    """
+    bits = move_bits(width, height)
+    codes = {None: (1 << bits) - 1, NO_MOVE: (1 << bits) - 2}
+    packed = 0
+    for move in moves:
+        if move in codes:
+            code = codes[move]
+        elif 0 <= move[0] < height and 0 <= move[1] < width:
+            code = move[0] * width + move[1]
+        else:
+            raise ValueError("Move {} cannot be encoded".format(move))
+        packed = (packed << bits) | code
+
+    size = (len(moves) * bits + 7) // 8
+    packed <<= 8 * size - len(moves) * bits
+    return HEADER.pack(MAGIC, VERSION, width, height,
+                       TERMINATIONS.index(termination), opening,
+                       len(moves)) + packed.to_bytes(size, "big")
+
+
+def decode_game(data, offset=0):
+    """Decode a game encoded by `encode_game` starting at `offset`.
+
+    Returns
+    ----------
+    (GameData, int)
+        The game and the offset of the first byte after it.
+    """
+    magic, version, width, height, termination, opening, count = \
+        HEADER.unpack_from(data, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a game record (version {})".format(VERSION))
+
+    bits = move_bits(width, height)
+    start = offset + HEADER.size
+    size = (count * bits + 7) // 8
+    packed = int.from_bytes(data[start:start + size], "big") >> (8 * size - count * bits)
+    mask = (1 << bits) - 1
+    moves = []
+    for shift in range((count - 1) * bits, -1, -bits):
+        code = (packed >> shift) & mask
+        if code == mask:
+            moves.append(None)
+        elif code == mask - 1:
+            moves.append(NO_MOVE)
+        else:
+            moves.append(divmod(code, width))
+
+    winner = 2 if count % 2 else 1
+    return (GameData(moves, TERMINATIONS[termination], opening, width, height,
+                     winner), start + size)
+
+
+def write_games(f, games):
+    """ Write encoded games (bytes) to a binary file object. """
+    for data in games:
+        f.write(data)
+
+
+def split_games(data):
+    """ Yield the encoded bytes of every game in a concatenation of games. """
+    offset = 0
+    while offset < len(data):
+        _, end = decode_game(data, offset)
+        yield data[offset:end]
+        offset = end
+
+
+def read_games(f):
+    """ Yield every game (as `GameData`) stored in a binary file object. """
+    data = f.read()
+    offset = 0
+    while offset < len(data):
+        game, offset = decode_game(data, offset)
+        yield game
+
+
+class Zobrist(object):
+    """Zobrist hashing of Isolation positions.
+
+    The hash of a position is the XOR of a random key for every blocked cell
+    and for the location of each player. The side to move needs no key: it
+    follows from the number of blocked cells. Keys are signed 64-bit integers
+    (so the hashes fit an SQLite INTEGER) drawn from a fixed seed, so hashes
+    are stable across runs.
+    """
+
+    def __init__(self, width=7, height=7, seed=ZOBRIST_SEED):
+        self.width = width
+        self.height = height
+        rng = random.Random("{}:{}x{}".format(seed, width, height))
+
+        def keys():
+            return [rng.getrandbits(64) - (1 << 63) for _ in range(width * height)]
+
+        self.blocked = keys()
+        self.locations = (keys(), keys())
+
+    def hash_board(self, board):
+        """ Return the hash of the position of an `isolation.Board`. """
+        width, _, _, _, cells, p1_loc, p2_loc = board.to_state()
+        value = 0
+        for idx, cell in enumerate(cells):
+            if cell != Board.BLANK:
+                value ^= self.blocked[idx]
+        for keys, loc in zip(self.locations, (p1_loc, p2_loc)):
+            if loc is not None:
+                value ^= keys[loc[0] * width + loc[1]]
+        return value
+
+    def hash_moves(self, moves):
+        """Return the hash of every position of a game, after each of the
+        legal `moves` from the empty board (updated incrementally).
+        """
+        hashes = []
+        value = 0
+        last = [None, None]
+        for ply, move in enumerate(moves):
+            player = ply % 2
+            idx = move[0] * self.width + move[1]
+            if last[player] is not None:
+                value ^= self.locations[player][last[player]]
+            value ^= self.blocked[idx] ^ self.locations[player][idx]
+            last[player] = idx
+            hashes.append(value)
+        return hashes
+
+    def hash_game(self, game):
+        """Return the hash of every position a decoded game passed through
+        (the last move of the game, which lost it, is never applied).
+        """
+        return self.hash_moves(game.moves[:-1])
@@ -9,13 +9,58 @@ be available to project reviewers.
 """
 
 import timeit
+import weakref
 
-from copy import deepcopy
+from collections import namedtuple
 from copy import copy
 
 
 TIME_LIMIT_MILLIS = 200
 
+# One entry of the optional move log kept by `Board.play`: the player (1 or
+# 2), the move returned, the milliseconds used and left on the clock, the
+# number of legal moves the player could choose from, and the search depth
+# reached (from the agent's `last_stats`; None if the agent does not report it)
+MoveRecord = namedtuple("MoveRecord", ["player", "move", "time_used",
+                                       "time_left", "num_legal", "depth"],
+                        defaults=(None,))
+
+
+class Clock(object):
+    """
+    Countdown timer for a turn, used as the `time_left` callable passed to
+    get_move(). A single clock can be restarted every turn, so the game loop
+    does not need to build a new timer function for each move.
+
+    Parameters
+    ----------
+    time_limit : numeric (optional)
+        The number of milliseconds allowed for each turn.
+
+    node_limit : int (optional)
+        The number of search nodes allowed for each turn under a node-budget
+        time control (see `Board.play`); None for wall-clock time control.
+        Agents that support node budgets read it from the clock they are
+        given; the clock itself does not enforce it.
+    """
+
+    def __init__(self, time_limit=TIME_LIMIT_MILLIS, node_limit=None):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.restart()
+
+    def restart(self):
+        """ Start counting down a new turn from the time limit. """
+        self.start = 1000 * timeit.default_timer()
+
+    def elapsed(self):
+        """ Return the number of milliseconds used in the current turn. """
+        return 1000 * timeit.default_timer() - self.start
+
+    def __call__(self):
+        """ Return the number of milliseconds left in the current turn. """
+        return self.time_limit - (1000 * timeit.default_timer() - self.start)
+
 
 class Board(object):
     """
@@ -40,6 +85,7 @@ class Board(object):
     """
     BLANK = 0
     NOT_MOVED = None
+    __readers__ = None  # boards sharing the game state (see snapshot)
 
     def __init__(self, player_1, player_2, width=7, height=7):
         self.width = width
@@ -99,9 +145,103 @@ class Board(object):
         new_board.__inactive_player__ = self.__inactive_player__
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        # cells only hold ints, so copying each row is a full deep copy
+        new_board.__board_state__ = [row[:] for row in self.__board_state__]
         return new_board
 
+    def snapshot(self):
+        """
+        Return a copy of the current board that shares the underlying game
+        state with this board until either of them is written to.
+
+        Taking a snapshot does not copy anything; a call to apply_move() on
+        either board makes that board copy the state it is about to modify
+        only if another board sharing it is still alive. This makes it cheap
+        to hand out a private copy of the game that is usually only read
+        (e.g., the `game` passed to get_move() each turn): once the snapshot
+        is dropped, this board writes to its state in place again.
+
+        Returns
+        ----------
+        `isolation.Board`
+            A board (of the same class as this one) encoding the same state.
+        """
+        new_board = object.__new__(type(self))
+        new_board.__dict__.update(self.__dict__)
+        if self.__readers__ is None:
+            self.__readers__ = weakref.WeakSet([self])
+        self.__readers__.add(new_board)
+        new_board.__readers__ = self.__readers__
+        return new_board
+
+    def __unshare__(self):
+        """Stop sharing the game state with snapshots, taking a private copy
+        of it if any other board sharing it is still alive.
+        """
+        readers = self.__readers__
+        readers.discard(self)
+        if readers:
+            self.__board_state__ = [row[:] for row in self.__board_state__]
+            self.__last_player_move__ = copy(self.__last_player_move__)
+        self.__readers__ = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("__readers__", None)
+        return state
+
+    def to_state(self):
+        """
+        Return a compact, picklable encoding of the game state that does not
+        reference the player objects.
+
+        Returns
+        ----------
+        tuple
+            (width, height, move_count, active, cells, p1_loc, p2_loc) where
+            active is 1 or 2 for the player holding initiative, cells is a
+            bytes object with the symbol of every cell in row-major order, and
+            p1_loc/p2_loc are the player locations (None before moving).
+        """
+        active = 1 if self.__active_player__ == self.__player_1__ else 2
+        cells = bytes(cell for row in self.__board_state__ for cell in row)
+        return (self.width, self.height, self.move_count, active, cells,
+                self.__last_player_move__[self.__player_1__],
+                self.__last_player_move__[self.__player_2__])
+
+    @classmethod
+    def from_state(cls, state, player_1, player_2):
+        """
+        Rebuild a board from the output of `Board.to_state()` with the given
+        player objects.
+
+        Parameters
+        ----------
+        state : tuple
+            A game state encoded by `Board.to_state()`.
+
+        player_1 : object
+            The object to register as the first player.
+
+        player_2 : object
+            The object to register as the second player.
+
+        Returns
+        ----------
+        `isolation.Board`
+            A new board encoding the same game state.
+        """
+        width, height, move_count, active, cells, p1_loc, p2_loc = state
+        board = cls(player_1, player_2, width=width, height=height)
+        board.move_count = move_count
+        if active == 2:
+            board.__active_player__ = player_2
+            board.__inactive_player__ = player_1
+        board.__board_state__ = [list(cells[i * width:(i + 1) * width])
+                                 for i in range(height)]
+        board.__last_player_move__ = {player_1: p1_loc, player_2: p2_loc}
+        return board
+
     def forecast_move(self, move):
         """
         Return a deep copy of the current game with an input move applied to
@@ -199,6 +339,8 @@ class Board(object):
         ----------
         None
         """
+        if self.__readers__ is not None:
+            self.__unshare__()
         row, col = move
         self.__last_player_move__[self.active_player] = move
         self.__board_state__[row][col] = self.__player_symbols__[self.active_player]
@@ -299,7 +441,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, move_log=None, node_limit=None):
         """
         Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
@@ -310,6 +452,17 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        move_log : list (optional)
+            If given, a `MoveRecord` is appended to the list for every move
+            requested during the game.
+
+        node_limit : int (optional)
+            If given, the game is played under a node-budget time control:
+            each agent may search `node_limit` nodes per turn (exposed as
+            `time_left.node_limit`), the wall clock is not limited and no
+            game is lost on time. This makes games between deterministic
+            agents exactly reproducible on any hardware.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -319,24 +472,30 @@ class Board(object):
         """
         move_history = []
 
-        curr_time_millis = lambda: 1000 * timeit.default_timer()
+        if node_limit is not None:
+            time_limit = float("inf")
+        time_left = Clock(time_limit, node_limit)
 
         while True:
 
             legal_player_moves = self.get_legal_moves()
 
-            game_copy = self.copy()
+            game_copy = self.snapshot()
 
-            move_start = curr_time_millis()
-            time_left = lambda : time_limit - (curr_time_millis() - move_start)
+            time_left.restart()
             curr_move = self.active_player.get_move(game_copy, legal_player_moves, time_left)
             move_end = time_left()
 
-            # print move_end
-
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
 
+            if move_log is not None:
+                player = 1 if self.active_player == self.__player_1__ else 2
+                stats = getattr(self.active_player, "last_stats", None)
+                move_log.append(MoveRecord(player, curr_move, time_left.elapsed(),
+                                           move_end, len(legal_player_moves),
+                                           getattr(stats, "depth", None)))
+
             if self.active_player == self.__player_1__:
                 move_history.append([curr_move])
             else:
@@ -348,4 +507,6 @@ class Board(object):
             if curr_move not in legal_player_moves:
                 return self.__inactive_player__, move_history, "illegal move"
 
+            # drop the snapshot so that the move is applied in place
+            del game_copy
             self.apply_move(curr_move)
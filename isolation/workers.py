@@ -0,0 +1,188 @@
+"""
+This file contains `ProcessPlayer`, a proxy that runs the get_move() function
+of an agent in a persistent worker process so that the game loop can enforce
+hard deadlines.
+
+`Board.play` only checks the clock after get_move() returns, so an agent that
+loops forever hangs the game (and every game queued behind it). A
+ProcessPlayer ships a compact copy of the board (see `Board.to_state`) to its
+worker and waits at most until the deadline plus a small grace period. If the
+worker has not answered by then it is terminated, the proxy returns no move
+and `Board.play` records the forfeit as a timeout. A fresh worker is started
+for the next request.
+
+Use the proxy in place of the agent it wraps:
+
+    player = ProcessPlayer(CustomPlayer())
+    winner, history, termination = Board(player, opponent).play()
+    player.close()
+"""
+
+import multiprocessing
+
+from .isolation import Board
+from .isolation import Clock
+
+
+GRACE_MILLIS = 50  # time allowed past the deadline before a worker is killed
+
+
+def _serve(agent, conn):
+    """Worker process loop: rebuild each board sent by the parent, call the
+    agent and send back its move (or the error it raised).
+    """
+    opponent = object()
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+
+        state, slot, time_limit, node_limit = request
+        time_left = Clock(time_limit, node_limit)
+        if slot == 1:
+            game = Board.from_state(state, agent, opponent)
+        else:
+            game = Board.from_state(state, opponent, agent)
+
+        try:
+            move = agent.get_move(game, game.get_legal_moves(), time_left)
+            conn.send((move, None, getattr(agent, "last_stats", None)))
+        except Exception as e:
+            conn.send((None, repr(e), None))
+
+
+class ProcessPlayer(object):
+    """Player proxy that runs another agent's get_move() in a worker process.
+
+    Parameters
+    ----------
+    agent : object
+        A picklable object with a get_move() function. The worker receives
+        its own copy of the agent, so state changed during the search (e.g.,
+        statistics) is not visible to the parent process.
+
+    grace : float (optional)
+        Number of milliseconds past the deadline to wait for an answer before
+        the worker is terminated.
+
+    Attributes
+    ----------
+    forfeits : int
+        The number of moves for which the worker had to be terminated.
+
+    errors : list<str>
+        The errors raised by the agent inside the worker.
+
+    last_stats : object
+        The search statistics the agent kept for the last move answered by
+        the worker (its `last_stats` attribute, if any; None otherwise).
+    """
+
+    def __init__(self, agent, grace=GRACE_MILLIS):
+        self.agent = agent
+        self.grace = grace
+        self.forfeits = 0
+        self.errors = []
+        self.last_stats = None
+        self._process = None
+        self._conn = None
+
+    def __repr__(self):
+        return "ProcessPlayer({!r})".format(self.agent)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_process"] = None
+        state["_conn"] = None
+        return state
+
+    def start(self):
+        """ Start the worker process if it is not already running. """
+        if self._process is not None and self._process.is_alive():
+            return
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve,
+                                                args=(self.agent, child_conn))
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+    def close(self):
+        """ Stop the worker process. """
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def kill(self):
+        """ Terminate the worker without waiting for it to finish. """
+        if self._process is None:
+            return
+        self._process.terminate()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def get_move(self, game, legal_moves, time_left):
+        """Forward the move request to the worker process.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        legal_moves : list<(int, int)>
+            A list containing legal moves. Moves are encoded as tuples of pairs
+            of ints defining the next (row, col) for the agent to occupy.
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        ----------
+        (int, int)
+            The move selected by the agent; None if the worker missed the
+            deadline or the agent raised an error.
+        """
+        self.start()
+        slot = 1 if game.__player_1__ is self else 2
+        budget = time_left()
+        node_limit = getattr(time_left, "node_limit", None)
+        self._conn.send((game.to_state(), slot, budget, node_limit))
+        self.last_stats = None
+
+        # there is no deadline to enforce under a node-budget time control
+        if budget == float("inf"):
+            timeout = None
+        else:
+            timeout = max(budget + self.grace, 0) / 1000.
+
+        if not self._conn.poll(timeout):
+            self.forfeits += 1
+            self.kill()
+            return None
+
+        try:
+            move, error, self.last_stats = self._conn.recv()
+        except EOFError:
+            move, error = None, "worker process exited unexpectedly"
+            self.kill()
+        if error is not None:
+            self.errors.append(error)
+        return move
@@ -0,0 +1,226 @@
+"""
+This file contains test cases for the `isolation` package: the game loops
+and the helpers built around `isolation.Board`.
+"""
+import asyncio
+import io
+import unittest
+
+import isolation
+import perft
+
+from sample_players import RandomPlayer
+
+
+class AsyncRandomPlayer(RandomPlayer):
+    """Random player using the asynchronous agent interface."""
+
+    async def get_move_async(self, game, legal_moves, time_left):
+        await asyncio.sleep(0.001)
+        return self.get_move(game, legal_moves, time_left)
+
+
+class StuckPlayer():
+    """Player that never answers within the deadline."""
+
+    async def get_move_async(self, game, legal_moves, time_left):
+        await asyncio.sleep(60)
+
+
+class LoopingPlayer():
+    """Player whose search never terminates."""
+
+    def get_move(self, game, legal_moves, time_left):
+        while True:
+            pass
+
+
+class AsyncGameTest(unittest.TestCase):
+
+    def test_many_games(self):
+        """ One event loop plays many games to completion """
+        boards = [isolation.Board(AsyncRandomPlayer(), RandomPlayer())
+                  for _ in range(50)]
+        results = asyncio.run(isolation.play_many(boards, time_limit=1000,
+                                                  max_concurrent=25))
+        self.assertEqual(len(results), len(boards))
+        for board, (winner, history, termination) in zip(boards, results):
+            self.assertIn(winner, (board.__player_1__, board.__player_2__))
+            self.assertEqual(termination, "illegal move")
+            self.assertTrue(history)
+
+    def test_deadline(self):
+        """ An agent that misses the deadline forfeits by timeout """
+        stuck, opponent = StuckPlayer(), RandomPlayer()
+        board = isolation.Board(stuck, opponent)
+        winner, history, termination = asyncio.run(
+            isolation.play_async(board, time_limit=20))
+        self.assertIs(winner, opponent)
+        self.assertEqual(termination, "timeout")
+        self.assertEqual(history, [[isolation.Board.NOT_MOVED]])
+
+
+class BoardStateTest(unittest.TestCase):
+
+    def test_state_round_trip(self):
+        """ Board.from_state rebuilds the board encoded by Board.to_state """
+        board = isolation.Board("p1", "p2", 5, 6)
+        for move in [(0, 0), (4, 4), (2, 1)]:
+            board.apply_move(move)
+        copy = isolation.Board.from_state(board.to_state(), "p1", "p2")
+        self.assertEqual(copy.to_state(), board.to_state())
+        self.assertEqual(copy.active_player, "p2")
+        self.assertEqual(copy.get_legal_moves(), board.get_legal_moves())
+        self.assertEqual(copy.to_string(), board.to_string())
+
+
+class GameFileTest(unittest.TestCase):
+
+    def play_game(self):
+        board = isolation.Board(RandomPlayer(), RandomPlayer())
+        _, history, termination = board.play()
+        return [move for turn in history for move in turn], termination
+
+    def test_round_trip(self):
+        """ Games survive encoding, including the move that lost them """
+        games = [self.play_game() for _ in range(3)]
+        games.append(([(3, 3), (0, 0), None], "timeout"))
+        encoded = [isolation.encode_game(moves, termination, 2)
+                   for moves, termination in games]
+        self.assertEqual(len(encoded[-1]), isolation.gamefile.HEADER.size + 3)
+
+        f = io.BytesIO()
+        isolation.write_games(f, encoded)
+        f.seek(0)
+        decoded = list(isolation.read_games(f))
+        self.assertEqual([(g.moves, g.termination) for g in decoded], games)
+        self.assertEqual(decoded[-1].winner, 2)
+        self.assertEqual(decoded[-1].opening, 2)
+
+    def test_incremental_hash_matches_board(self):
+        """ Hashing the moves of a game gives the hash of each board """
+        moves, _ = self.play_game()
+        zobrist = isolation.Zobrist()
+        board = isolation.Board("p1", "p2")
+        hashes = zobrist.hash_moves(moves[:-1])
+        for move, value in zip(moves[:-1], hashes):
+            board.apply_move(move)
+            self.assertEqual(zobrist.hash_board(board), value)
+        self.assertEqual(len(set(hashes)), len(hashes))
+        self.assertTrue(all(-2 ** 63 <= value < 2 ** 63 for value in hashes))
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_snapshot_copy_on_write(self):
+        """ A snapshot and its source stop sharing state once either moves """
+        board = isolation.Board("p1", "p2")
+        board.apply_move((0, 0))
+        snapshot = board.snapshot()
+        self.assertIs(snapshot.__board_state__, board.__board_state__)
+
+        snapshot.apply_move((3, 3))
+        self.assertEqual(board.get_player_location("p2"), None)
+        self.assertEqual(set(board.get_blank_spaces()),
+                         set(snapshot.get_blank_spaces()) | {(3, 3)})
+
+        other = board.snapshot()
+        board.apply_move((6, 6))
+        self.assertEqual(other.get_player_location("p2"), None)
+        self.assertEqual(other.move_count, 1)
+
+    def test_dropped_snapshot_not_copied(self):
+        """ The source writes in place once its snapshots are gone """
+        board = isolation.Board("p1", "p2")
+        board.apply_move((0, 0))
+        state = board.__board_state__
+        snapshot = board.snapshot()
+        child = snapshot.snapshot()
+        del snapshot
+        board.apply_move((3, 3))
+        self.assertIsNot(board.__board_state__, state)
+        self.assertEqual(child.move_count, 1)
+        self.assertEqual(child.get_player_location("p2"), None)
+
+        state = board.__board_state__
+        board.snapshot()
+        board.apply_move((5, 5))
+        self.assertIs(board.__board_state__, state)
+
+    def test_play_applies_moves_in_place(self):
+        """ Board.play only copies the rows when a player keeps its game """
+        class FirstMove(object):
+            def __init__(self, keep=False):
+                self.games = [] if keep else None
+
+            def get_move(self, game, legal_moves, time_left):
+                if self.games is not None:
+                    self.games.append(game)
+                return legal_moves[0] if legal_moves else None
+
+        board = isolation.Board(FirstMove(), FirstMove(), 5, 5)
+        state = board.__board_state__
+        board.play()
+        self.assertIs(board.__board_state__, state)
+
+        board = isolation.Board(FirstMove(keep=True), FirstMove(), 5, 5)
+        board.play()
+        kept = board.__player_1__.games
+        self.assertEqual([g.move_count for g in kept], list(range(0, 2 * len(kept), 2)))
+
+    def test_clock_restart(self):
+        """ A restarted clock counts down from the full time limit again """
+        clock = isolation.Clock(100)
+        clock.start -= 50
+        self.assertLess(clock(), 51)
+        clock.restart()
+        self.assertGreater(clock(), 90)
+
+
+class ProcessPlayerTest(unittest.TestCase):
+
+    def test_move_from_worker(self):
+        """ A proxied agent returns the moves of the wrapped agent """
+        player = isolation.ProcessPlayer(RandomPlayer())
+        try:
+            board = isolation.Board(RandomPlayer(), player)
+            board.apply_move((3, 3))
+            legal_moves = board.get_legal_moves()
+            move = player.get_move(board.copy(), legal_moves, lambda: 1000)
+            self.assertIn(move, legal_moves)
+        finally:
+            player.close()
+
+    def test_runaway_agent_forfeits(self):
+        """ An agent that never returns is stopped and loses on time """
+        player = isolation.ProcessPlayer(LoopingPlayer(), grace=10)
+        opponent = RandomPlayer()
+        try:
+            winner, _, termination = isolation.Board(player, opponent).play(time_limit=50)
+            self.assertIs(winner, opponent)
+            self.assertEqual(termination, "timeout")
+            self.assertEqual(player.forfeits, 1)
+        finally:
+            player.close()
+
+
+class PerftTest(unittest.TestCase):
+
+    def test_reference_counts(self):
+        """ Move generation reproduces the stored perft counts """
+        for name in perft.POSITIONS:
+            board = perft.make_position(name)
+            for depth in range(1, 4):
+                self.assertEqual(perft.perft(board, depth),
+                                 perft.REFERENCE[name][depth - 1], (name, depth))
+
+    def test_divide_sums_to_perft(self):
+        """ The counts below each root move add up to the perft count """
+        board = perft.make_position("midgame")
+        counts = perft.divide(board, 4)
+        self.assertEqual(sorted(counts), sorted(board.get_legal_moves()))
+        self.assertEqual(sum(counts.values()), perft.REFERENCE["midgame"][3])
+
+
+if __name__ == '__main__':
+    unittest.main()
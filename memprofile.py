@@ -0,0 +1,220 @@
+"""
+Profile the memory used by the search of `CustomPlayer`.
+
+Every node of the search builds a new `Board` with forecast_move() (the board
+itself, its dictionaries and the nested list of cells) and several lists of
+moves, and drops them again once the node is searched. This tool measures
+that churn for one or more engine configurations ("method:depth") on the
+perft position set (see perft.py) and prints them side by side:
+
+    python memprofile.py alphabeta:7 minimax:5
+
+Each configuration is run twice under `tracemalloc`:
+
+- A plain run records the peak memory of each search (one search is the work
+  of one get_move() call at that depth) and, through a `gc.callbacks` hook,
+  the garbage collections triggered and the time they took.
+
+- A second run keeps every board and move list created by the search alive
+  until it finishes, so that a tracemalloc snapshot sees all the memory the
+  search allocated for them. This gives the allocations per node and the top
+  allocating lines of isolation.py and game_agent.py. (tracemalloc can only
+  see live memory; without this the churn would have been freed already.)
+"""
+
+import argparse
+import contextlib
+import gc
+import linecache
+import os
+import timeit
+import tracemalloc
+
+from collections import namedtuple
+
+import bench
+
+from isolation import Board
+from game_agent import CustomPlayer
+from perft import make_position
+from sample_players import improved_score
+
+SOURCE_FILES = ("isolation.py", "game_agent.py")
+
+MemoryReport = namedtuple("MemoryReport", ["name", "searches", "nodes",
+                                           "peak_bytes", "alloc_blocks",
+                                           "alloc_bytes", "collections",
+                                           "gc_seconds", "top_sites"])
+
+
+class GCMonitor(object):
+    """Count the garbage collections run while the monitor is active (use it
+    as a context manager) and the time spent in them.
+
+    Attributes
+    ----------
+    collections : list<int>
+        The number of collections of each generation.
+
+    seconds : float
+        Total time spent collecting.
+    """
+
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.seconds = 0.
+        self._start = None
+
+    def _callback(self, phase, info):
+        if phase == "start":
+            self._start = timeit.default_timer()
+        elif self._start is not None:
+            self.seconds += timeit.default_timer() - self._start
+            self.collections[info["generation"]] += 1
+            self._start = None
+
+    def __enter__(self):
+        gc.callbacks.append(self._callback)
+        return self
+
+    def __exit__(self, *exc_info):
+        gc.callbacks.remove(self._callback)
+
+
+@contextlib.contextmanager
+def retain_allocations():
+    """Keep every board and move list created by Board methods alive until
+    the block exits, so that tracemalloc can attribute all of them.
+    """
+    kept = []
+    originals = {name: getattr(Board, name)
+                 for name in ("forecast_move", "get_legal_moves", "get_blank_spaces")}
+
+    def keeper(method):
+        def wrapper(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            kept.append(result)
+            return result
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(Board, name, keeper(method))
+    try:
+        yield kept
+    finally:
+        for name, method in originals.items():
+            setattr(Board, name, method)
+        del kept[:]
+
+
+def _searches(method, depth, positions):
+    """ Yield (agent, board) ready for one search of each position. """
+    for position in positions:
+        agent = CustomPlayer(search_depth=depth, score_fn=improved_score,
+                             method=method, iterative=False)
+        agent.time_left = lambda: float("inf")
+        yield agent, make_position(position, agent, "opponent")
+
+
+def profile_engine(method, depth, positions=bench.POSITIONS, top=10):
+    """Profile fixed-depth searches of `positions` with one search method.
+
+    Returns
+    ----------
+    MemoryReport
+        (name, searches, nodes, peak_bytes, alloc_blocks, alloc_bytes,
+        collections, gc_seconds, top_sites): the largest peak of a single
+        search, the blocks and bytes allocated by all searches, the garbage
+        collections of each generation and the time they took, and the `top`
+        lines of SOURCE_FILES allocating the most memory as
+        (file:line, bytes, blocks, source code).
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        # Plain run: peak memory and garbage collections
+        peak = 0
+        nodes = 0
+        gc.collect()
+        with GCMonitor() as monitor:
+            for agent, board in _searches(method, depth, positions):
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                getattr(agent, method)(board, depth)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+                nodes += agent._nodes
+
+        # Retaining run: every allocation of the search is still live in the snapshot
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        with retain_allocations():
+            for agent, board in _searches(method, depth, positions):
+                getattr(agent, method)(board, depth)
+            after = tracemalloc.take_snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    stats = [s for s in after.compare_to(before, "lineno") if s.size_diff > 0]
+    sites = [s for s in stats
+             if os.path.basename(s.traceback[0].filename) in SOURCE_FILES]
+    top_sites = []
+    for stat in sorted(sites, key=lambda s: -s.size_diff)[:top]:
+        frame = stat.traceback[0]
+        top_sites.append(("{}:{}".format(os.path.basename(frame.filename), frame.lineno),
+                          stat.size_diff, stat.count_diff,
+                          linecache.getline(frame.filename, frame.lineno).strip()))
+
+    return MemoryReport("{}:{}".format(method, depth), len(positions), nodes,
+                        peak, sum(s.count_diff for s in stats),
+                        sum(s.size_diff for s in stats), monitor.collections,
+                        monitor.seconds, top_sites)
+
+
+def print_reports(reports):
+    """ Print the reports of several configurations side by side. """
+    width = 16
+    rows = [("searches", lambda r: r.searches),
+            ("nodes", lambda r: r.nodes),
+            ("peak KiB/search", lambda r: "{:.1f}".format(r.peak_bytes / 1024.)),
+            ("blocks/node", lambda r: "{:.1f}".format(r.alloc_blocks / max(r.nodes, 1))),
+            ("bytes/node", lambda r: "{:.0f}".format(r.alloc_bytes / max(r.nodes, 1))),
+            ("gc gen0/1/2", lambda r: "/".join(str(c) for c in r.collections)),
+            ("gc ms", lambda r: "{:.1f}".format(1000 * r.gc_seconds))]
+    print("{:<18}".format("") + "".join("{:>{}}".format(r.name, width) for r in reports))
+    for label, value in rows:
+        print("{:<18}".format(label) +
+              "".join("{:>{}}".format(value(r), width) for r in reports))
+
+    for r in reports:
+        print("\nTop allocating lines for {}:".format(r.name))
+        for site, size, count, code in r.top_sites:
+            print("  {:<18}{:>9.1f} KiB{:>8} blocks  {}".format(site, size / 1024.,
+                                                              count, code[:60]))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Profile the memory "
+                                     "allocated by the search of CustomPlayer.")
+    parser.add_argument("configs", nargs="*", default=["alphabeta:7"],
+                        metavar="method:depth",
+                        help="engine configurations to compare (default: alphabeta:7)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of allocating lines to list")
+    args = parser.parse_args(args)
+
+    configs = []
+    for config in args.configs:
+        method, _, depth = config.partition(":")
+        if method not in bench.ENGINES or not depth.isdigit():
+            parser.error("expected method:depth with a method among {}, got {!r}".format(
+                ", ".join(bench.ENGINES), config))
+        configs.append((method, int(depth)))
+
+    print_reports([profile_engine(method, depth, top=args.top)
+                   for method, depth in configs])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+This file builds and reads opening suites: files of near-balanced starting
+positions for tournament.py.
+
+An opening is the pair of moves that places both players on the board. By
+default tournament.py picks both moves at random, and many of those
+positions are lost (or won) before the agents get to search, which adds
+noise that only more games can average out. `build_suite` searches every
+opening deeply with alpha-beta and keeps the ones whose score is closest to
+even; tournament.py --openings then plays its matches from those positions.
+
+Knight moves are symmetric under the rotations and reflections of a square
+board, so only one opening of each symmetry class is searched (and written)
+on square boards.
+
+The suite file holds one opening per line as "row,col row,col score", with
+'#' starting a comment:
+
+    # isolation opening suite: 7x7 board, depth 6, improved_score
+    0,0 0,1 0
+    0,1 2,5 0.5
+"""
+
+import argparse
+import math
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from isolation import Board
+from game_agent import CustomPlayer
+from sample_players import improved_score
+
+SEARCH_DEPTH = 6  # plies searched from each opening
+
+
+def _symmetries(width, height):
+    """ Return the maps of a (row, col) cell under the symmetries of the board. """
+    maps = [lambda r, c: (r, c),
+            lambda r, c: (height - 1 - r, c),
+            lambda r, c: (r, width - 1 - c),
+            lambda r, c: (height - 1 - r, width - 1 - c)]
+    if width == height:
+        maps += [lambda r, c: (c, r),
+                 lambda r, c: (c, height - 1 - r),
+                 lambda r, c: (width - 1 - c, r),
+                 lambda r, c: (width - 1 - c, height - 1 - r)]
+    return maps
+
+
+def canonical_openings(width=7, height=7):
+    """List one opening of each symmetry class of the board.
+
+    Returns
+    ----------
+    list<((int, int), (int, int))>
+        The openings as (player 1 location, player 2 location), sorted.
+    """
+    maps = _symmetries(width, height)
+    cells = [(r, c) for r in range(height) for c in range(width)]
+    openings = set()
+    for move_1 in cells:
+        for move_2 in cells:
+            if move_1 != move_2:
+                openings.add(min((f(*move_1), f(*move_2)) for f in maps))
+    return sorted(openings)
+
+
+def score_opening(opening, depth=SEARCH_DEPTH, score_fn=improved_score,
+                  width=7, height=7):
+    """Search the position after `opening` and return its alpha-beta score
+    from the point of view of player 1, who moves next.
+
+    The score is the average of the searches to `depth` and `depth` - 1
+    plies, which cancels most of the bias of evaluating only after the moves
+    of one player. It is +/-inf when the search finds a forced result.
+    `depth` must be at least 2: a depth 0 alpha-beta search does not stop
+    until the end of the game.
+    """
+    if depth < 2:
+        raise ValueError("The search depth of an opening must be at least 2")
+    agent = CustomPlayer(search_depth=depth, score_fn=score_fn,
+                         method='alphabeta', iterative=False,
+                         collect_stats=False)
+    agent.time_left = lambda: float("inf")
+    board = Board(agent, CustomPlayer(score_fn=score_fn), width, height)
+    for move in opening:
+        board.apply_move(move)
+    scores = [agent.alphabeta(board, d)[0] for d in (depth - 1, depth)]
+    return sum(scores) / 2.
+
+
+def build_suite(size=None, max_score=None, depth=SEARCH_DEPTH,
+                score_fn=improved_score, width=7, height=7, executor=None):
+    """Search every opening of the board and select the most balanced ones.
+
+    Parameters
+    ----------
+    size : int (optional)
+        Keep at most this many openings (all balanced openings if None).
+
+    max_score : float (optional)
+        Drop the openings whose score is further than this from zero.
+
+    depth : int (optional)
+        Number of plies searched from each opening.
+
+    executor : concurrent.futures.Executor (optional)
+        Used to search the openings in parallel (e.g., a process pool).
+
+    Returns
+    ----------
+    list<(((int, int), (int, int)), float)>
+        (opening, score) pairs from the most to the least balanced; openings
+        with a forced result are never included.
+    """
+    openings = canonical_openings(width, height)
+    search = partial(score_opening, depth=depth, score_fn=score_fn,
+                     width=width, height=height)
+    scores = executor.map(search, openings) if executor else map(search, openings)
+
+    suite = [(opening, score) for opening, score in zip(openings, scores)
+             if not math.isinf(score)
+             and (max_score is None or abs(score) <= max_score)]
+    suite.sort(key=lambda entry: (abs(entry[1]), entry[0]))
+    return suite[:size]
+
+
+def write_suite(path, suite, header=None):
+    """ Write (opening, score) pairs to an opening suite file. """
+    with open(path, "w") as f:
+        if header:
+            f.write("# {}\n".format(header))
+        for (move_1, move_2), score in suite:
+            f.write("{},{} {},{} {:g}\n".format(*move_1 + move_2 + (score,)))
+
+
+def read_suite(path):
+    """Read the openings of an opening suite file.
+
+    Returns
+    ----------
+    list<((int, int), (int, int))>
+        The openings in the order of the file.
+    """
+    openings = []
+    with open(path) as f:
+        for num, line in enumerate(f, 1):
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            try:
+                moves = tuple(tuple(int(v) for v in field.split(","))
+                              for field in fields[:2])
+                if len(moves) != 2 or any(len(m) != 2 for m in moves):
+                    raise ValueError
+            except ValueError:
+                raise ValueError("{}:{}: expected 'row,col row,col [score]', "
+                                 "got {!r}".format(path, num, line.strip()))
+            openings.append(moves)
+    return openings
+
+
+def deal_openings(openings, count, rng):
+    """
+    Draw `count` openings for a schedule from `rng`, going through the whole
+    suite (in a shuffled order) before any opening is repeated.
+    """
+    if not openings:
+        raise ValueError("The opening suite is empty")
+    dealt = []
+    while len(dealt) < count:
+        deck = list(openings)
+        rng.shuffle(deck)
+        dealt.extend(deck)
+    return dealt[:count]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Build a suite of balanced "
+                                     "openings for tournament.py --openings.")
+    parser.add_argument("output", help="opening suite file to write")
+    parser.add_argument("--size", type=int, default=None,
+                        help="number of openings to keep (default: all balanced ones)")
+    parser.add_argument("--max-score", type=float, default=None,
+                        help="largest absolute search score of a kept opening "
+                             "(default: no limit)")
+    parser.add_argument("--depth", type=int, default=SEARCH_DEPTH,
+                        help="plies searched from each opening")
+    parser.add_argument("--size-board", type=int, nargs=2, default=(7, 7),
+                        metavar=("WIDTH", "HEIGHT"), help="board dimensions")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes searching openings (0 = one per CPU core)")
+    args = parser.parse_args(args)
+    if args.depth < 2:
+        parser.error("--depth must be at least 2")
+
+    width, height = args.size_board
+    workers = args.workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        suite = build_suite(args.size, args.max_score, args.depth,
+                            width=width, height=height, executor=executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    write_suite(args.output, suite,
+                "isolation opening suite: {}x{} board, depth {}, {}".format(
+                    width, height, args.depth, improved_score.__name__))
+    print("Wrote {} openings to {}".format(len(suite), args.output))
+
+
+if __name__ == "__main__":
+    main()
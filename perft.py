@@ -0,0 +1,144 @@
+"""
+Perft (performance test) for the move generation of `isolation.Board`.
+
+perft(board, depth) counts the positions reached after exactly `depth` plies
+from `board` by walking the whole game tree with get_legal_moves() and
+forecast_move() -- the two operations every search is built on. The counts
+for a few fixed positions are stored in REFERENCE, so a change to the board
+representation can be checked for correctness (the counts must not change)
+and for speed (the leaves per second reported) in one run:
+
+    python perft.py                     # every position at its default depth
+    python perft.py midgame --depth 6   # one position, shallower
+    python perft.py opening --divide    # counts below each root move
+
+The exit status is 1 if any count differs from the reference.
+"""
+
+import argparse
+import sys
+import timeit
+
+from collections import namedtuple
+
+from isolation import Board
+
+
+# Move sequences from the empty 7x7 board (taken from one random game)
+_GAME = [(1, 2), (3, 5), (3, 1), (1, 6), (4, 3), (2, 4), (6, 4), (0, 3),
+         (5, 6), (1, 1), (4, 4), (3, 0), (5, 2), (2, 2), (3, 3), (3, 4),
+         (4, 5), (5, 5), (6, 6), (6, 3), (5, 4), (4, 2)]
+
+POSITIONS = {
+    "empty": [],
+    "opening": _GAME[:2],
+    "midgame": _GAME[:16],
+    "partition": _GAME[:22],  # few open cells left around each player
+}
+
+# Number of positions after 1, 2, ... plies from each position
+REFERENCE = {
+    "empty": [49, 2352, 11280, 52672, 232416],
+    "opening": [6, 36, 148, 650, 2665, 10420, 38669, 145269],
+    "midgame": [6, 42, 151, 525, 1100, 2300, 4360, 7949, 15417, 30261],
+    "partition": [2, 8, 15, 38, 63, 120, 196, 342, 618, 774, 957, 1281,
+                  1361, 1408, 921, 725],
+}
+
+PerftResult = namedtuple("PerftResult", ["position", "depth", "leaves",
+                                         "expected", "seconds"])
+
+
+def make_position(name, player_1="player1", player_2="player2"):
+    """ Return a new board with the moves of POSITIONS[name] applied. """
+    board = Board(player_1, player_2)
+    for move in POSITIONS[name]:
+        board.apply_move(move)
+    return board
+
+
+def perft(board, depth):
+    """ Count the positions reached after exactly `depth` plies from `board`. """
+    moves = board.get_legal_moves()
+    if depth == 1:
+        return len(moves)  # bulk counting: the leaves are not built
+    return sum(perft(board.forecast_move(move), depth - 1) for move in moves)
+
+
+def divide(board, depth):
+    """ Return the perft count below each legal move of `board`. """
+    if depth == 1:
+        return {move: 1 for move in board.get_legal_moves()}
+    return {move: perft(board.forecast_move(move), depth - 1)
+            for move in board.get_legal_moves()}
+
+
+def run(name, depth=None):
+    """Run perft on a stored position and compare it with the reference.
+
+    Parameters
+    ----------
+    name : str
+        A key of POSITIONS.
+
+    depth : int (optional)
+        The number of plies (the deepest reference count by default).
+
+    Returns
+    ----------
+    PerftResult
+        (position, depth, leaves, expected, seconds), where expected is the
+        reference count (None when there is none for this depth).
+    """
+    reference = REFERENCE[name]
+    depth = depth or len(reference)
+    board = make_position(name)
+    start = timeit.default_timer()
+    leaves = perft(board, depth)
+    seconds = timeit.default_timer() - start
+    expected = reference[depth - 1] if depth <= len(reference) else None
+    return PerftResult(name, depth, leaves, expected, seconds)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Count the positions of the "
+                                     "game tree from fixed positions (perft).")
+    parser.add_argument("positions", nargs="*", metavar="position",
+                        help="positions to run (default: all of " +
+                             ", ".join(POSITIONS) + ")")
+    parser.add_argument("--depth", type=int, default=None,
+                        help="plies to search (default: deepest reference count)")
+    parser.add_argument("--divide", action="store_true",
+                        help="print the count below each root move")
+    args = parser.parse_args(args)
+    unknown = [name for name in args.positions if name not in POSITIONS]
+    if unknown:
+        parser.error("unknown positions: " + ", ".join(unknown))
+
+    failed = False
+    print("{:<10}{:>6}{:>12}{:>10}{:>12}  {}".format(
+        "Position", "Depth", "Leaves", "Seconds", "Leaves/s", "Check"))
+    for name in args.positions or list(POSITIONS):
+        if args.divide:
+            board = make_position(name)
+            depth = args.depth or len(REFERENCE[name])
+            for move, count in sorted(divide(board, depth).items()):
+                print("  {}: {}".format(move, count))
+
+        result = run(name, args.depth)
+        if result.expected is None:
+            check = "no reference"
+        elif result.leaves == result.expected:
+            check = "ok"
+        else:
+            check = "FAILED (expected {})".format(result.expected)
+            failed = True
+        rate = result.leaves / result.seconds if result.seconds > 0 else 0.
+        print("{:<10}{:>6}{:>12}{:>10.3f}{:>12.0f}  {}".format(
+            name, result.depth, result.leaves, result.seconds, rate, check))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+This file contains `ProfiledPlayer`, a proxy that runs the get_move() function
+of an agent under cProfile, and the helpers tournament.py --profile uses to
+merge the profiles of every game (and every worker process) into one report
+per agent.
+
+Use the proxy in place of the agent it wraps:
+
+    player = ProfiledPlayer(CustomPlayer())
+    winner, history, termination = Board(player, opponent).play()
+    stats = pstats.Stats(RawStats(player.take_stats()))
+
+Only the get_move() call is profiled. The proxy hands the agent its own copy
+of the board with the agent registered as the player (see `Board.to_state`),
+which is built before the profiler starts. Profiling slows the agent down
+(typically about twice), so profiled agents lose more games to the clock;
+a node-budget time control (tournament.py --nodes) avoids that.
+"""
+
+import cProfile
+import os
+import pstats
+
+from isolation import Board
+
+
+# Time spent in these functions is reported under each category, keyed by the
+# (basename of the) file and the function name; '~' holds the built-ins.
+# Comprehensions count towards the function they are called from.
+CATEGORIES = [
+    ("move generation", {("isolation.py", "get_legal_moves"),
+                         ("isolation.py", "__get_moves__"),
+                         ("isolation.py", "move_is_legal"),
+                         ("isolation.py", "get_blank_spaces")}),
+    ("board copies", {("isolation.py", "copy"),
+                      ("isolation.py", "forecast_move"),
+                      ("isolation.py", "snapshot"),
+                      ("isolation.py", "__unshare__"),
+                      ("isolation.py", "__init__"),
+                      ("isolation.py", "apply_move")}),
+    ("heuristic", {("game_agent.py", "custom_score"),
+                   ("game_agent.py", "manhattan_distance"),
+                   ("game_agent.py", "score_features"),
+                   ("game_agent.py", "_cached_score"),
+                   ("game_agent.py", "flood_score"),
+                   ("game_agent.py", "flood_features"),
+                   ("game_agent.py", "blank_bitboard"),
+                   ("game_agent.py", "_bit_count"),
+                   ("game_agent.py", "probe_first"),
+                   ("tablebase.py", "probe"),
+                   ("game_agent.py", "__call__"),
+                   ("sample_players.py", "null_score"),
+                   ("sample_players.py", "open_move_score"),
+                   ("sample_players.py", "improved_score"),
+                   ("isolation.py", "is_winner"),
+                   ("isolation.py", "is_loser"),
+                   ("isolation.py", "get_opponent"),
+                   ("isolation.py", "get_player_location")}),
+    ("timer", {("isolation.py", "__call__"),
+               ("isolation.py", "elapsed"),
+               ("game_agent.py", "curr_time_millis"),
+               ("~", "<built-in method time.perf_counter>")}),
+]
+
+COMPREHENSIONS = ("<listcomp>", "<dictcomp>", "<setcomp>", "<genexpr>")
+
+
+class RawStats(object):
+    """Wrap the raw statistics of a profile (see `ProfiledPlayer.take_stats`)
+    so that `pstats.Stats` can load them.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfiledPlayer(object):
+    """Player proxy that profiles the get_move() function of another agent.
+
+    Parameters
+    ----------
+    agent : object
+        An object with a get_move() function. The profile is collected in
+        the process that calls get_move(), so a proxy sent to a worker
+        process profiles (and keeps) the moves played there.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.moves = 0
+        self._profile = None
+
+    def __repr__(self):
+        return "ProfiledPlayer({!r})".format(self.agent)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_profile"] = None
+        return state
+
+    @property
+    def last_stats(self):
+        """ The search statistics of the agent's last move (if it keeps any). """
+        return getattr(self.agent, "last_stats", None)
+
+    def get_move(self, game, legal_moves, time_left):
+        """ Call the agent's get_move() under the profiler. """
+        opponent = object()
+        if game.__player_1__ is self:
+            board = Board.from_state(game.to_state(), self.agent, opponent)
+        else:
+            board = Board.from_state(game.to_state(), opponent, self.agent)
+
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+        self.moves += 1
+        return self._profile.runcall(self.agent.get_move, board, legal_moves,
+                                     time_left)
+
+    def take_stats(self):
+        """Return the raw statistics of the moves profiled so far and start a
+        new profile.
+
+        Returns
+        ----------
+        dict
+            The raw (picklable) statistics of `cProfile.Profile`, or None if
+            no move was profiled.
+        """
+        if self._profile is None:
+            return None
+        self._profile.create_stats()
+        stats = self._profile.stats
+        self._profile = None
+        return stats
+
+
+def merge_stats(profiles, name, stats):
+    """ Add raw statistics to the `pstats.Stats` of `name` in `profiles`. """
+    if stats is None:
+        return
+    if name in profiles:
+        profiles[name].add(RawStats(stats))
+    else:
+        profiles[name] = pstats.Stats(RawStats(stats))
+
+
+def category_times(stats):
+    """Split the time of a profile between CATEGORIES.
+
+    Returns
+    ----------
+    list<(str, float)>
+        The seconds spent in each category (own time of its functions), then
+        the rest of the time under "search and other"; the total is the time
+        spent in get_move().
+    """
+    lookup = {}
+    for category, functions in CATEGORIES:
+        for key in functions:
+            lookup[key] = category
+    other = "search and other"
+    times = dict((category, 0.) for category, _ in CATEGORIES + [(other, None)])
+
+    def categorize(key):
+        filename, _, function = key
+        return lookup.get((os.path.basename(filename), function), other)
+
+    for key, (_, _, tottime, _, callers) in stats.stats.items():
+        if key[2] in COMPREHENSIONS and callers:
+            # split the time between the callers by their share of it
+            total = sum(timing[3] for timing in callers.values()) or 1.
+            for caller, timing in callers.items():
+                times[categorize(caller)] += tottime * timing[3] / total
+        else:
+            times[categorize(key)] += tottime
+    return [(category, times[category]) for category, _ in CATEGORIES] + \
+        [(other, times[other])]
+
+
+def print_profile(name, stats, top=15):
+    """ Print the time split and the top functions of an agent's profile. """
+    print("\n\nProfile of {}:".format(name))
+    print("----------")
+    times = category_times(stats)
+    total = sum(t for _, t in times) or 1.
+    for category, seconds in times:
+        print("  {:<18}{:>9.3f} s{:>7.1f}%".format(category, seconds,
+                                                   100. * seconds / total))
+    stats.sort_stats("cumulative").print_stats(top)
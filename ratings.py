@@ -0,0 +1,218 @@
+"""
+This file contains the statistics used by tournament.py to decide when a
+pairing of agents has been played enough, and to turn game results into
+ratings.
+
+Games of Isolation cannot be drawn, so every result is a win or a loss and
+the tests below use the binomial model of the Elo scale: a player rated
+`elo` points above its opponent is expected to win a fraction
+1 / (1 + 10 ** (-elo / 400)) of the games.
+"""
+
+import math
+
+
+def expected_score(elo):
+    """ Expected fraction of games won with a rating advantage of `elo`. """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+class SPRT(object):
+    """Sequential probability ratio test of the rating difference between two
+    agents.
+
+    The test compares H0: the agent is `elo0` points stronger than its
+    opponent, against H1: it is `elo1` points stronger. Games are added until
+    the log-likelihood ratio of the results leaves the interval set by the
+    error rates, at which point the hypothesis on that side is accepted.
+
+    Parameters
+    ----------
+    elo0 : float (optional)
+        Rating difference under the null hypothesis.
+
+    elo1 : float (optional)
+        Rating difference under the alternative hypothesis.
+
+    alpha : float (optional)
+        Probability of accepting H1 when H0 is true.
+
+    beta : float (optional)
+        Probability of accepting H0 when H1 is true.
+    """
+
+    def __init__(self, elo0=0., elo1=100., alpha=0.05, beta=0.05):
+        if elo0 >= elo1:
+            raise ValueError("elo1 must be larger than elo0")
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+
+        p0 = expected_score(elo0)
+        p1 = expected_score(elo1)
+        self._win_weight = math.log(p1 / p0)
+        self._loss_weight = math.log((1. - p1) / (1. - p0))
+
+    def llr(self, wins, losses):
+        """ Log-likelihood ratio of H1 over H0 for the results so far. """
+        return wins * self._win_weight + losses * self._loss_weight
+
+    def status(self, wins, losses):
+        """Return "H1" or "H0" once the corresponding hypothesis is accepted,
+        or None while the test is still undecided.
+        """
+        llr = self.llr(wins, losses)
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+
+class BradleyTerry(object):
+    """Bradley-Terry (Elo scale) ratings fitted to a stream of game results.
+
+    Results are added one game at a time with `add_game`, and `ratings()`
+    refits the model from the current totals. Each fit starts from the
+    previous estimate, so refitting after every few games (e.g., as results
+    stream in from worker processes) only takes a few iterations.
+
+    Every agent is also credited with `prior` wins and `prior` losses
+    against a virtual opponent, which keeps the ratings of unbeaten (or
+    winless) agents finite. Ratings are reported relative to the average
+    of all agents.
+
+    Parameters
+    ----------
+    prior : float (optional)
+        Number of virtual wins and losses of each agent against the virtual
+        opponent.
+    """
+
+    SCALE = 400. / math.log(10.)  # Elo points per unit of log-strength
+
+    def __init__(self, prior=1.):
+        self.prior = prior
+        self.players = []
+        self.wins = {}  # (winner, loser) -> number of games
+        self._strength = {}
+
+    def add_player(self, player):
+        """ Register a player (players are also added by their first game). """
+        if player not in self._strength:
+            self.players.append(player)
+            self._strength[player] = 1.
+
+    def add_game(self, winner, loser, count=1):
+        """ Record `count` wins of `winner` over `loser`. """
+        self.add_player(winner)
+        self.add_player(loser)
+        self.wins[(winner, loser)] = self.wins.get((winner, loser), 0) + count
+
+    def games(self, player):
+        """ Number of (real) games played by `player`. """
+        return sum(n for (a, b), n in self.wins.items() if player in (a, b))
+
+    def _fit(self, tolerance=1e-9, max_iterations=10000):
+        """Update the strength of every player with the minorization-
+        maximization algorithm of Hunter (2004), starting from the previous
+        estimate.
+        """
+        won = {p: self.prior for p in self.players}
+        pairs = {}
+        for (a, b), n in self.wins.items():
+            won[a] += n
+            key = (a, b) if self.players.index(a) < self.players.index(b) else (b, a)
+            pairs[key] = pairs.get(key, 0) + n
+
+        strength = self._strength
+        for _ in range(max_iterations):
+            change = 0.
+            for p in self.players:
+                # games against the virtual opponent (strength 1)
+                denom = 2 * self.prior / (strength[p] + 1.)
+                for (a, b), n in pairs.items():
+                    if p == a or p == b:
+                        denom += n / (strength[a] + strength[b])
+                new = won[p] / denom
+                change = max(change, abs(math.log(new / strength[p])))
+                strength[p] = new
+            if change < tolerance:
+                break
+        return pairs
+
+    def _covariance(self, pairs):
+        """ Inverse of the Fisher information of the log-strengths. """
+        n = len(self.players)
+        index = {p: i for i, p in enumerate(self.players)}
+        strength = self._strength
+        info = [[0.] * n for _ in range(n)]
+        for p in self.players:
+            q = strength[p] / (strength[p] + 1.)
+            info[index[p]][index[p]] += 2 * self.prior * q * (1. - q)
+        for (a, b), games in pairs.items():
+            q = strength[a] / (strength[a] + strength[b])
+            w = games * q * (1. - q)
+            i, j = index[a], index[b]
+            info[i][i] += w
+            info[j][j] += w
+            info[i][j] -= w
+            info[j][i] -= w
+        return _invert(info)
+
+    def ratings(self, z=1.96):
+        """Fit the model and return the rating of every player.
+
+        Parameters
+        ----------
+        z : float (optional)
+            Width of the confidence interval in standard errors (1.96 gives
+            a 95% interval).
+
+        Returns
+        ----------
+        list<(player, float, float, int)>
+            (player, elo, interval, games) sorted from strongest to weakest,
+            where elo is relative to the average of all players and lies
+            within elo +/- interval with the requested confidence.
+        """
+        if not self.players:
+            return []
+        pairs = self._fit()
+        c = self._covariance(pairs)
+
+        # Report ratings relative to the average player; the variance of
+        # theta_i - mean(theta) removes the (large) uncertainty of the origin
+        n = len(self.players)
+        log_strength = [math.log(self._strength[p]) for p in self.players]
+        mean = sum(log_strength) / n
+        row_means = [sum(row) / n for row in c]
+        total_mean = sum(row_means) / n
+
+        table = []
+        for i, p in enumerate(self.players):
+            elo = self.SCALE * (log_strength[i] - mean)
+            variance = c[i][i] - 2 * row_means[i] + total_mean
+            interval = z * self.SCALE * math.sqrt(max(variance, 0.))
+            table.append((p, elo, interval, self.games(p)))
+        return sorted(table, key=lambda row: -row[1])
+
+
+def _invert(matrix):
+    """ Invert a small positive definite matrix by Gauss-Jordan elimination. """
+    n = len(matrix)
+    a = [row[:] + [1. if i == j else 0. for j in range(n)]
+         for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        scale = a[col][col]
+        a[col] = [v / scale for v in a[col]]
+        for r in range(n):
+            if r != col and a[r][col]:
+                factor = a[r][col]
+                a[r] = [v - factor * w for v, w in zip(a[r], a[col])]
+    return [row[n:] for row in a]
@@ -0,0 +1,153 @@
+"""
+This file contains `ResultsStore`, an append-only log of finished tournament
+games kept in an SQLite database, so that a tournament that dies part way
+through can be restarted without losing (or replaying) the games that were
+already played.
+
+Every game is stored as one row holding the names of both agents, the seed
+of the match, the opening moves, the winner, the reason the game ended, the
+time used by every move and the complete move list. The two games of a match
+are written in a single transaction under the key of the match, so a match
+is either fully recorded or not recorded at all.
+"""
+
+import json
+import math
+import sqlite3
+
+from collections import namedtuple
+
+
+# A finished game. player_1/player_2 and winner are agent names (winner is
+# None when neither player won), opening and moves are lists of (row, col)
+# moves and move_times holds the milliseconds used for each entry of moves.
+# time_left, depths and num_legal hold the milliseconds left on the clock,
+# the search depth reached (None if unknown) and the number of legal moves
+# for each entry of moves; they are None for games recorded without them.
+GameRecord = namedtuple("GameRecord", ["player_1", "player_2", "seed",
+                                       "opening", "winner", "termination",
+                                       "moves", "move_times", "time_left",
+                                       "depths", "num_legal"],
+                        defaults=(None, None, None))
+
+# Columns added after the first version of the schema (added to older files)
+TELEMETRY_COLUMNS = ("time_left", "depths", "num_legal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    match_key TEXT NOT NULL,
+    game INTEGER NOT NULL,
+    player_1 TEXT NOT NULL,
+    player_2 TEXT NOT NULL,
+    seed INTEGER,
+    opening TEXT NOT NULL,
+    winner TEXT,
+    termination TEXT NOT NULL,
+    moves TEXT NOT NULL,
+    move_times TEXT NOT NULL,
+    time_left TEXT,
+    depths TEXT,
+    num_legal TEXT,
+    PRIMARY KEY (match_key, game)
+)
+"""
+
+
+def _encode_moves(moves):
+    return json.dumps([list(m) if m is not None else None for m in moves],
+                      separators=(",", ":"))
+
+
+def _decode_moves(text):
+    return [tuple(m) if m is not None else None for m in json.loads(text)]
+
+
+def _encode_list(values):
+    if values is None:
+        return None
+    # JSON has no infinity (e.g., the time left under a node budget)
+    return json.dumps([None if isinstance(v, float) and math.isinf(v) else v
+                       for v in values], separators=(",", ":"))
+
+
+def _decode_list(text):
+    return None if text is None else json.loads(text)
+
+
+class ResultsStore(object):
+    """Append-only store of finished tournament games.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite database file; created if it does not exist. Use
+        ":memory:" for a store that only lives as long as the object.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute(SCHEMA)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(games)")]
+        for column in TELEMETRY_COLUMNS:
+            if column not in columns:
+                self._db.execute("ALTER TABLE games ADD COLUMN {} TEXT".format(column))
+        self._db.commit()
+
+    def close(self):
+        """ Close the database connection. """
+        self._db.close()
+
+    def add_match(self, match_key, games):
+        """Append the games of a finished match to the log.
+
+        Parameters
+        ----------
+        match_key : str
+            A key identifying the match within the tournament schedule.
+
+        games : list<GameRecord>
+            The games played in the match, in order.
+        """
+        rows = [(match_key, idx, g.player_1, g.player_2, g.seed,
+                 _encode_moves(g.opening), g.winner, g.termination,
+                 _encode_moves(g.moves), json.dumps(g.move_times),
+                 _encode_list(g.time_left), _encode_list(g.depths),
+                 _encode_list(g.num_legal))
+                for idx, g in enumerate(games)]
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO games (match_key, game, "
+                                 "player_1, player_2, seed, opening, winner, "
+                                 "termination, moves, move_times, time_left, "
+                                 "depths, num_legal) VALUES "
+                                 "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def matches(self):
+        """Load every recorded match.
+
+        Returns
+        ----------
+        dict<str, list<GameRecord>>
+            The games of each match keyed by the match key.
+        """
+        matches = {}
+        rows = self._db.execute("SELECT match_key, player_1, player_2, seed, "
+                                "opening, winner, termination, moves, "
+                                "move_times, time_left, depths, num_legal "
+                                "FROM games ORDER BY match_key, game")
+        for row in rows:
+            key, player_1, player_2, seed, opening, winner, termination, \
+                moves, move_times, time_left, depths, num_legal = row
+            matches.setdefault(key, []).append(GameRecord(
+                player_1, player_2, seed, _decode_moves(opening), winner,
+                termination, _decode_moves(moves), json.loads(move_times),
+                _decode_list(time_left), _decode_list(depths),
+                _decode_list(num_legal)))
+        return matches
+
+    def games(self):
+        """ Return every recorded game as a list of GameRecords. """
+        return [game for games in self.matches().values() for game in games]
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM games").fetchone()[0]
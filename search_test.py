@@ -0,0 +1,448 @@
+"""
+This file contains test cases for the search extensions of `CustomPlayer`
+(statistics, streaming and the other tooling built on top of get_move()).
+The search algorithms themselves are covered by agent_test.py.
+"""
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+import bench
+import isolation
+import game_agent
+import memprofile
+import tablebase
+
+from perft import make_position
+from sample_players import improved_score
+
+
+def make_board(agent, loc1=(3, 3), loc2=(0, 0), w=7, h=7):
+    """Create a board with the agent under test as player 1 and both players
+    already placed on the board.
+    """
+    board = isolation.Board(agent, 'null_agent', w, h)
+    board.apply_move(loc1)
+    board.apply_move(loc2)
+    return board
+
+
+class SearchStatsTest(unittest.TestCase):
+
+    def test_stats_recorded(self):
+        """ get_move() stores a SearchStats record and calls the callback """
+        records = []
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta',
+                                        stats_callback=records.append)
+        board = make_board(agent)
+        legal_moves = board.get_legal_moves()
+        move = agent.get_move(board, legal_moves, lambda: 99)
+
+        stats = agent.last_stats
+        self.assertEqual(records, [stats])
+        self.assertEqual(stats.depth, 1)
+        self.assertEqual(stats.nodes, len(legal_moves))
+        self.assertEqual(len(stats.iteration_times), stats.depth)
+        self.assertEqual(stats.pv[0], move)
+
+    def test_pv_follows_search_depth(self):
+        """ The principal variation covers every ply of the search """
+        agent = game_agent.CustomPlayer(score_fn=improved_score)
+        agent.time_left = lambda: 1e3
+        board = make_board(agent)
+        _, move = agent.minimax(board, 3)
+        self.assertEqual(len(agent._pv[0]), 3)
+        self.assertEqual(agent._pv[0][0], move)
+
+    def test_stats_disabled(self):
+        """ No record is built when statistics are switched off """
+        agent = game_agent.CustomPlayer(collect_stats=False)
+        board = make_board(agent)
+        agent.get_move(board, board.get_legal_moves(), lambda: 99)
+        self.assertIsNone(agent.last_stats)
+
+
+class IterSearchTest(unittest.TestCase):
+
+    def test_stream_can_be_stopped(self):
+        """ iter_search() yields every completed iteration until closed """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta')
+        board = make_board(agent)
+        results = []
+        search = agent.iter_search(board, lambda: 1e4)
+        for result in search:
+            results.append(result)
+            if result.depth == 3:
+                break
+        search.close()
+
+        self.assertEqual([r.depth for r in results], [1, 2, 3])
+        self.assertTrue(results[0].nodes < results[1].nodes < results[2].nodes)
+        self.assertEqual(results[-1].pv[0], results[-1].best_move)
+        self.assertEqual(agent.last_stats.depth, 3)
+
+    def test_fixed_depth_yields_once(self):
+        """ A non-iterative agent stops after the first iteration """
+        agent = game_agent.CustomPlayer(iterative=False)
+        board = make_board(agent)
+        results = list(agent.iter_search(board, lambda: 1e4))
+        self.assertEqual(len(results), 1)
+
+
+class NodeBudgetTest(unittest.TestCase):
+
+    def test_budget_limits_search(self):
+        """ The search never expands more nodes than the budget allows """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta')
+        board = make_board(agent)
+        clock = isolation.Clock(float("inf"), node_limit=200)
+        move = agent.get_move(board, board.get_legal_moves(), clock)
+
+        self.assertLessEqual(agent._nodes, 200)
+        self.assertGreater(agent.last_stats.depth, 1)
+        self.assertEqual(agent.last_stats.pv[0], move)
+        self.assertEqual(agent.get_move(board, board.get_legal_moves(), clock), move)
+
+    def test_tiny_budget_returns_legal_move(self):
+        """ A budget spent inside the depth one search still gives a legal move """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta')
+        board = make_board(agent)
+        clock = isolation.Clock(float("inf"), node_limit=1)
+        legal_moves = board.get_legal_moves()
+        self.assertIn(agent.get_move(board, legal_moves, clock), legal_moves)
+        self.assertEqual(agent.last_stats.depth, 0)
+
+    def test_node_budget_games_are_reproducible(self):
+        """ Games under a node budget repeat exactly """
+        histories = []
+        for _ in range(2):
+            players = [game_agent.CustomPlayer(score_fn=improved_score,
+                                               method='alphabeta'),
+                       game_agent.CustomPlayer(method='alphabeta')]
+            board = isolation.Board(*players)
+            board.apply_move((2, 3))
+            board.apply_move((4, 4))
+            winner, history, termination = board.play(node_limit=100)
+            self.assertNotEqual(termination, "timeout")
+            histories.append((players.index(winner), history))
+        self.assertEqual(histories[0], histories[1])
+
+
+class WeightedScoreTest(unittest.TestCase):
+
+    def test_default_weights(self):
+        """ The default weights reproduce the improved heuristic """
+        agent = game_agent.CustomPlayer()
+        board = make_board(agent, loc1=(2, 3), loc2=(4, 4))
+        score_fn = game_agent.WeightedScore()
+        for player in (agent, 'null_agent'):
+            self.assertEqual(score_fn(board, player), improved_score(board, player))
+
+    def test_player_loads_weights_file(self):
+        """ CustomPlayer evaluates states with the weights saved to a file """
+        weights = {"own_moves": 2., "opp_moves": -0.5, "overlap": 1.}
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            game_agent.WeightedScore(weights).save(path)
+            agent = game_agent.CustomPlayer(weights=path)
+        finally:
+            os.remove(path)
+
+        board = make_board(agent, loc1=(2, 3), loc2=(4, 4))
+        own, opp, _, _, overlap = game_agent.score_features(board, agent)
+        self.assertEqual(agent.score(board, agent), 2 * own - 0.5 * opp + overlap)
+        self.assertRaises(ValueError, game_agent.WeightedScore, {"mobility": 1.})
+
+
+class AnalyzeTest(unittest.TestCase):
+
+    def positions(self):
+        board = isolation.Board("p1", "p2")
+        states = []
+        for move in [(1, 2), (3, 5), (3, 1), (1, 6), (4, 3), (2, 4), (6, 4)]:
+            board.apply_move(move)
+            states.append(board.to_state())
+        return states[1:]
+
+    def test_analyze_matches_search(self):
+        """ A fixed-depth analysis gives the move of the search itself """
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+        board = make_board(agent)
+        agent.time_left = lambda: float("inf")
+        score, move = agent.alphabeta(board, 4)
+
+        result = agent.analyze(board.to_state(), 4)
+        self.assertEqual((result.depth, result.score, result.best_move),
+                         (4, score, move))
+        self.assertEqual(result.pv[0], move)
+        self.assertEqual(agent.last_stats.depth, 4)
+
+        result = agent.analyze(board, 50.)
+        self.assertGreaterEqual(result.depth, 1)
+        ## the deadline interrupts the last iteration instead of predicting it
+        self.assertLess(agent.last_stats.elapsed, 50. + 100.)
+        self.assertEqual(agent.last_stats.depth, result.depth)
+
+    def test_analyze_many(self):
+        """ Pooled results stream back for every position, same as in-process """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', cache_size=10000)
+        states = self.positions()
+        serial = dict(agent.analyze_many(states, 3, workers=0))
+        try:
+            for _ in range(2):  # the second call reuses the pool
+                pooled = dict(agent.analyze_many(states, 3, workers=2, chunksize=2))
+                self.assertEqual(sorted(pooled), list(range(len(states))))
+                for index, result in pooled.items():
+                    self.assertEqual(result[:5], serial[index][:5])
+        finally:
+            agent.close()
+
+    def test_analysed_agent_pickles(self):
+        """ An agent that ran analyze() can still be sent to a process """
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+        agent.analyze(self.positions()[0], 2)
+        copy = pickle.loads(pickle.dumps(agent))
+        self.assertEqual(copy.analyze(self.positions()[0], 2)[:5],
+                         agent.analyze(self.positions()[0], 2)[:5])
+
+    def test_pool_follows_settings(self):
+        """ The workers are restarted when the agent's heuristic changes """
+        agent = game_agent.CustomPlayer(method='alphabeta',
+                                        weights={"own_moves": 1.})
+        states = self.positions()
+        try:
+            dict(agent.analyze_many(states, 2, workers=1))
+            pool = agent._pool
+            dict(agent.analyze_many(states, 2, workers=1))
+            self.assertIs(agent._pool, pool)
+
+            agent.score = game_agent.WeightedScore({"opp_moves": -1.})
+            pooled = dict(agent.analyze_many(states, 2, workers=1))
+            self.assertIsNot(agent._pool, pool)
+            serial = dict(agent.analyze_many(states, 2, workers=0))
+            self.assertEqual({i: r[:5] for i, r in pooled.items()},
+                             {i: r[:5] for i, r in serial.items()})
+        finally:
+            agent.close()
+
+    def test_cache_reused(self):
+        """ Positions searched again are scored from the evaluation cache """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', cache_size=10000)
+        state = self.positions()[-1]
+        first = agent.analyze(state, 4)
+        self.assertEqual(agent.last_stats.cache_hits, 0)
+        second = agent.analyze(state, 4)
+        self.assertGreater(agent.last_stats.cache_hits, 0)
+        self.assertEqual(first[:5], second[:5])
+
+
+class FloodTest(unittest.TestCase):
+
+    def flood(self, board, loc):
+        """ Cells reachable from `loc` in knight moves over the blank cells """
+        blank = set(board.get_blank_spaces())
+        seen, frontier = set(), [loc]
+        while frontier:
+            r, c = frontier.pop()
+            for dr, dc in [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                           (1, -2), (1, 2), (2, -1), (2, 1)]:
+                cell = (r + dr, c + dc)
+                if cell in blank and cell not in seen:
+                    seen.add(cell)
+                    frontier.append(cell)
+        return seen
+
+    def test_features_match_board(self):
+        """ Bitboard floods agree with the legal moves and a set-based flood """
+        rand = random.Random(5)
+        partitioned = 0
+        for w, h in [(7, 7), (5, 6), (6, 5)]:
+            agent = game_agent.CustomPlayer()
+            board = isolation.Board(agent, "opponent", w, h)
+            for move in [(0, 0), (h - 1, w - 1)]:
+                board.apply_move(move)
+            while board.get_legal_moves():
+                for player in (agent, "opponent"):
+                    opponent = board.get_opponent(player)
+                    own = self.flood(board, board.get_player_location(player))
+                    opp = self.flood(board, board.get_player_location(opponent))
+                    features = game_agent.flood_features(board, player)
+                    self.assertEqual(features[:4], (
+                        len(board.get_legal_moves(player)),
+                        len(board.get_legal_moves(opponent)),
+                        len(own), len(opp)))
+                    self.assertEqual(features[6], len(own & opp))
+                    if not own & opp:
+                        ## walled in: every cell is reached first by its owner
+                        partitioned += 1
+                        self.assertEqual(features[4:6], (len(own), len(opp)))
+                board.apply_move(rand.choice(board.get_legal_moves()))
+        self.assertGreater(partitioned, 0)
+
+    def test_score(self):
+        """ Cells reached first and mobility add up; a stuck mover loses """
+        agent = game_agent.CustomPlayer()
+        board = make_position("midgame", agent, "opponent")
+        features = game_agent.flood_features(board, agent)
+        self.assertEqual(game_agent.flood_score(board, agent),
+                         features[4] - features[5] + features[0] - features[1])
+
+        board = isolation.Board(agent, "opponent", 3, 3)
+        for move in [(1, 1), (0, 0)]:
+            board.apply_move(move)
+        self.assertEqual(game_agent.flood_score(board, agent), float("-inf"))
+        self.assertEqual(game_agent.flood_score(board, "opponent"), float("inf"))
+
+
+class TablebaseTest(unittest.TestCase):
+
+    def brute_force(self, board):
+        """ Plies left with perfect play, by searching the whole game tree """
+        results = [self.brute_force(board.forecast_move(m))
+                   for m in board.get_legal_moves()]
+        if not results:
+            return 0
+        wins = [n for n in results if n % 2 == 0]
+        return 1 + (min(wins) if wins else max(results))
+
+    def random_position(self, rng, width, height):
+        board = isolation.Board("p1", "p2", width, height)
+        board.apply_move(rng.choice(board.get_blank_spaces()))
+        board.apply_move(rng.choice(board.get_legal_moves()))
+        while board.get_legal_moves() and rng.random() < 0.7:
+            board.apply_move(rng.choice(board.get_legal_moves()))
+        return board
+
+    def test_solved_game_is_exact(self):
+        """ The tablebase of a whole 4x3 game agrees with a full search """
+        tb = tablebase.Tablebase(4, 3, 10, tablebase.solve(4, 3, 10))
+        rng = random.Random(3)
+        for _ in range(100):
+            board = self.random_position(rng, 4, 3)
+            self.assertEqual(tb.probe(board), self.brute_force(board))
+        move, plies = tb.best_move(board)
+        if board.get_legal_moves():
+            self.assertEqual(tb.probe(board.forecast_move(move)), plies - 1)
+
+    def test_default_layers(self):
+        """ The default table covers whole tiny games and the 5x5 endgame """
+        self.assertEqual(tablebase.default_max_empty(4, 3), 10)
+        self.assertEqual(tablebase.default_max_empty(5, 5), 5)
+        self.assertEqual(tablebase.default_max_empty(7, 7), 2)
+        self.assertEqual(tablebase.default_max_empty(5, 5, 600), 0)
+
+    def test_file_and_endgame_probe(self):
+        """ A mapped endgame table covers only the positions it was built for """
+        path = os.path.join(tempfile.mkdtemp(), "tb.bin")
+        tablebase.write_tablebase(path, 5, 5, 3, tablebase.solve(5, 5, 3))
+        tb = pickle.loads(pickle.dumps(tablebase.Tablebase.open(path)))
+
+        # a crowded board: few empty cells left around the players
+        board = isolation.Board("p1", "p2", 5, 5)
+        for move in [(0, 0), (4, 4), (1, 2), (3, 2), (0, 4), (2, 0), (2, 3),
+                     (0, 1), (3, 1), (2, 2), (4, 3), (4, 1), (2, 4), (3, 3),
+                     (0, 3), (1, 4), (1, 1), (0, 2), (3, 0), (2, 1), (4, 2)]:
+            self.assertIsNone(tb.probe(board))
+            board.apply_move(move)
+        self.assertEqual(len(board.get_blank_spaces()), 4)
+        self.assertIsNone(tb.probe(board))
+        for move in board.get_legal_moves():
+            child = board.forecast_move(move)
+            self.assertEqual(tb.probe(child), self.brute_force(child))
+
+    def test_agent_plays_perfectly(self):
+        """ CustomPlayer takes tablebase moves at the root and probes leaves """
+        tb = tablebase.Tablebase(4, 3, 10, tablebase.solve(4, 3, 10))
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', tablebase=tb)
+        board = isolation.Board(agent, "opponent", 4, 3)
+        board.apply_move((0, 0))
+        board.apply_move((2, 3))
+        move = agent.get_move(board, board.get_legal_moves(),
+                              lambda: float("inf"))
+        self.assertEqual(move, tb.best_move(board)[0])
+
+        agent.time_left = lambda: float("inf")
+        score, _ = agent.alphabeta(board, 1)
+        won = tb.probe(board) % 2 == 1
+        self.assertEqual(score, float("inf") if won else float("-inf"))
+
+
+class BenchTest(unittest.TestCase):
+
+    def test_branching_factor(self):
+        """ A uniform tree has its own branching factor """
+        self.assertAlmostEqual(bench.effective_branching_factor(2 + 4 + 8, 3), 2.)
+
+    def test_regressions_detected(self):
+        """ Slower or changed searches are reported against the baseline """
+        results = bench.run({"alphabeta": 3}, positions=("midgame",), repeat=1)
+        baseline = bench.to_json(results)
+        self.assertEqual(bench.compare(results, baseline), [])
+
+        baseline["results"][0]["nps"] = 2 * results[0].nps
+        self.assertEqual(len(bench.compare(results, baseline, threshold=10)), 1)
+        self.assertEqual(bench.compare(results, baseline, threshold=60), [])
+
+        baseline["results"][0]["nodes"] += 1
+        self.assertIn("nodes", bench.compare(results, baseline, threshold=60)[0])
+
+    def test_heuristic_depths(self):
+        """ Heuristics searching less deep than the first one are reported """
+        results = bench.run_heuristics(positions=("midgame",), budget=20.)
+        self.assertEqual([r.heuristic for r in results], list(bench.HEURISTICS))
+        self.assertTrue(all(r.depth >= 1 for r in results))
+
+        base, flood = results[0], results[-1]
+        slow = flood._replace(depth=base.depth - 2)
+        self.assertEqual(len(bench.compare_depths([base, slow])), 1)
+        self.assertEqual(len(bench.compare_depths([base, slow], checked=bench.CHECKED)), 1)
+        self.assertEqual(bench.compare_depths([base, slow], checked=["+flood"]), [])
+        self.assertEqual(bench.compare_depths([base, slow], max_loss=2), [])
+
+    def test_flood_within_one_ply(self):
+        """ Under a node budget the flood heuristics keep the depth """
+        for nodes in (2000, 8000):
+            results = bench.run_heuristics(nodes=nodes)
+            self.assertEqual(bench.compare_depths(results, checked=bench.CHECKED), [])
+
+    def test_flood_features_keep_the_tree(self):
+        """ The flood features at every leaf add no work at a fixed depth """
+        def search(name, position, depth):
+            agent = game_agent.CustomPlayer(score_fn=bench.HEURISTICS[name],
+                                            method='alphabeta')
+            result = agent.analyze(make_position(position, agent, "opponent"), depth)
+            return agent.last_stats.nodes, result.best_move
+
+        for position in bench.POSITIONS:
+            for depth in range(1, 7):
+                self.assertEqual(search("+flood", position, depth),
+                                 search("improved", position, depth))
+
+
+class MemProfileTest(unittest.TestCase):
+
+    def test_profile_engine(self):
+        """ The churn of the search is attributed to the board methods """
+        forecast_move = isolation.Board.forecast_move
+        report = memprofile.profile_engine("alphabeta", 3, positions=("midgame",),
+                                           top=3)
+        self.assertGreater(report.nodes, 0)
+        self.assertGreater(report.alloc_blocks, report.nodes)
+        self.assertGreater(report.peak_bytes, 0)
+        self.assertEqual(len(report.top_sites), 3)
+        self.assertTrue(report.top_sites[0][0].startswith("isolation.py:"))
+        self.assertIs(isolation.Board.forecast_move, forecast_move)
+
+
+if __name__ == '__main__':
+    unittest.main()
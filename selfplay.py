@@ -0,0 +1,280 @@
+"""
+Generate self-play positions at scale and store them in memory-mapped shard
+files of fixed-width records.
+
+Every producer process plays games between two `CustomPlayer` agents under
+a node-budget time control and appends one record per position to its own
+shard files, so producers never contend for a file:
+
+    python selfplay.py data/ --games 10000 --producers 8
+
+A record (see RECORD) holds the occupied cells of the board as a bit mask
+(bit row * width + col), the cell index of each player (-1 before its first
+move), the player to move, the score of the search from the point of view
+of the player to move, and the result of the game for that player (+1 for a
+win, -1 for a loss).
+
+A shard starts with a small header holding the number of committed records,
+followed by room for `capacity` records. It is created under a temporary
+name and only renamed to "*.shard" once its header is written. The records
+of a game are written once the game is over (when its result is known) and
+only then counted in the header, so a consumer never sees a half-written
+game. Consumers map the shards read-only and can read them while the
+producers are still running:
+
+    for records in iter_shards("data/"):
+        scores = records["score"]  # views into the file, nothing is copied
+
+Reading and writing shards requires NumPy (imported when first needed).
+"""
+
+import argparse
+import glob
+import os
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+
+from isolation import Board
+from isolation import Clock
+from game_agent import CustomPlayer
+from sample_players import improved_score
+
+# NumPy dtype specifications of a record and of the shard header
+RECORD = [("occupied", "<u8"),
+          ("loc1", "i1"),
+          ("loc2", "i1"),
+          ("to_move", "u1"),
+          ("ply", "u1"),
+          ("score", "<f4"),
+          ("result", "i1")]
+
+HEADER = [("magic", "S8"), ("count", "<u8"), ("capacity", "<u8"),
+          ("width", "<u2"), ("height", "<u2"), ("pad", "V4")]
+
+MAGIC = b"ISOLSP01"
+SHARD_CAPACITY = 1 << 20  # records per shard file
+
+
+class Shard(object):
+    """A memory-mapped shard file that a single producer appends records to.
+
+    Parameters
+    ----------
+    path : str
+        The shard file to create (it appears under this name only once its
+        header is initialised).
+
+    capacity : int (optional)
+        Number of records the shard can hold.
+    """
+
+    def __init__(self, path, capacity=SHARD_CAPACITY, width=7, height=7):
+        import numpy as np
+
+        self.path = path
+        self.capacity = capacity
+        header_size = np.dtype(HEADER).itemsize
+        # consumers glob "*.shard": never let them see a zeroed header
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.truncate(header_size + capacity * np.dtype(RECORD).itemsize)
+        self._header = np.memmap(temp_path, HEADER, "r+", shape=(1,))
+        self._header[0] = (MAGIC, 0, capacity, width, height, b"\0" * 4)
+        self._header.flush()
+        self.records = np.memmap(temp_path, RECORD, "r+", offset=header_size,
+                                 shape=(capacity,))
+        os.replace(temp_path, path)
+        self.count = 0
+
+    def room(self):
+        return self.capacity - self.count
+
+    def append(self, records):
+        """ Write a block of records and then commit them in the header. """
+        end = self.count + len(records)
+        self.records[self.count:end] = records
+        self.records.flush()
+        self.count = end
+        self._header["count"] = end
+        self._header.flush()
+
+    def close(self):
+        self.records.flush()
+        del self.records
+        del self._header
+
+
+def open_shard(path):
+    """Map the committed records of a shard file read-only.
+
+    Returns
+    ----------
+    numpy.memmap
+        The records (with the fields of RECORD) committed when the shard was
+        opened; reading them does not copy the file into memory.
+    """
+    import numpy as np
+
+    header = np.memmap(path, HEADER, "r", shape=(1,))[0]
+    if header["magic"] != MAGIC:
+        raise ValueError("{} is not a self-play shard".format(path))
+    count = int(header["count"])
+    if count == 0:
+        return np.empty(0, RECORD)
+    return np.memmap(path, RECORD, "r", offset=np.dtype(HEADER).itemsize,
+                     shape=(count,))
+
+
+def iter_shards(directory):
+    """ Yield the committed records of every shard in `directory`. """
+    for path in sorted(glob.glob(os.path.join(directory, "*.shard"))):
+        yield open_shard(path)
+
+
+def load(directory):
+    """ Concatenate the records of every shard in `directory` (a copy). """
+    import numpy as np
+
+    shards = list(iter_shards(directory))
+    return np.concatenate(shards) if shards else np.empty(0, RECORD)
+
+
+def encode(board):
+    """ Encode the position of `board` as a RECORD without score or result. """
+    width, height, move_count, active, cells, loc1, loc2 = board.to_state()
+    occupied = 0
+    for idx, cell in enumerate(cells):
+        if cell:
+            occupied |= 1 << idx
+    return (occupied,
+            -1 if loc1 is None else loc1[0] * width + loc1[1],
+            -1 if loc2 is None else loc2[0] * width + loc2[1],
+            active, min(move_count, 255), 0., 0)
+
+
+def play_game(agents, node_limit, rng, width=7, height=7, explore=0.):
+    """Play one self-play game from a random opening.
+
+    `explore` is the probability of playing a random legal move instead of
+    the move found by the search, which diversifies the positions.
+
+    Returns
+    ----------
+    list<tuple>
+        One RECORD tuple per position in which the player to move had a
+        legal move, with its search score and the result of the game.
+    """
+    board = Board(agents[0], agents[1], width, height)
+    for _ in range(2):
+        board.apply_move(rng.choice(board.get_legal_moves()))
+
+    clock = Clock(float("inf"), node_limit)
+    positions = []
+    while True:
+        legal_moves = board.get_legal_moves()
+        if not legal_moves:
+            break
+        player = board.active_player
+        clock.restart()
+        result = None
+        for result in player.iter_search(board.snapshot(), clock):
+            pass
+        move = result.best_move if result and result.best_move in legal_moves \
+            else rng.choice(legal_moves)
+        score = result.score if result else 0.
+        positions.append((encode(board), player, score))
+        if rng.random() < explore:
+            move = rng.choice(legal_moves)
+        board.apply_move(move)
+
+    loser = board.active_player
+    # the float32 score field cannot hold the +/-inf of decided positions
+    return [record[:5] + (max(-1e30, min(1e30, score)),
+                          -1 if player is loser else 1)
+            for record, player, score in positions]
+
+
+def produce(directory, producer, num_games, node_limit=100, seed=None,
+            capacity=SHARD_CAPACITY, width=7, height=7, explore=0.1):
+    """Play `num_games` self-play games and append their positions to the
+    shards "<producer>-<n>.shard" of `directory`, starting a new shard when
+    one is full. Existing shards are left alone, so the directory can
+    collect the output of several runs.
+
+    Returns
+    ----------
+    int
+        The number of records written.
+    """
+    import numpy as np
+
+    if capacity < width * height:
+        raise ValueError("A shard must hold at least the positions of one game")
+    rng = random.Random(seed)
+    agents = [CustomPlayer(score_fn=improved_score, method='alphabeta',
+                           collect_stats=False) for _ in range(2)]
+    shard = None
+    num_shards = 0
+    written = 0
+    try:
+        for _ in range(num_games):
+            records = np.array(play_game(agents, node_limit, rng, width,
+                                         height, explore), RECORD)
+            if shard is None or shard.room() < len(records):
+                if shard is not None:
+                    shard.close()
+                # never overwrite the shards of an earlier run
+                path = os.path.join(directory, "{:03d}-{:04d}.shard".format(
+                    producer, num_shards))
+                while os.path.exists(path):
+                    num_shards += 1
+                    path = os.path.join(directory, "{:03d}-{:04d}.shard".format(
+                        producer, num_shards))
+                shard = Shard(path, capacity, width, height)
+            shard.append(records)
+            written += len(records)
+    finally:
+        if shard is not None:
+            shard.close()
+    return written
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate self-play positions "
+                                     "into memory-mapped shard files.")
+    parser.add_argument("directory", help="directory of the shard files")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="number of games per producer")
+    parser.add_argument("--producers", type=int, default=0,
+                        help="number of producer processes "
+                             "(0 = one per CPU core)")
+    parser.add_argument("--nodes", type=int, default=100,
+                        help="node budget of the search for each move")
+    parser.add_argument("--explore", type=float, default=0.1,
+                        help="probability of playing a random move")
+    parser.add_argument("--capacity", type=int, default=SHARD_CAPACITY,
+                        help="records per shard file")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the openings and exploration moves")
+    args = parser.parse_args(args)
+    try:
+        import numpy  # noqa: F401 (the producers need it)
+    except ImportError:
+        parser.error("writing shards requires NumPy")
+
+    os.makedirs(args.directory, exist_ok=True)
+    producers = args.producers or os.cpu_count()
+    rng = random.Random(args.seed)
+    seeds = [rng.randrange(2 ** 32) for _ in range(producers)]
+    with ProcessPoolExecutor(producers) as executor:
+        futures = [executor.submit(produce, args.directory, idx, args.games,
+                                   args.nodes, seed, args.capacity,
+                                   explore=args.explore)
+                   for idx, seed in enumerate(seeds)]
+        total = sum(f.result() for f in futures)
+    print("Wrote {} positions to {}".format(total, args.directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Endgame tablebases for Isolation, solved exactly by backward induction.
+
+Once both players are placed, a position is fully described by the set of
+empty cells and the location of each player; the player to move follows
+from the number of blocked cells. Every move fills one empty cell, so the
+positions with e empty cells only lead to positions with e - 1, and the
+solver works through them layer by layer from e = 0 (nothing left to move
+to) up to `max_empty`. Each position gets the exact distance to the end of
+the game:
+
+    n = the number of plies left when both sides play perfectly, where the
+        player to move wins if n is odd and loses if n is even (n = 0: the
+        player to move has no legal moves)
+
+The winning side takes the shortest win and the losing side the longest
+loss. Every position has a rank -- its layer, the colex rank of its empty
+cells and the indices of the two locations among the blocked cells -- and
+the table holds n + 1 in one byte per rank, so it can be memory-mapped and
+probed without loading it.
+
+A whole game can only be solved on tiny boards (e.g., 3x3 or 4x3, with
+`max_empty` = cells - 2); the number of ranks grows with C(cells, e), so for
+5x5 and 6x6 (or the usual 7x7) the tables cover the endgame up to a few
+empty cells. By default the script solves the most layers that fit in
+MAX_POSITIONS ranks (the whole game on tiny boards, 5 empty cells on 5x5
+in well under a minute, 3 on 6x6 and 2 on 7x7):
+
+    python tablebase.py 5 5 --output tb5x5.bin
+
+Pass the file to `CustomPlayer(tablebase=...)` to play those positions
+perfectly.
+"""
+
+import argparse
+import itertools
+import mmap
+import struct
+import sys
+import timeit
+
+
+MAGIC = b"ISTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBB")
+
+MAX_POSITIONS = 32 * 1024 * 1024  # ranks (bytes) of the default tablebase
+
+_KNIGHT = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+
+
+def knight_moves(width, height):
+    """ Return the cells a knight reaches from every cell (by cell index). """
+    moves = []
+    for cell in range(width * height):
+        r, c = divmod(cell, width)
+        moves.append([(r + dr) * width + c + dc for dr, dc in _KNIGHT
+                      if 0 <= r + dr < height and 0 <= c + dc < width])
+    return moves
+
+
+def _binomials(n):
+    table = [[0] * (n + 2) for _ in range(n + 1)]
+    for i in range(n + 1):
+        table[i][0] = 1
+        for k in range(1, i + 1):
+            table[i][k] = table[i - 1][k - 1] + table[i - 1][k]
+    return table
+
+
+class Indexer(object):
+    """Rank positions of a tablebase (see the module docstring).
+
+    Parameters
+    ----------
+    width, height : int
+        The board size.
+
+    max_empty : int
+        The largest number of empty cells covered (at most cells - 2).
+    """
+
+    def __init__(self, width, height, max_empty):
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        if not 0 <= max_empty <= self.cells - 2:
+            raise ValueError("max_empty must be between 0 and {}".format(self.cells - 2))
+        self.max_empty = max_empty
+        self.binomial = _binomials(self.cells)
+        self.offsets = [0]
+        for empty in range(max_empty + 1):
+            self.offsets.append(self.offsets[-1] + self.layer_size(empty))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def layer_size(self, empty):
+        blocked = self.cells - empty
+        return self.binomial[self.cells][empty] * blocked * (blocked - 1)
+
+    def set_rank(self, empty_cells):
+        """ Return the colex rank of a sorted sequence of cell indices. """
+        return sum(self.binomial[cell][i + 1] for i, cell in enumerate(empty_cells))
+
+    def rank(self, empty_cells, loc1, loc2):
+        """Return the rank of a position.
+
+        Parameters
+        ----------
+        empty_cells : list<int>
+            The indices (row * width + col) of the empty cells, ascending.
+
+        loc1, loc2 : int
+            The cell index of each player.
+        """
+        empty = len(empty_cells)
+        blocked = self.cells - empty
+        i1 = loc1 - sum(1 for cell in empty_cells if cell < loc1)
+        i2 = loc2 - sum(1 for cell in empty_cells if cell < loc2)
+        return (self.offsets[empty] +
+                self.set_rank(empty_cells) * blocked * (blocked - 1) +
+                i1 * (blocked - 1) + (i2 if i2 < i1 else i2 - 1))
+
+
+def solve(width, height, max_empty, progress=None):
+    """Solve every position with up to `max_empty` empty cells.
+
+    Parameters
+    ----------
+    progress : callable (optional)
+        Called with (empty, positions, seconds) after each layer.
+
+    Returns
+    ----------
+    bytearray
+        n + 1 for every rank (see the module docstring).
+    """
+    indexer = Indexer(width, height, max_empty)
+    knight = knight_moves(width, height)
+    table = bytearray(len(indexer))
+    cells = indexer.cells
+
+    for empty in range(max_empty + 1):
+        start = timeit.default_timer()
+        blocked_count = cells - empty
+        pairs = blocked_count * (blocked_count - 1)
+        child_pairs = (blocked_count + 1) * blocked_count
+        p1_to_move = blocked_count % 2 == 0
+
+        for empty_cells in itertools.combinations(range(cells), empty):
+            in_empty = [False] * cells
+            for cell in empty_cells:
+                in_empty[cell] = True
+            blocked = [cell for cell in range(cells) if not in_empty[cell]]
+            base = indexer.offsets[empty] + indexer.set_rank(empty_cells) * pairs
+
+            # For each move into an empty cell: the base rank of the child
+            # positions and the index of every cell among their blocked cells
+            children = {}
+            for cell in empty_cells:
+                rest = [c for c in empty_cells if c != cell]
+                index = {c: i for i, c in enumerate(sorted(blocked + [cell]))}
+                children[cell] = (indexer.offsets[empty - 1] +
+                                  indexer.set_rank(rest) * child_pairs, index)
+
+            for i1, loc1 in enumerate(blocked):
+                for i2, loc2 in enumerate(blocked):
+                    if i1 == i2:
+                        continue
+                    rank = base + i1 * (blocked_count - 1) + (i2 if i2 < i1 else i2 - 1)
+                    mover = loc1 if p1_to_move else loc2
+                    best_win = None
+                    longest_loss = -1
+                    for move in knight[mover]:
+                        if not in_empty[move]:
+                            continue
+                        child_base, index = children[move]
+                        j1 = index[move if p1_to_move else loc1]
+                        j2 = index[loc2 if p1_to_move else move]
+                        n = table[child_base + j1 * blocked_count +
+                                  (j2 if j2 < j1 else j2 - 1)] - 1
+                        if n % 2 == 0:
+                            if best_win is None or n < best_win:
+                                best_win = n
+                        elif n > longest_loss:
+                            longest_loss = n
+                    if best_win is not None:
+                        table[rank] = best_win + 2
+                    else:
+                        table[rank] = longest_loss + 2
+
+        if progress is not None:
+            progress(empty, indexer.layer_size(empty), timeit.default_timer() - start)
+    return table
+
+
+def write_tablebase(path, width, height, max_empty, table):
+    """ Write a table computed by `solve` to a tablebase file. """
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, max_empty))
+        f.write(table)
+
+
+class Tablebase(object):
+    """A solved tablebase, memory-mapped from a file written by
+    `write_tablebase` (or held in memory when built from a table).
+
+    Tablebases can be pickled (e.g., with the agent that uses them); the copy
+    maps the same file again.
+    """
+
+    def __init__(self, width, height, max_empty, table, path=None):
+        self.indexer = Indexer(width, height, max_empty)
+        if len(table) != len(self.indexer):
+            raise ValueError("Table holds {} positions, expected {}".format(
+                len(table), len(self.indexer)))
+        self.width = width
+        self.height = height
+        self.max_empty = max_empty
+        self.table = table
+        self.path = path
+
+    @classmethod
+    def open(cls, path):
+        """ Map a tablebase file into memory. """
+        with open(path, "rb") as f:
+            magic, version, width, height, max_empty = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("{} is not a tablebase file".format(path))
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        table = memoryview(data)[HEADER.size:]
+        return cls(width, height, max_empty, table, path)
+
+    def __getstate__(self):
+        if self.path is None:
+            return self.__dict__.copy()
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        if "table" in state:
+            self.__dict__.update(state)
+        else:
+            self.__dict__.update(Tablebase.open(state["path"]).__dict__)
+
+    def covers(self, board):
+        """ Return True if the position of `board` is in the tablebase. """
+        return (board.width == self.width and board.height == self.height and
+                board.move_count >= 2 and
+                self.width * self.height - board.move_count <= self.max_empty)
+
+    def probe(self, board):
+        """Look up the position of an `isolation.Board`.
+
+        Returns
+        ----------
+        int
+            The number of plies left with perfect play (odd: the player to
+            move wins; even: it loses), or None if the position is not
+            covered.
+        """
+        if not self.covers(board):
+            return None
+        width = self.width
+        empty_cells = [r * width + c for r, c in board.get_blank_spaces()]
+        empty_cells.sort()
+        loc1 = board.get_player_location(board.__player_1__)
+        loc2 = board.get_player_location(board.__player_2__)
+        rank = self.indexer.rank(empty_cells, loc1[0] * width + loc1[1],
+                                 loc2[0] * width + loc2[1])
+        return self.table[rank] - 1
+
+    def best_move(self, board):
+        """Return the best move of the player to move and the number of plies
+        left after playing it (see `probe`), or None if the position is not
+        covered. The move is (-1, -1) when the player has no legal moves.
+        """
+        if not self.covers(board):
+            return None
+        best = None
+        for move in board.get_legal_moves():
+            n = self.probe(board.forecast_move(move))
+            # shortest win (opponent loses: n even), otherwise longest loss
+            key = (0, n) if n % 2 == 0 else (1, -n)
+            if best is None or key < best[0]:
+                best = (key, move, n)
+        if best is None:
+            return (-1, -1), 0
+        return best[1], best[2] + 1
+
+
+def default_max_empty(width, height, max_positions=MAX_POSITIONS):
+    """ Return the most empty cells a table of at most `max_positions` covers. """
+    max_empty = 0
+    while (max_empty < width * height - 2 and
+           len(Indexer(width, height, max_empty + 1)) <= max_positions):
+        max_empty += 1
+    return max_empty
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Solve the positions of "
+                                     "Isolation with few empty cells.")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("--max-empty", type=int, default=None,
+                        help="empty cells covered (default: as many as fit in "
+                        "{} positions; the whole game is cells - 2)".format(MAX_POSITIONS))
+    parser.add_argument("--output", default=None,
+                        help="tablebase file (default: tb<width>x<height>.bin)")
+    args = parser.parse_args(args)
+
+    try:
+        max_empty = args.max_empty
+        if max_empty is None:
+            max_empty = default_max_empty(args.width, args.height)
+        size = len(Indexer(args.width, args.height, max_empty))
+    except ValueError as e:
+        parser.error(str(e))
+    output = args.output or "tb{}x{}.bin".format(args.width, args.height)
+    print("Solving {} positions of {}x{} with up to {} empty cells".format(
+        size, args.width, args.height, max_empty))
+
+    def report(empty, positions, seconds):
+        print("  {:>2} empty: {:>10} positions in {:.1f} s".format(empty, positions, seconds))
+        sys.stdout.flush()
+
+    table = solve(args.width, args.height, max_empty, report)
+    write_tablebase(output, args.width, args.height, max_empty, table)
+    wins = sum(1 for value in table if value % 2 == 0)
+    print("Written to {} ({:.1f}% of positions won by the player to move)".format(
+        output, 100. * wins / len(table)))
+
+
+if __name__ == "__main__":
+    main()
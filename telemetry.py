@@ -0,0 +1,216 @@
+"""
+Per-move telemetry of tournament games: the time each move used, the time
+left on the clock when it was returned, the search depth reached and the
+number of legal moves, summarised per agent and per game phase.
+
+The time left of a move is the safety margin the agent kept (a negative value
+is a loss on time), so its low quantiles show how much the timeout threshold
+of an agent (`CustomPlayer(timeout=...)`) can be lowered, or must be raised,
+for a given machine and time limit. Collect it while playing:
+
+    python tournament.py --telemetry --results results.sqlite
+
+or summarise the games logged in a results file (see results_store.py):
+
+    python telemetry.py results.sqlite --agents ID_Improved Student
+
+Games recorded before the telemetry columns existed only have the time used.
+"""
+
+import argparse
+import math
+
+from collections import OrderedDict
+
+from results_store import ResultsStore
+
+# Game phases by ply (moves on the board before the move, opening included)
+PHASES = (("opening", 10), ("middlegame", 20), ("endgame", None))
+
+METRICS = ("time_used", "time_left", "depth", "num_legal")
+
+# Bin edges of the histograms printed by `print_telemetry`
+TIME_LEFT_BINS = (0, 5, 10, 20, 30, 50, 75, 100, 150)
+DEPTH_BINS = tuple(range(1, 16))
+
+
+def game_phase(ply):
+    """ Return the name of the game phase of a move made at `ply`. """
+    for name, end in PHASES:
+        if end is None or ply < end:
+            return name
+
+
+class Histogram(object):
+    """The values recorded for one metric. Missing (None) and infinite values
+    (e.g., the time left under a node budget) are not recorded.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._sorted = True
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        if value is None or (isinstance(value, float) and math.isinf(value)):
+            return
+        if self.values and value < self.values[-1]:
+            self._sorted = False
+        self.values.append(value)
+
+    def extend(self, other):
+        for value in other.values:
+            self.add(value)
+
+    def quantile(self, q):
+        """ Return the `q` quantile (nearest rank), or None if empty. """
+        if not self.values:
+            return None
+        if not self._sorted:
+            self.values.sort()
+            self._sorted = True
+        rank = int(math.ceil(q * len(self.values))) - 1
+        return self.values[min(max(rank, 0), len(self.values) - 1)]
+
+    def mean(self):
+        return sum(self.values) / len(self.values) if self.values else None
+
+    def bins(self, edges):
+        """Count the values in the bins delimited by `edges`.
+
+        Returns
+        ----------
+        list<(str, int)>
+            A label and the number of values for every bin, from the values
+            below edges[0] to the values at or above edges[-1].
+        """
+        counts = [0] * (len(edges) + 1)
+        for value in self.values:
+            idx = 0
+            while idx < len(edges) and value >= edges[idx]:
+                idx += 1
+            counts[idx] += 1
+        labels = ["< {:g}".format(edges[0])]
+        labels += ["{:g}".format(low) if high - low == 1 else "{:g}-{:g}".format(low, high)
+                   for low, high in zip(edges, edges[1:])]
+        labels += [">= {:g}".format(edges[-1])]
+        return list(zip(labels, counts))
+
+
+class Telemetry(object):
+    """Per-move telemetry of many games, keyed by agent, phase and metric.
+
+    Attributes
+    ----------
+    moves : dict
+        The number of moves recorded for each agent.
+    """
+
+    def __init__(self):
+        self.moves = OrderedDict()
+        self._histograms = {}
+
+    def agents(self):
+        return list(self.moves)
+
+    def add_game(self, game):
+        """ Record the moves of a `results_store.GameRecord`. """
+        columns = [game.move_times]
+        for values in (game.time_left, game.depths, game.num_legal):
+            columns.append(values if values is not None else [None] * len(game.moves))
+
+        offset = len(game.opening or ())
+        for idx, values in enumerate(zip(*columns)):
+            ply = offset + idx
+            agent = game.player_1 if ply % 2 == offset % 2 else game.player_2
+            phase = game_phase(ply)
+            self.moves[agent] = self.moves.get(agent, 0) + 1
+            for metric, value in zip(METRICS, values):
+                key = (agent, phase, metric)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram()
+                self._histograms[key].add(value)
+
+    def add_games(self, games):
+        for game in games:
+            self.add_game(game)
+
+    def histogram(self, agent, metric, phase=None):
+        """Return the `Histogram` of a metric of one agent, in one phase or
+        over the whole game (phase=None).
+        """
+        phases = [name for name, _ in PHASES] if phase is None else [phase]
+        merged = Histogram()
+        for name in phases:
+            if (agent, name, metric) in self._histograms:
+                merged.extend(self._histograms[(agent, name, metric)])
+        return merged
+
+
+def _fmt(value, spec="{:.1f}"):
+    return "-" if value is None else spec.format(value)
+
+
+def _print_bars(hist, edges, width=40):
+    bins = hist.bins(edges)
+    top = max(count for _, count in bins) or 1
+    for label, count in bins:
+        print("    {:>9} |{:<{}}{:>7}".format(label, "#" * int(round(width * count / top)),
+                                             width, count))
+
+
+def print_telemetry(telemetry, agents=None):
+    """Print the telemetry of every agent (or of `agents`): quantiles of each
+    metric per game phase, then histograms of the time left and of the depth
+    reached over the whole game.
+    """
+    for agent in agents or telemetry.agents():
+        print("\n\nTelemetry of {} ({} moves):".format(agent, telemetry.moves.get(agent, 0)))
+        print("----------")
+        print("  {:<11}{:>6}{:>10}{:>9}{:>9}{:>10}{:>9}{:>9}{:>10}{:>8}{:>8}".format(
+            "Phase", "Moves", "Used p50", "p95", "max", "Left min", "p1", "p5",
+            "Depth p50", "min", "Legal"))
+        for phase in [name for name, _ in PHASES] + [None]:
+            used = telemetry.histogram(agent, "time_used", phase)
+            if not used:
+                continue
+            left = telemetry.histogram(agent, "time_left", phase)
+            depth = telemetry.histogram(agent, "depth", phase)
+            legal = telemetry.histogram(agent, "num_legal", phase)
+            print("  {:<11}{:>6}{:>10}{:>9}{:>9}{:>10}{:>9}{:>9}{:>10}{:>8}{:>8}".format(
+                phase or "all", len(used), _fmt(used.quantile(.5)),
+                _fmt(used.quantile(.95)), _fmt(used.quantile(1.)),
+                _fmt(left.quantile(0.)), _fmt(left.quantile(.01)),
+                _fmt(left.quantile(.05)), _fmt(depth.quantile(.5), "{}"),
+                _fmt(depth.quantile(0.), "{}"), _fmt(legal.mean())))
+
+        left = telemetry.histogram(agent, "time_left")
+        if left:
+            print("\n  Time left when the move was returned (ms):")
+            _print_bars(left, TIME_LEFT_BINS)
+        depth = telemetry.histogram(agent, "depth")
+        if depth:
+            print("\n  Search depth reached:")
+            _print_bars(depth, DEPTH_BINS)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Summarise the per-move "
+                                     "telemetry of the games in a results file.")
+    parser.add_argument("results", help="SQLite results file written by tournament.py --results")
+    parser.add_argument("--agents", nargs="+", default=None,
+                        help="agents to report (default: all)")
+    args = parser.parse_args(args)
+
+    store = ResultsStore(args.results)
+    telemetry = Telemetry()
+    for games in store.matches().values():
+        telemetry.add_games(games)
+    store.close()
+    print_telemetry(telemetry, args.agents)
+
+
+if __name__ == "__main__":
+    main()
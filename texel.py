@@ -0,0 +1,184 @@
+"""
+Tune the weights of the `WeightedScore` evaluation function (see
+game_agent.py) offline from recorded games, in the style of "Texel" tuning.
+
+Every position of every recorded game is replayed once and turned into a
+row of a feature matrix. The row holds the features of the evaluation
+function (game_agent.FEATURES) seen from the player to move, and its label
+is 1 if that player went on to win the game. Seeing every position from the
+side to move (rather than from both sides, with opposite labels) lets the fit
+tell the features of the player to move from those of its opponent, so the
+weights are not forced to be antisymmetric. A logistic regression
+of the labels on the features then gives the weights that best predict the
+results, e.g., from a results store filled by tournament.py --results:
+
+    python texel.py weights.json --results games.sqlite
+
+Extracting the features is the slow part; the matrices can be kept with
+--save and reused with --load, and the fit itself is a few vectorized
+Newton steps that take seconds for millions of positions.
+
+Feature extraction only needs the standard library; the fit requires NumPy.
+"""
+
+import argparse
+
+from isolation import Board
+from game_agent import FEATURES
+from game_agent import WeightedScore
+from game_agent import score_features
+from results_store import ResultsStore
+
+
+def positions_from_history(move_history, winner, opening=(), width=7, height=7):
+    """Replay a game and yield the features of every position it reached.
+
+    Parameters
+    ----------
+    move_history : list<list<(int, int)>>
+        The moves returned by `Board.play` (one [player 1, player 2] pair
+        per turn); a flat list of moves is accepted as well.
+
+    winner : {1, 2}
+        The player (in the order of the board) that won the game.
+
+    opening : list<(int, int)> (optional)
+        Moves applied to the board before `Board.play` was called.
+
+    Yields
+    ------
+    (tuple(float), int)
+        The features of the position seen from the player to move, and 1 if
+        that player won the game (0 otherwise). Positions in which the
+        player to move has no legal moves are skipped.
+    """
+    board = Board(1, 2, width, height)
+    for move in opening:
+        board.apply_move(move)
+
+    moves = [m for turn in move_history
+             for m in (turn if isinstance(turn, list) else [turn])]
+    for move in moves:
+        legal_moves = board.get_legal_moves()
+        if not legal_moves:
+            return
+        player = board.active_player
+        yield score_features(board, player), int(player == winner)
+        if move not in legal_moves:
+            return
+        board.apply_move(move)
+
+
+def positions_from_store(store):
+    """ Yield the rows of every decided game in a `ResultsStore`. """
+    for game in store.games():
+        if game.winner is None or game.player_1 == game.player_2:
+            continue
+        winner = 1 if game.winner == game.player_1 else 2
+        for row in positions_from_history(game.moves, winner, game.opening):
+            yield row
+
+
+def feature_matrix(rows):
+    """Stack (features, label) rows into NumPy arrays.
+
+    Returns
+    ----------
+    (numpy.ndarray, numpy.ndarray)
+        The (n, len(FEATURES)) feature matrix and the n labels.
+    """
+    import numpy as np
+
+    features = []
+    labels = []
+    for x, y in rows:
+        features.append(x)
+        labels.append(y)
+    return (np.array(features, dtype=np.float64).reshape(-1, len(FEATURES)),
+            np.array(labels, dtype=np.float64))
+
+
+def fit_weights(X, y, l2=1e-3, iterations=25, tolerance=1e-10):
+    """Fit logistic regression weights to the features X and results y.
+
+    The model predicts that a player wins with probability
+    1 / (1 + exp(-X.w)), and w is found by Newton's method (iteratively
+    reweighted least squares) with a small L2 penalty that keeps the weights
+    of unused or collinear features finite.
+
+    Returns
+    ----------
+    dict<str, float>
+        The weight of each feature, ready for `WeightedScore`.
+    """
+    import numpy as np
+
+    n, k = X.shape
+    w = np.zeros(k)
+    penalty = l2 * n * np.eye(k)
+    for _ in range(iterations):
+        p = 1. / (1. + np.exp(-(X @ w)))
+        gradient = X.T @ (y - p) - penalty @ w
+        hessian = (X * (p * (1. - p))[:, None]).T @ X + penalty
+        step = np.linalg.solve(hessian, gradient)
+        w += step
+        if np.max(np.abs(step)) < tolerance:
+            break
+    return dict(zip(FEATURES, w.tolist()))
+
+
+def log_loss(X, y, weights):
+    """ Mean log loss of the predictions of `weights` (lower is better). """
+    import numpy as np
+
+    w = np.array([weights[name] for name in FEATURES])
+    z = X @ w
+    # log(1 + exp(-z)) for winners and log(1 + exp(z)) for losers, computed stably
+    return float(np.mean(np.logaddexp(0., np.where(y > 0, -z, z))))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Fit the weights of the "
+                                     "weighted evaluation function to recorded games.")
+    parser.add_argument("output", help="weights file (JSON) to write")
+    parser.add_argument("--results", nargs="+", default=[],
+                        help="results stores (SQLite, see tournament.py --results) to read games from")
+    parser.add_argument("--load", default=None,
+                        help="read the feature matrices from this .npz file")
+    parser.add_argument("--save", default=None,
+                        help="also save the extracted feature matrices to this .npz file")
+    parser.add_argument("--l2", type=float, default=1e-3,
+                        help="L2 penalty per position")
+    args = parser.parse_args(args)
+    try:
+        import numpy as np
+    except ImportError:
+        parser.error("fitting the weights requires NumPy")
+
+    if args.load:
+        data = np.load(args.load)
+        X, y = data["X"], data["y"]
+    elif args.results:
+        blocks = []
+        for path in args.results:
+            store = ResultsStore(path)
+            blocks.append(feature_matrix(positions_from_store(store)))
+            store.close()
+        X = np.concatenate([b[0] for b in blocks])
+        y = np.concatenate([b[1] for b in blocks])
+    else:
+        parser.error("give the games to fit with --results or --load")
+
+    if args.save:
+        np.savez_compressed(args.save, X=X, y=y)
+
+    print("Fitting {} positions".format(len(y)))
+    weights = fit_weights(X, y, args.l2)
+    WeightedScore(weights).save(args.output)
+    print("Log loss: {:.4f} (coin flip: {:.4f})".format(log_loss(X, y, weights),
+                                                     float(np.log(2.))))
+    print(" ".join("{}={:+.4f}".format(n, w) for n, w in weights.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,21 +17,43 @@ For example, if the random moves chosen for initialization are (5, 2) and
 agentB at (1, 3) as player 2 then play to conclusion; the agents swap
 initiative in the second match with agentB at (5, 2) as player 1 and agentA at
 (1, 3) as player 2.
+
+The random openings can be replaced by a suite of balanced openings built by
+openings.py (see --openings), which removes most of the noise of lopsided
+starting positions.
 """
 
+import argparse
 import itertools
+import os
 import random
 import warnings
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
+from distributed import Coordinator
+from distributed import parse_address
 from isolation import Board
+from isolation import ProcessPlayer
 from sample_players import RandomPlayer
 from sample_players import null_score
 from sample_players import open_move_score
 from sample_players import improved_score
 from game_agent import CustomPlayer
 from game_agent import custom_score
+from openings import deal_openings
+from openings import read_suite
+from profiling import ProfiledPlayer
+from profiling import merge_stats
+from profiling import print_profile
+from ratings import BradleyTerry
+from ratings import SPRT
+from results_store import GameRecord
+from results_store import ResultsStore
+from telemetry import Telemetry
+from telemetry import print_telemetry
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
@@ -55,29 +77,67 @@ same opponents.
 """
 
 Agent = namedtuple("Agent", ["player", "name"])
+MatchJob = namedtuple("MatchJob", ["pairing", "key", "player1", "player2",
+                                   "names", "seed", "opening"],
+                      defaults=(None,))
 
 
-def play_match(player1, player2):
+def play_match(player1, player2, seed=None, names=("player1", "player2"),
+               records=None, node_limit=None, opening=None):
     """
     Play a "fair" set of matches between two agents by playing two games
     between the players, forcing each agent to play from randomly selected
     positions. This should control for differences in outcome resulting from
     advantage due to starting position on the board.
+
+    When `seed` is given the random number generator is reseeded first, so
+    the opening (and any random agent) is reproducible no matter which
+    process plays the match. When `records` is a list, a `GameRecord`
+    (using `names` for the two players) is appended for each game. When
+    `node_limit` is given the games use a node-budget time control instead
+    of TIME_LIMIT (see `Board.play`). `opening` replaces the random opening
+    with the given pair of moves (e.g., one drawn from an opening suite).
     """
+    if seed is not None:
+        random.seed(seed)
+
     num_wins = {player1: 0, player2: 0}
     num_timeouts = {player1: 0, player2: 0}
     num_invalid_moves = {player1: 0, player2: 0}
     games = [Board(player1, player2), Board(player2, player1)]
+    game_names = [names, names[::-1]]
 
     # initialize both games with a random move and response
-    for _ in range(2):
-        move = random.choice(games[0].get_legal_moves())
-        games[0].apply_move(move)
-        games[1].apply_move(move)
+    if opening is None:
+        opening = []
+        for _ in range(2):
+            opening.append(random.choice(games[0].get_legal_moves()))
+            games[0].apply_move(opening[-1])
+            games[1].apply_move(opening[-1])
+    else:
+        opening = list(opening)
+        for move in opening:
+            if not games[0].move_is_legal(move):
+                raise ValueError("Illegal opening move: {}".format(move))
+            games[0].apply_move(move)
+            games[1].apply_move(move)
 
     # play both games and tally the results
-    for game in games:
-        winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    for game, (name_1, name_2) in zip(games, game_names):
+        move_log = []
+        winner, history, termination = game.play(time_limit=TIME_LIMIT,
+                                                 move_log=move_log,
+                                                 node_limit=node_limit)
+
+        if records is not None:
+            winner_name = {player1: names[0], player2: names[1]}.get(winner)
+            records.append(GameRecord(name_1, name_2, seed, opening,
+                                      winner_name, termination,
+                                      [m for turn in history for m in turn],
+                                      [round(r.time_used, 3) for r in move_log],
+                                      [round(r.time_left, 3) for r in move_log],
+                                      [r.depth for r in move_log],
+                                      [r.num_legal for r in move_log]))
 
         if player1 == winner:
             num_wins[player1] += 1
@@ -102,9 +162,127 @@ def play_match(player1, player2):
     return num_wins[player1], num_wins[player2]
 
 
-def play_round(agents, num_matches):
+def schedule_round(agents, num_matches, rng, openings=None):
+    """
+    List the matches of one round as `MatchJob`s in a fixed order, giving
+    every match its own seed drawn from `rng`. The schedule (and therefore
+    every opening) only depends on the state of `rng`, not on how many
+    workers play the matches. When a list of `openings` is given, every
+    match is assigned one of them (see `openings.deal_openings`).
+    """
+    agent_1 = agents[-1]
+    jobs = []
+    for idx, agent_2 in enumerate(agents[:-1]):
+        # Each player takes a turn going first
+        orders = itertools.permutations((agent_1, agent_2))
+        matches = ((a, b) for a, b in orders for _ in range(num_matches))
+        for num, (a, b) in enumerate(matches):
+            key = "{} vs {}#{}".format(agent_1.name, agent_2.name, num)
+            jobs.append(MatchJob(idx, key, a.player, b.player,
+                                 (a.name, b.name), rng.randrange(2 ** 32)))
+    return assign_openings(jobs, openings, rng)
+
+
+def assign_openings(jobs, openings, rng):
+    """ Give each job an opening dealt from `openings` (if any) by `rng`. """
+    if not openings:
+        return jobs
+    dealt = deal_openings(openings, len(jobs), rng)
+    return [job._replace(opening=opening) for job, opening in zip(jobs, dealt)]
+
+
+def run_match(job, cleanup=False, node_limit=None):
+    """
+    Play the match described by a `MatchJob` and return the wins of each
+    player, the `GameRecord` of both games and the raw profile statistics
+    of every profiled player (see `profile_agents`) keyed by agent name.
+    Worker processes receive their own copies of the players, so they pass
+    `cleanup=True` to stop any process-isolated player (see
+    `isolate_agents`) once the match is over.
+    """
+    records = []
+    try:
+        score_1, score_2 = play_match(job.player1, job.player2, seed=job.seed,
+                                      names=job.names, records=records,
+                                      node_limit=node_limit,
+                                      opening=job.opening)
+        profiles = {}
+        for player, name in zip((job.player1, job.player2), job.names):
+            if isinstance(player, ProfiledPlayer):
+                profiles[name] = player.take_stats()
+        return score_1, score_2, records, profiles
+    finally:
+        if cleanup:
+            for player in (job.player1, job.player2):
+                if isinstance(player, ProcessPlayer):
+                    player.close()
+
+
+def run_schedule(jobs, executor=None, store=None, node_limit=None,
+                 profiles=None, telemetry=None):
+    """
+    Play every match in `jobs` and yield (job, score_1, score_2) in schedule
+    order.
+
+    Matches already recorded in `store` (a `ResultsStore`) are not played
+    again; their scores are rebuilt from the recorded games. A ValueError is
+    raised before any match is played if a recorded match was played with
+    another seed than its job (the store holds a different schedule). Every match
+    played is appended to the store as soon as its result is available.
+    `node_limit` selects a node-budget time control for every game. The
+    profiles of profiled players are merged into `profiles` (a dict of
+    `pstats.Stats` keyed by agent name) when it is given, and the moves of
+    every game (recorded ones included) are added to `telemetry` (a
+    `telemetry.Telemetry`) when it is given.
+    """
+    recorded = store.matches() if store is not None else {}
+    for job in jobs:
+        if any(g.seed != job.seed for g in recorded.get(job.key, ())):
+            raise ValueError("Match {!r} was recorded with another seed; resume "
+                             "with the --seed the tournament was started "
+                             "with".format(job.key))
+    pending = [job for job in jobs if job.key not in recorded]
+
+    if executor is None:
+        results = map(partial(run_match, node_limit=node_limit), pending)
+    else:
+        results = executor.map(partial(run_match, cleanup=True,
+                                       node_limit=node_limit), pending)
+
+    for job in jobs:
+        if job.key in recorded:
+            games = recorded[job.key]
+            if telemetry is not None:
+                telemetry.add_games(games)
+            yield (job, sum(g.winner == job.names[0] for g in games),
+                   sum(g.winner == job.names[1] for g in games))
+            continue
+
+        score_1, score_2, games, match_profiles = next(results)
+        if profiles is not None:
+            for name, stats in match_profiles.items():
+                merge_stats(profiles, name, stats)
+        if telemetry is not None:
+            telemetry.add_games(games)
+        if store is not None:
+            store.add_match(job.key, games)
+        yield job, score_1, score_2
+
+
+def play_round(agents, num_matches, executor=None, seed=None, store=None,
+               node_limit=None, openings=None, profiles=None, telemetry=None):
     """
     Play one round (i.e., a single match between each pair of opponents)
+
+    The matches are played by `executor` (e.g., a process pool) when one is
+    given, or one after another in this process otherwise; the results are
+    the same either way for a given `seed` (apart from any effect of the
+    time limit on the search of each agent, which `node_limit` removes by
+    playing under a node-budget time control). Finished matches are logged
+    to `store` (if given), and matches already in it are skipped. Matches
+    start from `openings` (a list of opening move pairs) when given, and the
+    profiles of profiled agents and the telemetry of every move are merged
+    into `profiles` and `telemetry` (see `run_schedule`).
     """
     agent_1 = agents[-1]
     wins = 0.
@@ -113,19 +291,21 @@ def play_round(agents, num_matches):
     print("\nPlaying Matches:")
     print("----------")
 
-    for idx, agent_2 in enumerate(agents[:-1]):
+    jobs = schedule_round(agents, num_matches, random.Random(seed), openings)
+    results = run_schedule(jobs, executor, store, node_limit, profiles,
+                           telemetry)
 
+    for idx, matches in itertools.groupby(results, key=lambda r: r[0].pairing):
+
+        agent_2 = agents[idx]
         counts = {agent_1.player: 0., agent_2.player: 0.}
         names = [agent_1.name, agent_2.name]
         print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
 
-        # Each player takes a turn going first
-        for p1, p2 in itertools.permutations((agent_1.player, agent_2.player)):
-            for _ in range(num_matches):
-                score_1, score_2 = play_match(p1, p2)
-                counts[p1] += score_1
-                counts[p2] += score_2
-                total += score_1 + score_2
+        for job, score_1, score_2 in matches:
+            counts[job.player1] += score_1
+            counts[job.player2] += score_2
+            total += score_1 + score_2
 
         wins += counts[agent_1.player]
 
@@ -135,7 +315,240 @@ def play_round(agents, num_matches):
     return 100. * wins / total
 
 
-def main():
+def play_pairing_sprt(agent_1, agent_2, idx, sprt, max_matches, rng,
+                      executor=None, store=None, batch=1, node_limit=None,
+                      openings=None, profiles=None, telemetry=None):
+    """
+    Play matches between agent_1 and agent_2 (alternating which agent moves
+    first) until `sprt` accepts a hypothesis about agent_1 or `max_matches`
+    matches have been played, `batch` matches at a time. Matches start from
+    `openings` (a list of opening move pairs) when given.
+
+    Returns the wins of each agent and the status of the test ("H1", "H0",
+    or None if the match budget ran out first).
+    """
+    orders = [(agent_1, agent_2), (agent_2, agent_1)]
+    wins = {agent_1.player: 0, agent_2.player: 0}
+    status = None
+    num = 0
+    if openings:
+        openings = iter(deal_openings(openings, max_matches, rng))
+
+    while status is None and num < max_matches:
+        jobs = []
+        for num in range(num, min(num + batch, max_matches)):
+            a, b = orders[num % 2]
+            key = "{} vs {}#sprt{}".format(agent_1.name, agent_2.name, num)
+            jobs.append(MatchJob(idx, key, a.player, b.player,
+                                 (a.name, b.name), rng.randrange(2 ** 32),
+                                 next(openings) if openings else None))
+        num += 1
+
+        for job, score_1, score_2 in run_schedule(jobs, executor, store,
+                                                  node_limit, profiles,
+                                                  telemetry):
+            wins[job.player1] += score_1
+            wins[job.player2] += score_2
+
+        status = sprt.status(wins[agent_1.player], wins[agent_2.player])
+
+    return wins[agent_1.player], wins[agent_2.player], status
+
+
+def play_round_sprt(agents, sprt, max_matches, executor=None, seed=None,
+                    store=None, batch=1, node_limit=None, openings=None,
+                    profiles=None, telemetry=None):
+    """
+    Play one round like `play_round`, but stop each pairing as soon as the
+    sequential probability ratio test `sprt` settles the result (or after
+    `max_matches` matches).
+    """
+    agent_1 = agents[-1]
+    wins = 0.
+    total = 0.
+
+    print("\nPlaying Matches (SPRT elo0={:g} elo1={:g}):".format(sprt.elo0, sprt.elo1))
+    print("----------")
+
+    for idx, agent_2 in enumerate(agents[:-1]):
+        names = [agent_1.name, agent_2.name]
+        print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
+
+        rng = random.Random(None if seed is None else "{}:{}".format(seed, idx))
+        score_1, score_2, status = play_pairing_sprt(
+            agent_1, agent_2, idx, sprt, max_matches, rng, executor, store,
+            batch, node_limit, openings, profiles, telemetry)
+        wins += score_1
+        total += score_1 + score_2
+
+        print("\tResult: {} to {}  ({})".format(
+            score_1, score_2, status or "budget exhausted"))
+
+    return 100. * wins / total
+
+
+def schedule_round_robin(agents, num_matches, rng, openings=None):
+    """
+    List the matches of a round robin between all `agents` as `MatchJob`s;
+    every pair of agents plays `num_matches` matches with each agent moving
+    first, starting from `openings` when given (see `schedule_round`).
+    """
+    jobs = []
+    for idx, (agent_1, agent_2) in enumerate(itertools.combinations(agents, 2)):
+        orders = itertools.permutations((agent_1, agent_2))
+        matches = ((a, b) for a, b in orders for _ in range(num_matches))
+        for num, (a, b) in enumerate(matches):
+            key = "{} vs {}#rr{}".format(agent_1.name, agent_2.name, num)
+            jobs.append(MatchJob(idx, key, a.player, b.player,
+                                 (a.name, b.name), rng.randrange(2 ** 32)))
+    return assign_openings(jobs, openings, rng)
+
+
+def play_round_robin(agents, num_matches, executor=None, seed=None,
+                     store=None, node_limit=None, openings=None,
+                     profiles=None, telemetry=None):
+    """
+    Play a round robin between all `agents` and fit Bradley-Terry (Elo)
+    ratings to the results. The ratings are updated as the results of each
+    match come in from the workers, and the current estimate is reported
+    after every pairing.
+
+    Returns the final `ratings.BradleyTerry` model.
+    """
+    model = BradleyTerry()
+    for agent in agents:
+        model.add_player(agent.name)
+
+    print("\nPlaying Round Robin:")
+    print("----------")
+
+    jobs = schedule_round_robin(agents, num_matches, random.Random(seed),
+                                openings)
+    results = run_schedule(jobs, executor, store, node_limit, profiles,
+                           telemetry)
+    num_pairings = len(agents) * (len(agents) - 1) // 2
+
+    for idx, matches in itertools.groupby(results, key=lambda r: r[0].pairing):
+        counts = {}
+        for job, score_1, score_2 in matches:
+            name_1, name_2 = job.names
+            if score_1:
+                model.add_game(name_1, name_2, score_1)
+            if score_2:
+                model.add_game(name_2, name_1, score_2)
+            counts[name_1] = counts.get(name_1, 0) + score_1
+            counts[name_2] = counts.get(name_2, 0) + score_2
+
+        (name_1, wins_1), (name_2, wins_2) = sorted(counts.items())
+        leader, elo, interval, _ = model.ratings()[0]
+        print("  Pairing {}/{}: {!s:^11} vs {!s:^11}\tResult: {} to {}"
+              "\tLeader: {} ({:+.0f} +/- {:.0f})".format(
+                  idx + 1, num_pairings, name_1, name_2, wins_1, wins_2,
+                  leader, elo, interval))
+
+    return model
+
+
+def print_ratings(model):
+    """ Print the rating table of a `ratings.BradleyTerry` model. """
+    print("\n\nRatings (95% confidence):")
+    print("----------")
+    print("{:<5}{:<15}{:>8}{:>8}{:>8}".format("Rank", "Agent", "Elo", "+/-", "Games"))
+    for rank, (name, elo, interval, games) in enumerate(model.ratings()):
+        print("{:<5}{!s:<15}{:>8.0f}{:>8.0f}{:>8}".format(rank + 1, name, elo,
+                                                          interval, games))
+
+
+def isolate_agents(agents, grace):
+    """
+    Wrap the player of every agent in a `ProcessPlayer` so that each agent
+    searches in its own worker process and is preempted (forfeiting the game)
+    once its deadline plus `grace` milliseconds has passed.
+    """
+    return [Agent(ProcessPlayer(a.player, grace=grace), a.name) for a in agents]
+
+
+def profile_agents(agents, names):
+    """
+    Wrap the player of every agent named in `names` in a `ProfiledPlayer`
+    that profiles its get_move() calls (see `run_schedule`).
+    """
+    return [Agent(ProfiledPlayer(a.player), a.name) if a.name in names else a
+            for a in agents]
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=DESCRIPTION,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--isolate", action="store_true",
+                        help="run every agent in a worker process with hard deadlines")
+    parser.add_argument("--grace", type=float, default=50,
+                        help="milliseconds past the deadline before an isolated agent is stopped")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes playing matches (default 0 = one "
+                             "per CPU core; 1 plays them serially in this process)")
+    parser.add_argument("--coordinator", default=None, metavar="ADDRESS",
+                        help="serve the matches to remote workers (see distributed.py) "
+                             "listening on host:port or a Unix socket path")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the openings of every match")
+    parser.add_argument("--results", default=None,
+                        help="SQLite file logging every game; matches already in it are skipped")
+    parser.add_argument("--sprt", action="store_true",
+                        help="stop each pairing once an SPRT settles the result")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="SPRT null hypothesis: Elo advantage of the tested agent")
+    parser.add_argument("--elo1", type=float, default=100.,
+                        help="SPRT alternative hypothesis: Elo advantage of the tested agent")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="SPRT false negative rate")
+    parser.add_argument("--max-matches", type=int, default=50,
+                        help="SPRT budget of matches (two games each) per pairing")
+    parser.add_argument("--nodes", type=int, default=None,
+                        help="node budget per move instead of the %d ms time limit" % TIME_LIMIT)
+    parser.add_argument("--openings", default=None,
+                        help="opening suite file (see openings.py) to draw the openings from")
+    parser.add_argument("--weights", default=None,
+                        help="also evaluate a 'Tuned' agent using this weights file (see tuner.py)")
+    parser.add_argument("--profile", nargs="+", default=None, metavar="AGENT",
+                        help="profile the get_move() calls of these agents and report "
+                             "where their time goes")
+    parser.add_argument("--profile-top", type=int, default=15,
+                        help="number of functions listed in each profile")
+    parser.add_argument("--profile-dir", default=None,
+                        help="also save each profile to <dir>/<agent>.prof for pstats/snakeviz")
+    parser.add_argument("--telemetry", action="store_true",
+                        help="report the time used and left, the depth reached and the "
+                             "legal moves of every move per agent and game phase")
+    parser.add_argument("--round-robin", action="store_true",
+                        help="play every agent against every other one and fit Elo ratings")
+    parser.add_argument("--agents", nargs="+", default=None,
+                        help="names of the agents in the round robin (default: all)")
+    parser.add_argument("--matches", type=int, default=NUM_MATCHES,
+                        help="matches per pairing and player order")
+    args = parser.parse_args(args)
+    if args.profile and args.isolate:
+        parser.error("--profile cannot be combined with --isolate")
+    if args.sprt and args.round_robin:
+        parser.error("--sprt cannot be combined with --round-robin")
+
+    store = ResultsStore(args.results) if args.results else None
+    if store is not None and len(store) and args.seed is None:
+        parser.error("--seed is required to resume the tournament in " + args.results)
+    openings = read_suite(args.openings) if args.openings else None
+
+    # Every match gets a core to itself so that the time limits stay fair
+    workers = args.workers or os.cpu_count()
+    if args.coordinator:
+        executor = Coordinator(parse_address(args.coordinator)).start()
+        print("Waiting for workers on {}".format(executor.address))
+    elif workers > 1:
+        executor = ProcessPoolExecutor(workers)
+    else:
+        executor = None
 
     HEURISTICS = [("Null", null_score),
                   ("Open", open_move_score),
@@ -162,8 +575,47 @@ def main():
     # faster or slower computers.
     test_agents = [Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS), "ID_Improved"),
                    Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")]
+    if args.weights:
+        test_agents.append(Agent(CustomPlayer(weights=args.weights, **CUSTOM_ARGS),
+                                 "Tuned"))
+
+    profiles = None
+    if args.profile:
+        known = [a.name for a in random_agents + mm_agents + ab_agents + test_agents]
+        unknown = [name for name in args.profile if name not in known]
+        if unknown:
+            parser.error("unknown agents: " + ", ".join(unknown) +
+                         " (choose from " + ", ".join(known) + ")")
+        profiles = {}
+        mm_agents = profile_agents(mm_agents, args.profile)
+        ab_agents = profile_agents(ab_agents, args.profile)
+        random_agents = profile_agents(random_agents, args.profile)
+        test_agents = profile_agents(test_agents, args.profile)
+
+    telemetry = Telemetry() if args.telemetry else None
+
+    if args.isolate:
+        mm_agents = isolate_agents(mm_agents, args.grace)
+        ab_agents = isolate_agents(ab_agents, args.grace)
+        random_agents = isolate_agents(random_agents, args.grace)
+        test_agents = isolate_agents(test_agents, args.grace)
+
+    if args.round_robin:
+        pool = random_agents + mm_agents + ab_agents + test_agents
+        if args.agents:
+            by_name = {agent.name: agent for agent in pool}
+            unknown = [name for name in args.agents if name not in by_name]
+            if unknown:
+                parser.error("unknown agents: " + ", ".join(unknown) +
+                             " (choose from " + ", ".join(by_name) + ")")
+            pool = [by_name[name] for name in args.agents]
+        print_ratings(play_round_robin(pool, args.matches, executor,
+                                       args.seed, store, args.nodes, openings,
+                                       profiles, telemetry))
+        test_agents = []
+    else:
+        print(DESCRIPTION)
 
-    print(DESCRIPTION)
     for agentUT in test_agents:
         print("")
         print("*************************")
@@ -171,12 +623,41 @@ def main():
         print("*************************")
 
         agents = random_agents + mm_agents + ab_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
+        if args.sprt:
+            sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+            win_ratio = play_round_sprt(agents, sprt, args.max_matches, executor,
+                                        args.seed, store, workers, args.nodes,
+                                        openings, profiles, telemetry)
+        else:
+            win_ratio = play_round(agents, args.matches, executor, args.seed, store,
+                                   args.nodes, openings, profiles, telemetry)
 
         print("\n\nResults:")
         print("----------")
         print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
 
+    if telemetry is not None:
+        print_telemetry(telemetry)
+
+    for name in sorted(profiles or {}):
+        print_profile(name, profiles[name], args.profile_top)
+        if args.profile_dir:
+            os.makedirs(args.profile_dir, exist_ok=True)
+            profiles[name].dump_stats(os.path.join(args.profile_dir, name + ".prof"))
+
+    if executor is not None:
+        executor.shutdown()
+
+    if store is not None:
+        store.close()
+
+    if args.isolate:
+        for agent in random_agents + mm_agents + ab_agents + test_agents:
+            agent.player.close()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run main() from the imported module so that the matches sent to remote
+    # workers refer to tournament.run_match rather than __main__.run_match
+    import tournament
+    tournament.main()
\ No newline at end of file
@@ -0,0 +1,541 @@
+"""
+This file contains test cases for the tournament tooling in tournament.py
+(match scheduling and the executors that play the matches).
+"""
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import blunders
+import distributed
+import game_agent
+import openings
+import profiling
+import telemetry
+import texel
+import tournament
+import tuner
+
+from game_store import GameStore
+from isolation import Board
+from ratings import BradleyTerry
+from ratings import SPRT
+from results_store import ResultsStore
+from sample_players import RandomPlayer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    import selfplay
+
+
+def make_agents(names):
+    """ Create one `tournament.Agent` with a RandomPlayer for each name. """
+    return [tournament.Agent(RandomPlayer(), name) for name in names]
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def test_schedule_is_seeded(self):
+        """ The same seed produces the same matches and match seeds """
+        agents = make_agents(["A", "B", "C"])
+        jobs_1 = tournament.schedule_round(agents, 2, random.Random(7))
+        jobs_2 = tournament.schedule_round(agents, 2, random.Random(7))
+        self.assertEqual(jobs_1, jobs_2)
+        self.assertEqual(len(jobs_1), 2 * 2 * 2)
+
+    def test_results_independent_of_workers(self):
+        """ Matches played by a process pool match the serial results """
+        agents = make_agents(["A", "B", "C"])
+        jobs = tournament.schedule_round(agents, 3, random.Random(11))
+        serial = [r[:2] for r in map(tournament.run_match, jobs)]
+        with ProcessPoolExecutor(2) as executor:
+            parallel = [r[:2] for r in executor.map(
+                partial(tournament.run_match, cleanup=True), jobs)]
+        self.assertEqual(serial, parallel)
+
+
+class ResultsStoreTest(unittest.TestCase):
+
+    def test_resume_from_store(self):
+        """ Recorded matches are skipped and their scores rebuilt """
+        agents = make_agents(["A", "B"])
+        jobs = tournament.schedule_round(agents, 3, random.Random(5))
+        store = ResultsStore(":memory:")
+
+        first = list(tournament.run_schedule(jobs[:2], store=store))
+        self.assertEqual(len(store), 4)
+
+        resumed = list(tournament.run_schedule(jobs, store=store))
+        self.assertEqual(len(store), 2 * len(jobs))
+        self.assertEqual(resumed[:2], first)
+
+        game = store.matches()[jobs[0].key][0]
+        self.assertEqual(game.player_1, jobs[0].names[0])
+        self.assertEqual(game.seed, jobs[0].seed)
+        self.assertEqual(len(game.opening), 2)
+        self.assertEqual(len(game.moves), len(game.move_times))
+        self.assertIn(game.winner, ("A", "B"))
+
+    def test_resume_other_seed(self):
+        """ A store written by another schedule is never mixed in """
+        agents = make_agents(["A", "B"])
+        store = ResultsStore(":memory:")
+        list(tournament.run_schedule(
+            tournament.schedule_round(agents, 1, random.Random(5)), store=store))
+        recorded = len(store)
+
+        jobs = tournament.schedule_round(agents, 2, random.Random(6))
+        with self.assertRaises(ValueError):
+            list(tournament.run_schedule(jobs, store=store))
+        self.assertEqual(len(store), recorded)
+
+
+class GameStoreTest(unittest.TestCase):
+
+    def test_positions_indexed(self):
+        """ Every game through a position is found by its hash """
+        agents = make_agents(["A", "B"])
+        jobs = tournament.schedule_round(agents, 3, random.Random(5))
+        results = ResultsStore(":memory:")
+        list(tournament.run_schedule(jobs, store=results))
+        store = GameStore(":memory:")
+        self.assertEqual(store.import_results(results), len(results))
+
+        game = results.games()[0]
+        board = Board("p1", "p2")
+        for move in game.opening + game.moves[:3]:
+            board.apply_move(move)
+        position = store.hash_board(board)
+        found = store.games_through(position)
+        self.assertIn((1, 5), found)
+
+        stats = store.position_stats(position)
+        self.assertEqual(stats.games, len(found))
+        self.assertEqual(stats.player_1_wins + stats.player_2_wins, len(found))
+        stored = store.load(1)
+        self.assertEqual(stored.player_1, game.player_1)
+        self.assertEqual(stored.game.moves, game.opening + game.moves)
+        self.assertEqual(stored.game.winner,
+                         1 if game.winner == game.player_1 else 2)
+
+
+class BlunderTest(unittest.TestCase):
+
+    def test_best_move_loses_nothing(self):
+        """ The played move and the root search agree on the best move """
+        board = Board("p1", "p2")
+        board.apply_move((2, 2))
+        board.apply_move((4, 4))
+        best_score, best_move, played_score = blunders.analyze_move(
+            board.to_state(), board.get_legal_moves()[0], 4)
+        self.assertGreaterEqual(best_score, played_score)
+        self.assertEqual(blunders.analyze_move(board.to_state(), best_move, 4),
+                         (best_score, best_move, best_score))
+
+    def test_analyze_games(self):
+        """ Only the agent's moves are analysed and its losses come first """
+        agents = make_agents(["Random"]) + [tournament.Agent(
+            game_agent.CustomPlayer(search_depth=1, method='alphabeta',
+                                    iterative=False), "AB")]
+        results = ResultsStore(":memory:")
+        jobs = tournament.schedule_round(agents, 2, random.Random(1))
+        list(tournament.run_schedule(jobs, store=results))
+        games = [(key, idx, record) for key, records in results.matches().items()
+                 for idx, record in enumerate(records)]
+
+        with ProcessPoolExecutor(2) as executor:
+            analyses = blunders.analyze_games(games, "AB", depth=3,
+                                              threshold=1, executor=executor)
+        self.assertEqual([a.record for a in analyses], [g[2] for g in games])
+        moves = [m for a in analyses for m in a.moves]
+        self.assertTrue(moves)
+        self.assertTrue(all(m.player == "AB" and m.loss >= 0 for m in moves))
+
+        ordered = blunders.instructive_order(analyses, "AB")
+        lost = [a.record.winner != "AB" and bool(a.blunders) for a in ordered]
+        self.assertEqual(lost, sorted(lost, reverse=True))
+
+
+class DistributedTest(unittest.TestCase):
+
+    def start_workers(self, address, count):
+        workers = [multiprocessing.Process(target=distributed.run_worker,
+                                           args=(address,), kwargs={"retry": 5})
+                   for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    def test_workers_play_schedule(self):
+        """ Matches played by remote workers match the serial results """
+        agents = make_agents(["A", "B"])
+        jobs = tournament.schedule_round(agents, 3, random.Random(2))
+        coordinator = distributed.Coordinator(("127.0.0.1", 0)).start()
+        workers = self.start_workers(coordinator.address, 2)
+        try:
+            remote = list(tournament.run_schedule(jobs, executor=coordinator))
+        finally:
+            coordinator.shutdown()
+            for worker in workers:
+                worker.join(10)
+        self.assertEqual(remote, list(tournament.run_schedule(jobs)))
+        self.assertFalse(any(worker.is_alive() for worker in workers))
+
+    def test_silent_worker_job_requeued(self):
+        """ A job is handed to another worker when its worker goes silent """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "coordinator.sock")
+            coordinator = distributed.Coordinator(path, heartbeat_timeout=0.5)
+            coordinator.start()
+            silent = socket.socket(socket.AF_UNIX)
+            silent.connect(path)
+            results = coordinator.map(abs, [-3])
+            job_id, payload = distributed._recv(silent)
+            self.assertEqual(pickle.loads(payload), (abs, (-3,)))
+
+            workers = self.start_workers(path, 1)
+            try:
+                self.assertEqual(list(results), [3])
+            finally:
+                coordinator.shutdown()
+                silent.close()
+                workers[0].join(10)
+            self.assertEqual(coordinator.requeued, 1)
+
+
+class OpeningsTest(unittest.TestCase):
+
+    def test_canonical_openings(self):
+        """ Only one opening of each symmetry class is searched """
+        canonical = openings.canonical_openings(7, 7)
+        self.assertEqual(len(canonical), 315)
+        self.assertIn(((0, 0), (0, 1)), canonical)
+        self.assertNotIn(((6, 6), (6, 5)), canonical)
+
+    def test_shallow_search_rejected(self):
+        """ Depth 1 would search depth 0, which never stops at a leaf """
+        with self.assertRaises(ValueError):
+            openings.score_opening(((0, 0), (0, 1)), depth=1)
+        with self.assertRaises(SystemExit):
+            openings.main(["suite.txt", "--depth", "1"])
+
+    def test_suite_round_trip(self):
+        """ A suite file reads back as the openings that were written """
+        suite = openings.build_suite(size=3, depth=2, width=4, height=4)
+        self.assertEqual(len(suite), 3)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            openings.write_suite(path, suite, "test suite")
+            self.assertEqual(openings.read_suite(path), [o for o, _ in suite])
+        finally:
+            os.remove(path)
+
+    def test_matches_use_the_suite(self):
+        """ Every match of a round starts from an opening of the suite """
+        suite = [((3, 3), (0, 0)), ((2, 3), (4, 4))]
+        agents = make_agents(["A", "B"])
+        jobs = tournament.schedule_round(agents, 2, random.Random(5), suite)
+        self.assertEqual(sorted(job.opening for job in jobs), sorted(suite * 2))
+
+        store = ResultsStore(":memory:")
+        list(tournament.run_schedule(jobs, store=store))
+        for job, games in store.matches().items():
+            opening = next(j.opening for j in jobs if j.key == job)
+            self.assertEqual([g.opening for g in games], [list(opening)] * 2)
+
+
+class TunerTest(unittest.TestCase):
+
+    def test_spsa_steps_towards_better_side(self):
+        """ The weights move towards the side that won more games """
+        spsa = tuner.SPSA([0., 0., 0.], rng=random.Random(1))
+        plus, minus, delta = spsa.perturbations()
+        self.assertEqual([p - m > 0 for p, m in zip(plus, minus)],
+                         [d > 0 for d in delta])
+        theta = spsa.update(delta, 0.75, 0.25)
+        self.assertEqual([t * d > 0 for t, d in zip(theta, delta)], [True] * 3)
+
+    def test_tune_iteration(self):
+        """ A tuning run reports every iteration and returns all weights """
+        reports = []
+        weights = tuner.tune(2, 1, node_limit=30, seed=4,
+                             callback=lambda *args: reports.append(args))
+        self.assertEqual([r[0] for r in reports], [0, 1])
+        self.assertEqual(weights, reports[-1][1])
+        self.assertEqual(set(weights), set(game_agent.FEATURES))
+
+
+class TexelTest(unittest.TestCase):
+
+    OPENING = [(2, 3), (4, 4)]
+
+    def play_game(self, seed):
+        """ Return the winner (1 or 2) and move history of a random game """
+        random.seed(seed)
+        board = Board(RandomPlayer(), RandomPlayer())
+        for move in self.OPENING:
+            board.apply_move(move)
+        winner, history, _ = board.play()
+        return 1 if winner is board.__player_1__ else 2, history
+
+    def test_positions_from_side_to_move(self):
+        """ One row per position, seen from the player to move """
+        winner, history = self.play_game(3)
+        rows = list(texel.positions_from_history(history, winner, self.OPENING))
+        moves = [m for turn in history for m in turn]
+
+        board = Board(1, 2)
+        for move in self.OPENING:
+            board.apply_move(move)
+        for (features, label), move in zip(rows, moves):
+            player = board.active_player
+            self.assertEqual(features, game_agent.score_features(board, player))
+            self.assertEqual(label, int(player == winner))
+            board.apply_move(move)
+        self.assertEqual(len(rows), len(moves) - 1)
+        self.assertEqual([label for _, label in rows[:4]],
+                         [int(p == winner) for p in (1, 2, 1, 2)])
+
+    @unittest.skipUnless(numpy, "requires NumPy")
+    def test_fit_recovers_weights(self):
+        """ Weights that are not antisymmetric are recovered from the labels """
+        rng = numpy.random.RandomState(0)
+        true = numpy.array([.8, -.3, .2, 0., -.1])
+        X = rng.normal(size=(20000, len(game_agent.FEATURES)))
+        y = (rng.uniform(size=len(X)) < 1. / (1. + numpy.exp(-(X @ true)))).astype(float)
+        weights = texel.fit_weights(X, y, l2=1e-6)
+        fitted = numpy.array([weights[name] for name in game_agent.FEATURES])
+        self.assertTrue(numpy.allclose(fitted, true, atol=.1))
+        self.assertLess(texel.log_loss(X, y, weights), numpy.log(2.))
+
+    @unittest.skipUnless(numpy, "requires NumPy")
+    def test_fit_recorded_games(self):
+        """ Positions of played games stack into a matrix with one row each """
+        rows = []
+        for seed in range(3):
+            winner, history = self.play_game(seed)
+            rows += texel.positions_from_history(history, winner, self.OPENING)
+        X, y = texel.feature_matrix(rows)
+        self.assertEqual(X.shape, (len(rows), len(game_agent.FEATURES)))
+        self.assertEqual(set(texel.fit_weights(X, y)), set(game_agent.FEATURES))
+
+    @unittest.skipUnless(numpy, "requires NumPy")
+    def test_main_fits_results_store(self):
+        """ Weights are fitted from a results store and saved for WeightedScore """
+        with tempfile.TemporaryDirectory() as directory:
+            results = os.path.join(directory, "results.sqlite")
+            store = ResultsStore(results)
+            jobs = tournament.schedule_round(make_agents(["A", "B"]), 3, random.Random(2))
+            list(tournament.run_schedule(jobs, store=store))
+            store.close()
+
+            weights = os.path.join(directory, "weights.json")
+            matrices = os.path.join(directory, "rows.npz")
+            texel.main([weights, "--results", results, "--save", matrices])
+            score = game_agent.WeightedScore.load(weights)
+            self.assertEqual(set(score.weights), set(game_agent.FEATURES))
+
+            texel.main([weights, "--load", matrices])
+            self.assertEqual(game_agent.WeightedScore.load(weights).weights, score.weights)
+
+
+@unittest.skipUnless(numpy, "requires NumPy")
+class SelfPlayTest(unittest.TestCase):
+
+    def records(self, count, start=0):
+        return numpy.array([(idx, 1, 2, 1, idx % 256, float(idx), 1)
+                            for idx in range(start, start + count)], selfplay.RECORD)
+
+    def test_append_and_reload(self):
+        """ Readers see the records committed when they opened the shard """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "000-0000.shard")
+            shard = selfplay.Shard(path, capacity=10)
+            self.assertEqual(len(selfplay.open_shard(path)), 0)
+
+            shard.append(self.records(4))
+            before = selfplay.open_shard(path)
+            shard.append(self.records(3, start=4))
+            self.assertEqual(before["score"].tolist(), [0., 1., 2., 3.])
+            self.assertEqual(shard.room(), 3)
+            shard.close()
+
+            loaded = selfplay.load(directory)
+            self.assertEqual(loaded["occupied"].tolist(), list(range(7)))
+            self.assertEqual(os.listdir(directory), ["000-0000.shard"])
+
+    def test_read_while_producing(self):
+        """ Consumers never see a shard before its header is written """
+        with tempfile.TemporaryDirectory() as directory:
+            done = threading.Event()
+            written = []
+
+            def producer():
+                try:
+                    written.append(selfplay.produce(directory, 0, 4, node_limit=10,
+                                                    seed=1, capacity=49))
+                finally:
+                    done.set()
+
+            thread = threading.Thread(target=producer)
+            thread.start()
+            seen = 0
+            while not done.is_set():
+                count = len(selfplay.load(directory))
+                self.assertGreaterEqual(count, seen)
+                seen = count
+            thread.join()
+
+            records = selfplay.load(directory)
+            self.assertEqual(len(records), written[0])
+            self.assertTrue(set(records["result"].tolist()) <= {-1, 1})
+
+    def test_rollover(self):
+        """ Full shards are closed and new ones started, never overwritten """
+        with tempfile.TemporaryDirectory() as directory:
+            first = selfplay.produce(directory, 0, 3, node_limit=10, seed=2,
+                                     capacity=60)
+            shards = sorted(os.listdir(directory))
+            self.assertGreater(len(shards), 1)
+            counts = [len(selfplay.open_shard(os.path.join(directory, name)))
+                      for name in shards]
+            self.assertTrue(all(0 < count <= 60 for count in counts))
+            self.assertEqual(sum(counts), first)
+
+            second = selfplay.produce(directory, 0, 1, node_limit=10, seed=3,
+                                      capacity=60)
+            self.assertEqual(sorted(os.listdir(directory))[:len(shards)], shards)
+            self.assertEqual(len(selfplay.load(directory)), first + second)
+
+
+class OptionalNumPyTest(unittest.TestCase):
+
+    def test_import_without_numpy(self):
+        """ Modules using NumPy only need it once they read or fit data """
+        code = "import sys; sys.modules['numpy'] = None; import selfplay, texel"
+        subprocess.check_call([sys.executable, "-c", code],
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfileTest(unittest.TestCase):
+
+    def test_profiles_merged_per_agent(self):
+        """ Profiles of every match are merged into one report per agent """
+        agents = make_agents(["Random"]) + [tournament.Agent(
+            game_agent.CustomPlayer(method='alphabeta'), "AB")]
+        agents = tournament.profile_agents(agents, ["AB"])
+        self.assertIsInstance(agents[1].player, profiling.ProfiledPlayer)
+        self.assertNotIsInstance(agents[0].player, profiling.ProfiledPlayer)
+
+        profiles = {}
+        jobs = tournament.schedule_round(agents, 2, random.Random(9))
+        with ProcessPoolExecutor(2) as executor:
+            list(tournament.run_schedule(jobs, executor, node_limit=50,
+                                         profiles=profiles))
+        self.assertEqual(list(profiles), ["AB"])
+        times = dict(profiling.category_times(profiles["AB"]))
+        self.assertGreater(times["move generation"], 0)
+        self.assertGreater(times["heuristic"], 0)
+
+
+class TelemetryTest(unittest.TestCase):
+
+    def test_moves_recorded_and_summarised(self):
+        """ Every move is stored with its telemetry and counted per agent """
+        agents = make_agents(["Random"]) + [tournament.Agent(
+            game_agent.CustomPlayer(method='alphabeta', iterative=True), "ID")]
+        jobs = tournament.schedule_round(agents, 2, random.Random(4))
+        store = ResultsStore(":memory:")
+        data = telemetry.Telemetry()
+        list(tournament.run_schedule(jobs, store=store, telemetry=data))
+
+        games = [g for match in store.matches().values() for g in match]
+        for game in games:
+            self.assertEqual(len(game.time_left), len(game.moves))
+            self.assertEqual(len(game.num_legal), len(game.moves))
+        self.assertEqual(sum(data.moves.values()),
+                         sum(len(g.moves) for g in games))
+
+        # only the searching agent reports a depth
+        self.assertFalse(data.histogram("Random", "depth"))
+        depths = data.histogram("ID", "depth")
+        self.assertEqual(len(depths), data.moves["ID"])
+        self.assertGreaterEqual(depths.quantile(0.), 1)
+        self.assertGreater(data.histogram("ID", "time_left", "opening").quantile(.5), 0)
+
+    def test_histogram_bins(self):
+        hist = telemetry.Histogram()
+        for value in (3, 1, 2, 7, float("inf"), None):
+            hist.add(value)
+        self.assertEqual(len(hist), 4)
+        self.assertEqual(hist.quantile(.5), 2)
+        self.assertEqual(hist.quantile(1.), 7)
+        self.assertEqual(hist.bins((2, 5)), [("< 2", 1), ("2-5", 2), (">= 5", 1)])
+
+
+class SPRTTest(unittest.TestCase):
+
+    def test_decisions(self):
+        """ Lopsided results settle the test quickly, even ones do not """
+        sprt = SPRT(elo0=0, elo1=100)
+        self.assertEqual(sprt.status(20, 0), "H1")
+        self.assertEqual(sprt.status(0, 20), "H0")
+        self.assertIsNone(sprt.status(3, 2))
+        self.assertAlmostEqual(sprt.llr(0, 0), 0.)
+
+    def test_pairing_stops_early(self):
+        """ A pairing stops as soon as the test is decided """
+        agents = make_agents(["A", "B"])
+        always_decided = SPRT(elo0=0, elo1=100, alpha=0.5, beta=0.5)
+        score_1, score_2, status = tournament.play_pairing_sprt(
+            agents[0], agents[1], 0, always_decided, 10, random.Random(1))
+        self.assertEqual(score_1 + score_2, 2)
+        self.assertIn(status, ("H0", "H1"))
+
+
+class RatingsTest(unittest.TestCase):
+
+    def test_bradley_terry(self):
+        """ Ratings follow the win ratio and are centred on the average """
+        model = BradleyTerry(prior=0.01)
+        model.add_game("A", "B", 30)
+        model.add_game("B", "A", 10)
+        (best, elo_a, ci_a, games), (_, elo_b, _, _) = model.ratings()
+        self.assertEqual((best, games), ("A", 40))
+        self.assertAlmostEqual(elo_a + elo_b, 0., places=6)
+        self.assertAlmostEqual(elo_a - elo_b, 400 * math.log10(3), delta=5)
+        self.assertTrue(0 < ci_a < 200)
+
+        # more games narrow the confidence interval
+        model.add_game("A", "B", 300)
+        model.add_game("B", "A", 100)
+        self.assertLess(model.ratings()[0][2], ci_a)
+
+    def test_round_robin(self):
+        """ Every pair of agents meets in the round robin """
+        agents = make_agents(["A", "B", "C"])
+        jobs = tournament.schedule_round_robin(agents, 1, random.Random(3))
+        pairs = set(frozenset(job.names) for job in jobs)
+        self.assertEqual(len(pairs), 3)
+        model = tournament.play_round_robin(agents, 1, seed=3)
+        # 3 pairings x 2 orders x 2 games, counted once for each player
+        self.assertEqual(sum(row[3] for row in model.ratings()), 2 * 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
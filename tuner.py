@@ -0,0 +1,214 @@
+"""
+Tune the weights of the `WeightedScore` evaluation function (see
+game_agent.py) with simultaneous perturbation stochastic approximation
+(SPSA).
+
+Every iteration perturbs all weights at once by +/- c_k in a random
+direction and plays the two perturbed agents against the same fixed
+opponent, from the same openings and seeds. The difference between their
+results estimates the gradient of the win rate along that direction, and the
+weights take a step of size a_k along the estimate. Only two batches of
+games are needed per iteration however many weights are tuned, and the
+games of each batch are played in parallel by a process pool (or by remote
+workers, see distributed.py).
+
+The games use a node-budget time control by default, so the results do not
+depend on how busy the machine is. The current estimate is written to the
+weights file after every iteration, and can be used with:
+
+    CustomPlayer(weights="weights.json")
+"""
+
+import argparse
+import os
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+
+from game_agent import CustomPlayer
+from game_agent import FEATURES
+from game_agent import WeightedScore
+from openings import deal_openings
+from openings import read_suite
+from sample_players import improved_score
+from tournament import MatchJob
+from tournament import run_schedule
+
+AGENT_ARGS = {"method": 'alphabeta', "iterative": True}
+
+
+class SPSA(object):
+    """SPSA optimizer maximizing a noisy objective of a weight vector.
+
+    The gain sequences follow Spall (1998): a_k = a / (k + 1 + A) ** 0.602
+    and c_k = c / (k + 1) ** 0.101.
+
+    Parameters
+    ----------
+    theta : list<float>
+        The starting weights.
+
+    a : float (optional)
+        Scale of the steps taken along the gradient estimates.
+
+    c : float (optional)
+        Size of the perturbations of the weights.
+
+    A : float (optional)
+        Stability constant delaying the decay of the step size (about 10% of
+        the number of iterations is usual).
+    """
+
+    def __init__(self, theta, a=2., c=0.5, A=10., rng=None):
+        self.theta = list(theta)
+        self.a = a
+        self.c = c
+        self.A = A
+        self.k = 0
+        self.rng = rng or random.Random()
+
+    def perturbations(self):
+        """Draw the perturbation of the current iteration.
+
+        Returns
+        ----------
+        (list<float>, list<float>, list<int>)
+            The weights to evaluate on the plus and the minus side, and the
+            random direction (+1/-1 for each weight).
+        """
+        c_k = self.c / (self.k + 1) ** 0.101
+        delta = [self.rng.choice((-1, 1)) for _ in self.theta]
+        plus = [t + c_k * d for t, d in zip(self.theta, delta)]
+        minus = [t - c_k * d for t, d in zip(self.theta, delta)]
+        return plus, minus, delta
+
+    def update(self, delta, result_plus, result_minus):
+        """ Step along the gradient estimated from the results of both sides. """
+        a_k = self.a / (self.k + 1 + self.A) ** 0.602
+        c_k = self.c / (self.k + 1) ** 0.101
+        for i, d in enumerate(delta):
+            gradient = (result_plus - result_minus) / (2 * c_k * d)
+            self.theta[i] += a_k * gradient
+        self.k += 1
+        return self.theta
+
+
+def play_sides(plus, minus, opponent, num_matches, rng, executor=None,
+               node_limit=None, openings=None, tag=""):
+    """Play the agents with weights `plus` and `minus` against `opponent`
+    from the same openings and seeds.
+
+    Returns
+    ----------
+    (float, float)
+        The fraction of games won by each side.
+    """
+    seeds = [rng.randrange(2 ** 32) for _ in range(num_matches)]
+    dealt = deal_openings(openings, num_matches, rng) if openings else [None] * num_matches
+    jobs = []
+    for side, weights in enumerate((plus, minus)):
+        agent = CustomPlayer(score_fn=WeightedScore(dict(zip(FEATURES, weights))),
+                             **AGENT_ARGS)
+        for num, (seed, opening) in enumerate(zip(seeds, dealt)):
+            key = "spsa{}{}#{}".format(tag, "+-"[side], num)
+            jobs.append(MatchJob(side, key, agent, opponent,
+                                 ("tuned", "opponent"), seed, opening))
+
+    wins = [0, 0]
+    for job, score, _ in run_schedule(jobs, executor, node_limit=node_limit):
+        wins[job.pairing] += score
+    return wins[0] / (2. * num_matches), wins[1] / (2. * num_matches)
+
+
+def tune(iterations, num_matches, weights=None, opponent=None, executor=None,
+         node_limit=200, openings=None, seed=None, a=2., c=0.5, callback=None):
+    """Tune the weights of a `WeightedScore` agent against `opponent`.
+
+    Parameters
+    ----------
+    iterations : int
+        Number of SPSA iterations.
+
+    num_matches : int
+        Matches (two games each) played by each side of every iteration.
+
+    weights : dict<str, float> (optional)
+        Starting weights (the "improved" heuristic by default).
+
+    opponent : object (optional)
+        The fixed opponent (an iterative deepening agent with the "improved"
+        heuristic by default).
+
+    callback : callable (optional)
+        Called as callback(iteration, weights, result_plus, result_minus)
+        after every iteration.
+
+    Returns
+    ----------
+    dict<str, float>
+        The tuned weights.
+    """
+    weights = WeightedScore(weights).weights
+    if opponent is None:
+        opponent = CustomPlayer(score_fn=improved_score, **AGENT_ARGS)
+    rng = random.Random(seed)
+    spsa = SPSA([weights[name] for name in FEATURES], a=a, c=c,
+                A=max(1., iterations / 10.), rng=rng)
+
+    for k in range(iterations):
+        plus, minus, delta = spsa.perturbations()
+        result_plus, result_minus = play_sides(plus, minus, opponent,
+                                               num_matches, rng, executor,
+                                               node_limit, openings, tag=k)
+        theta = spsa.update(delta, result_plus, result_minus)
+        if callback is not None:
+            callback(k, dict(zip(FEATURES, theta)), result_plus, result_minus)
+
+    return dict(zip(FEATURES, spsa.theta))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Tune the weights of the "
+                                     "weighted evaluation function with SPSA.")
+    parser.add_argument("output", help="weights file (JSON) to write")
+    parser.add_argument("--start", default=None,
+                        help="weights file to start from (default: the improved heuristic)")
+    parser.add_argument("--iterations", type=int, default=100,
+                        help="number of SPSA iterations")
+    parser.add_argument("--matches", type=int, default=8,
+                        help="matches (two games each) per side and iteration")
+    parser.add_argument("--nodes", type=int, default=200,
+                        help="node budget per move")
+    parser.add_argument("--openings", default=None,
+                        help="opening suite file (see openings.py)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes playing games (0 = one per CPU core)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the perturbations and openings")
+    parser.add_argument("-a", type=float, default=2., help="SPSA step size")
+    parser.add_argument("-c", type=float, default=0.5, help="SPSA perturbation size")
+    args = parser.parse_args(args)
+
+    start = WeightedScore.load(args.start).weights if args.start else None
+    openings = read_suite(args.openings) if args.openings else None
+    workers = args.workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    def report(k, weights, result_plus, result_minus):
+        WeightedScore(weights).save(args.output)
+        print("Iteration {:>4}: {:.2f} / {:.2f}  {}".format(
+            k + 1, result_plus, result_minus,
+            " ".join("{}={:+.3f}".format(n, w) for n, w in weights.items())))
+
+    try:
+        tune(args.iterations, args.matches, start, executor=executor,
+             node_limit=args.nodes, openings=openings, seed=args.seed,
+             a=args.a, c=args.c, callback=report)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print("Weights written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()